@@ -0,0 +1,139 @@
+"""
+Compare the sync API under WSGI with the async read views under ASGI.
+
+    python -m benchmarks.bench_async_views --requests 400 --concurrency 32
+
+Each endpoint is requested ``--requests`` times with ``--concurrency``
+requests in flight: the WSGI handler from a thread pool, the ASGI handler
+from asyncio tasks on one event loop. SQLite serialises connections, so the
+gap between the two is mostly scheduling overhead; point DATABASES at
+PostgreSQL to see the effect of not parking a thread per waiting query.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from benchmarks.common import setup_django, test_database
+
+ENDPOINTS = [
+    ('group detail', '/api/savings-groups/{group}/', '/api/async/savings-groups/{group}/'),
+    ('members', '/api/savings-groups/{group}/members/', '/api/async/savings-groups/{group}/members/'),
+    ('analytics', '/api/savings-groups/{group}/analytics/', '/api/async/savings-groups/{group}/analytics/'),
+    ('contributions', '/api/contributions/', '/api/async/contributions/'),
+    ('notifications', '/api/notifications/', '/api/async/notifications/'),
+]
+
+
+def seed(members, contributions):
+    from django.contrib.auth.models import User
+    from fintech.models import Contribution, GroupMembership, Notification, SavingsGroup
+
+    group = SavingsGroup.objects.create(name='Bench Group')
+    reader = User.objects.create_user(username='bench-reader')
+    memberships = [GroupMembership.objects.create(user=reader, group=group)]
+    memberships += GroupMembership.objects.bulk_create(
+        GroupMembership(user=User.objects.create_user(username=f'bench-member{i}'), group=group)
+        for i in range(members - 1)
+    )
+    for i in range(contributions):
+        Contribution.objects.create(member=memberships[0], amount=Decimal('50.00'), transaction_type='DEPOSIT')
+    Notification.objects.bulk_create(
+        Notification(user=reader, title='Bench', message='Message', notification_type='ALERT')
+        for _ in range(200)
+    )
+    return group, reader
+
+
+def summarize(timings, elapsed):
+    timings.sort()
+    return len(timings) / elapsed, timings[int(len(timings) * 0.99) - 1]
+
+
+def run_wsgi(url, cookies, total, concurrency):
+    from django.db import connection
+    from django.test import Client
+
+    def request(_):
+        client = Client()
+        client.cookies.update(cookies)
+        begin = time.perf_counter()
+        try:
+            response = client.get(url)
+        finally:
+            connection.close()
+        assert response.status_code == 200, response.content
+        return (time.perf_counter() - begin) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        timings = list(pool.map(request, range(total)))
+    return summarize(timings, time.perf_counter() - start)
+
+
+async def run_asgi(url, cookies, total, concurrency):
+    from django.test import AsyncClient
+
+    limit = asyncio.Semaphore(concurrency)
+
+    async def request():
+        async with limit:
+            client = AsyncClient()
+            client.cookies.update(cookies)
+            begin = time.perf_counter()
+            response = await client.get(url)
+            assert response.status_code == 200, response.content
+            return (time.perf_counter() - begin) * 1000
+
+    start = time.perf_counter()
+    timings = await asyncio.gather(*(request() for _ in range(total)))
+    return summarize(list(timings), time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=400, help='requests per endpoint and server')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--members', type=int, default=50)
+    parser.add_argument('--contributions', type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from django.test import Client
+
+    options = {}
+    name = None
+    if connection.vendor == 'sqlite':
+        # Concurrent requests need a shared file database
+        name = os.path.join(tempfile.mkdtemp(), 'async_views.sqlite3')
+        options = {'timeout': 60, 'init_command': 'PRAGMA journal_mode=WAL;'}
+
+    with test_database(name=name, options=options):
+        group, reader = seed(args.members, args.contributions)
+        login = Client()
+        login.force_login(reader)
+        cookies = login.cookies
+        connection.close()
+
+        print(f'{args.requests} requests per endpoint, {args.concurrency} in flight')
+        print(f'  {"endpoint":14s} {"wsgi req/s":>11s} {"wsgi p99":>9s} {"asgi req/s":>11s} {"asgi p99":>9s}')
+        for label, sync_url, async_url in ENDPOINTS:
+            wsgi_rate, wsgi_p99 = run_wsgi(
+                sync_url.format(group=group.pk), cookies, args.requests, args.concurrency
+            )
+            asgi_rate, asgi_p99 = asyncio.run(
+                run_asgi(async_url.format(group=group.pk), cookies, args.requests, args.concurrency)
+            )
+            print(
+                f'  {label:14s} {wsgi_rate:11.1f} {wsgi_p99:7.1f}ms '
+                f'{asgi_rate:11.1f} {asgi_p99:7.1f}ms'
+            )
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
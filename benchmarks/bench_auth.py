@@ -0,0 +1,78 @@
+"""
+Measure per-request authentication overhead of the API's schemes.
+
+    python -m benchmarks.bench_auth --requests 200
+
+Sends the same cheap request (the unread notification badge, a single
+query of its own) with HTTP Basic credentials, a session cookie and an API
+token, the token on a cold and on a warm principal cache, and reports the
+time and queries per request. Basic auth runs the configured password
+hasher on every request, so it gets fewer requests (--basic-requests).
+"""
+import argparse
+import base64
+import statistics
+import time
+
+from benchmarks.common import setup_django, test_database
+
+PATH = '/api/notifications/unread_count/'
+
+
+def run(client, requests, headers=None, before_each=None):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    timings = []
+    queries = 0
+    for _ in range(requests):
+        if before_each:
+            before_each()
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = client.get(PATH, headers=headers or {})
+            timings.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.status_code
+        queries += len(captured)
+    return {'ms': statistics.median(timings) * 1000, 'queries': queries / requests}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--basic-requests', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.test import Client
+    from fintech.authentication import issue_api_token, principal_cache
+    from fintech.models import GroupMembership, SavingsGroup
+
+    with test_database():
+        user = User.objects.create_user(username='bench', password='bench-password')
+        for i in range(3):
+            GroupMembership.objects.create(user=user, group=SavingsGroup.objects.create(name=f'Auth {i}'))
+
+        results = {}
+        credentials = base64.b64encode(b'bench:bench-password').decode()
+        results['basic'] = run(Client(), args.basic_requests, {'Authorization': f'Basic {credentials}'})
+
+        session = Client()
+        session.login(username='bench', password='bench-password')
+        run(session, 5)
+        results['session'] = run(session, args.requests)
+
+        token = {'Authorization': f'Token {issue_api_token(user)}'}
+        results['token, cold cache'] = run(Client(), args.requests, token, before_each=principal_cache.clear)
+        run(Client(), 5, token)
+        results['token, warm cache'] = run(Client(), args.requests, token)
+
+    print(f'GET {PATH}, median per request')
+    basic = results['basic']['ms']
+    for label, result in results.items():
+        print(f'  {label:18s} {result["ms"]:8.2f} ms  {result["queries"]:4.1f} queries  {basic / result["ms"]:6.1f}x')
+
+
+if __name__ == '__main__':
+    main()
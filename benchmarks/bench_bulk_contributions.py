@@ -0,0 +1,71 @@
+"""
+Compare posting a meeting's contributions one by one against the bulk path.
+
+    python -m benchmarks.bench_bulk_contributions --size 500
+"""
+import argparse
+from decimal import Decimal
+
+from benchmarks.common import setup_django, test_database, timed
+
+
+def seed(member_count, group_count):
+    from django.contrib.auth.models import User
+    from fintech.models import SavingsGroup, GroupMembership
+
+    groups = [
+        SavingsGroup.objects.create(name=f'Bench group {i}')
+        for i in range(group_count)
+    ]
+    memberships = []
+    for i in range(member_count):
+        user = User.objects.create_user(username=f'bench{i}')
+        memberships.append(GroupMembership.objects.create(user=user, group=groups[i % group_count]))
+    return memberships
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=500, help='contributions per meeting')
+    parser.add_argument('--members', type=int, default=50)
+    parser.add_argument('--groups', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from fintech.models import Contribution, GroupMembership
+    from fintech.services import post_contributions_bulk
+
+    with test_database():
+        memberships = seed(args.members, args.groups)
+        results = {}
+
+        with CaptureQueriesContext(connection) as single_queries, timed(results, 'single'):
+            for i in range(args.size):
+                Contribution.objects.create(
+                    member=memberships[i % len(memberships)],
+                    amount=Decimal('100.00'),
+                    transaction_type='DEPOSIT'
+                )
+
+        with CaptureQueriesContext(connection) as bulk_queries, timed(results, 'bulk'):
+            members = GroupMembership.objects.select_related('group').in_bulk(
+                [m.pk for m in memberships]
+            )
+            post_contributions_bulk([
+                {
+                    'member': members[memberships[i % len(memberships)].pk],
+                    'amount': Decimal('100.00'),
+                    'transaction_type': 'DEPOSIT'
+                }
+                for i in range(args.size)
+            ])
+
+        print(f'{args.size} contributions across {args.groups} groups')
+        print(f"  one by one: {len(single_queries):6d} queries  {results['single'] * 1000:8.1f} ms")
+        print(f"  bulk:       {len(bulk_queries):6d} queries  {results['bulk'] * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
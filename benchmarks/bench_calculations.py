@@ -0,0 +1,242 @@
+"""
+Micro-benchmarks for the financial calculations and the services aggregations.
+
+    python -m benchmarks.bench_calculations                   # print timings
+    python -m benchmarks.bench_calculations --save-baseline   # store them
+    python -m benchmarks.bench_calculations --compare         # check for regressions
+
+Each case runs over synthetic datasets of increasing ``--sizes``: the model
+methods over unsaved instances, the services over a seeded test database.
+A case is timed ``--repeat`` times and its best run is kept, which is the
+figure least disturbed by other load on the machine. Fast cases are run in
+batches so each timing lasts long enough to be stable.
+
+``--compare`` reads the stored baseline and exits non-zero when a case is
+slower than baseline by more than ``--threshold`` (a fraction, 0.25 = 25%).
+Timings are scaled by a fixed calibration workload run alongside the cases,
+which absorbs CPU frequency and load changes between runs, but not the
+difference between machines; record a fresh baseline on a new machine.
+"""
+import argparse
+import gc
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from benchmarks.common import setup_django, test_database
+
+BASELINE = Path(__file__).resolve().parent / 'baselines' / 'calculations.json'
+
+# Rates and terms drawn from a small set, as in production data
+INTEREST_RATES = [Decimal(rate) for rate in ('5.00', '7.50', '10.00', '12.00', '15.00')]
+RETURN_RATES = [Decimal(rate) for rate in ('3.00', '4.50', '6.00', '8.00', '10.00')]
+
+
+def measure(function, repeat, min_time=0.05):
+    """Best and median seconds per call, timeit style
+
+    Calls are batched until a batch takes ``min_time``, so sub-millisecond
+    cases aren't dominated by timer and scheduling noise, and the collector
+    is paused while timing.
+    """
+    def batch(number):
+        begin = time.perf_counter()
+        for _ in range(number):
+            function()
+        return time.perf_counter() - begin
+
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        number = 1
+        while batch(number) < min_time and number < 1024:
+            number *= 2
+        timings = [batch(number) / number for _ in range(repeat)]
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return {'best_s': min(timings), 'median_s': statistics.median(timings), 'calls': number}
+
+
+def calibration():
+    """Fixed Decimal and dict workload used to scale for machine speed"""
+    total = Decimal('0')
+    table = {}
+    for i in range(20000):
+        value = Decimal(i) * Decimal('1.05') / Decimal('3')
+        table[i % 97] = value
+        total += value
+    return total
+
+
+def model_cases(size, now, rng):
+    from fintech.models import Investment, Loan
+
+    loans = [
+        Loan(
+            amount=Decimal(rng.randrange(100, 50000)),
+            interest_rate=rng.choice(INTEREST_RATES),
+            start_date=now - timedelta(days=rng.randrange(0, 365)),
+            due_date=now + timedelta(days=rng.randrange(30, 730)),
+        )
+        for _ in range(size)
+    ]
+    investments = [
+        Investment(
+            amount=Decimal(rng.randrange(100, 50000)),
+            annual_return_rate=rng.choice(RETURN_RATES),
+            date=now - timedelta(days=rng.randrange(0, 1500)),
+        )
+        for _ in range(size)
+    ]
+    return {
+        'loan.calculate_interest': lambda: [loan.calculate_interest() for loan in loans],
+        'loan.total_repayment_amount': lambda: [loan.total_repayment_amount() for loan in loans],
+        'investment.calculate_returns': lambda: [investment.calculate_returns(now) for investment in investments],
+    }
+
+
+def seed_group(size, now, rng):
+    """A group with ``size`` contributions and investments spread over a year"""
+    from django.contrib.auth.models import User
+    from fintech.models import Contribution, GroupMembership, Investment, SavingsGroup
+    from fintech.services import rebuild_group_rollups
+
+    group = SavingsGroup.objects.create(name=f'Bench {size}')
+    member_count = max(size // 100, 1)
+    users = User.objects.bulk_create(User(username=f'bench{size}-{i}') for i in range(member_count))
+    members = GroupMembership.objects.bulk_create(GroupMembership(user=user, group=group) for user in users)
+    contributions = Contribution.objects.bulk_create(
+        Contribution(
+            member=members[i % member_count],
+            amount=Decimal(rng.randrange(10, 500)),
+            transaction_type='DEPOSIT' if i % 5 else 'WITHDRAWAL',
+        )
+        for i in range(size)
+    )
+    # auto_now_add stamps every row with the insert time; spread them out afterwards
+    for contribution in contributions:
+        contribution.date = now - timedelta(days=rng.randrange(0, 365))
+    Contribution.objects.bulk_update(contributions, ['date'], batch_size=2000)
+    Investment.objects.bulk_create(
+        Investment(
+            group=group,
+            investment_type='BONDS',
+            amount=Decimal(rng.randrange(100, 5000)),
+            current_value=Decimal('0.00'),
+            annual_return_rate=rng.choice(RETURN_RATES),
+            provider='Bench',
+            date=now - timedelta(days=rng.randrange(0, 1500)),
+        )
+        for _ in range(size)
+    )
+    rebuild_group_rollups([group.pk])
+    return group, [member.pk for member in members]
+
+
+def service_cases(size, now, rng):
+    from fintech import services
+
+    group, member_ids = seed_group(size, now, rng)
+    revaluation_dates = iter(now + timedelta(days=day) for day in range(1, 10000))
+    return {
+        'services.calculate_group_analytics': lambda: services.calculate_group_analytics(group),
+        'services.group_daily_series': lambda: services.group_daily_series(group, 366),
+        'services.group_loan_eligibility': lambda: services.group_loan_eligibility(group),
+        'services.reconcile_member_totals': lambda: services.reconcile_member_totals(member_ids),
+        'services.rebuild_group_rollups': lambda: services.rebuild_group_rollups([group.pk]),
+        # A new valuation date each run, so every run rewrites every row
+        'services.revalue_investments': lambda: services.revalue_investments(
+            resume=False, as_of=next(revaluation_dates)
+        ),
+    }
+
+
+def run(sizes, repeat):
+    from django.utils import timezone
+
+    now = timezone.now()
+    results = {'calibration': measure(calibration, repeat)}
+    with test_database():
+        for size in sizes:
+            rng = random.Random(size)
+            cases = model_cases(size, now, rng)
+            cases.update(service_cases(size, now, rng))
+            for name, function in cases.items():
+                results[f'{name}[n={size}]'] = measure(function, repeat)
+    return results
+
+
+def compare(results, baseline, threshold, normalize=True):
+    """Print each case against the baseline; return the names of regressions
+
+    With ``normalize`` the baseline is first scaled by how much slower or
+    faster the calibration workload ran, so a busier or throttled machine
+    doesn't read as a regression.
+    """
+    scale = 1.0
+    if normalize:
+        scale = results['calibration']['best_s'] / baseline['cases']['calibration']['best_s']
+        print(f'  machine speed relative to baseline: {1 / scale:.2f}x')
+    regressions = []
+    for name, result in results.items():
+        if name == 'calibration':
+            continue
+        stored = baseline['cases'].get(name)
+        if stored is None:
+            print(f'  {name:55s} {result["best_s"] * 1000:10.2f} ms   (not in baseline)')
+            continue
+        change = result['best_s'] / (stored['best_s'] * scale) - 1
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f'  {name:55s} {result["best_s"] * 1000:10.2f} ms  {change:+7.1%}{flag}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--baseline', type=Path, default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the baseline')
+    parser.add_argument('--compare', action='store_true', help='compare against the stored baseline')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed slowdown before flagging')
+    parser.add_argument('--raw', action='store_true', help="compare raw times, don't scale for machine speed")
+    args = parser.parse_args()
+
+    setup_django()
+    results = run(args.sizes, args.repeat)
+
+    if args.compare:
+        baseline = json.loads(args.baseline.read_text())
+        print(f'best of {args.repeat} runs against {args.baseline.name} (threshold {args.threshold:.0%})')
+        regressions = compare(results, baseline, args.threshold, normalize=not args.raw)
+        if regressions:
+            print(f'{len(regressions)} case(s) regressed beyond {args.threshold:.0%}')
+            sys.exit(1)
+        return
+
+    print(f'best of {args.repeat} runs')
+    for name, result in results.items():
+        print(f'  {name:55s} {result["best_s"] * 1000:10.2f} ms')
+    if args.save_baseline:
+        args.baseline.parent.mkdir(exist_ok=True)
+        args.baseline.write_text(json.dumps({
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'repeat': args.repeat,
+            'cases': results,
+        }, indent=2, sort_keys=True) + '\n')
+        print(f'baseline written to {args.baseline}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Compare contribution write throughput across the WAKALA_DB_PROFILE setups.
+
+    python -m benchmarks.bench_db_profiles --threads 1 8 16 --posts 400
+
+Each profile runs in its own process with WAKALA_DB_PROFILE set, so it is
+configured exactly as settings.py configures it, on a throwaway database
+(a temporary file for SQLite, a test database for PostgreSQL). Worker
+threads post contributions through ``Contribution.objects.create`` and
+wrap every post in the request lifecycle's connection handling, so
+CONN_MAX_AGE and pooling take effect as they would under a WSGI server.
+
+PostgreSQL is included when WAKALA_DB_HOST is set, or when asked for with
+--profiles; point the WAKALA_DB_* variables at any local instance.
+"""
+import argparse
+import json
+import os
+import queue
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+from benchmarks.common import ROOT, setup_django, test_database
+
+
+def run_round(threads, posts, groups):
+    from django.contrib.auth.models import User
+    from django.db import OperationalError, close_old_connections, connection
+    from fintech.models import Contribution, GroupMembership, SavingsGroup
+
+    group_rows = [SavingsGroup.objects.create(name=f'Profile {threads}-{i}') for i in range(groups)]
+    members = [
+        GroupMembership.objects.create(
+            user=User.objects.create_user(username=f'profile{threads}-{i}'),
+            group=group
+        ).pk
+        for i, group in enumerate(group_rows)
+    ]
+    work = queue.SimpleQueue()
+    for i in range(posts):
+        work.put(members[i % len(members)])
+    failures = []
+
+    def worker():
+        try:
+            while True:
+                try:
+                    member_id = work.get_nowait()
+                except queue.Empty:
+                    return
+                close_old_connections()
+                try:
+                    member = GroupMembership.objects.select_related('group', 'user').get(pk=member_id)
+                    Contribution.objects.create(member=member, amount=Decimal('10.00'), transaction_type='DEPOSIT')
+                except OperationalError as exc:
+                    failures.append(str(exc))
+                finally:
+                    close_old_connections()
+        finally:
+            connection.close()
+
+    start = time.perf_counter()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return {
+        'threads': threads,
+        'posts_per_s': round((posts - len(failures)) / elapsed, 1),
+        'failed': len(failures),
+        'first_error': failures[0] if failures else None,
+    }
+
+
+def worker_main(args):
+    setup_django()
+    from django.db import connection
+
+    name = None
+    if connection.vendor == 'sqlite':
+        # Threads need a shared file database
+        name = os.path.join(tempfile.mkdtemp(), 'profile.sqlite3')
+    rounds = []
+    with test_database(name=name):
+        for threads in args.threads:
+            rounds.append(run_round(threads, args.posts, args.groups))
+        connection.close()
+    print(json.dumps(rounds))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profiles', nargs='+')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 8, 16])
+    parser.add_argument('--posts', type=int, default=400, help='contributions per round')
+    parser.add_argument('--groups', type=int, default=4)
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker_main(args)
+        return
+
+    profiles = args.profiles or ['sqlite-basic', 'sqlite'] + (['postgres'] if os.environ.get('WAKALA_DB_HOST') else [])
+    command = [
+        sys.executable, '-m', 'benchmarks.bench_db_profiles', '--worker',
+        '--posts', str(args.posts), '--groups', str(args.groups),
+        '--threads', *map(str, args.threads),
+    ]
+    print(f'{args.posts} contributions per round over {args.groups} groups')
+    failed = False
+    for profile in profiles:
+        env = dict(os.environ, WAKALA_DB_PROFILE=profile)
+        result = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+        if result.returncode:
+            print(f'  {profile:13s} did not run: {result.stderr.strip().splitlines()[-1]}')
+            failed = True
+            continue
+        for row in json.loads(result.stdout.strip().splitlines()[-1]):
+            line = f'  {profile:13s} {row["threads"]:3d} threads  {row["posts_per_s"]:8.1f} posts/s'
+            if row['failed']:
+                line += f'  {row["failed"]} failed ({row["first_error"]})'
+            print(line)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Compare approving a meeting's loans one request at a time against one batch review.
+
+    python -m benchmarks.bench_loan_review --size 200
+"""
+import argparse
+from datetime import timedelta
+from decimal import Decimal
+
+from benchmarks.common import setup_django, test_database, timed
+
+
+def seed(prefix, member_count, group_count, loan_count):
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+    from fintech.models import Contribution, GroupMembership, Loan, SavingsGroup
+
+    groups = [SavingsGroup.objects.create(name=f'{prefix} group {i}') for i in range(group_count)]
+    admin = User.objects.create_user(username=f'{prefix}-admin')
+    for group in groups:
+        GroupMembership.objects.create(user=admin, group=group, role='ADMIN')
+    memberships = []
+    for i in range(member_count):
+        user = User.objects.create_user(username=f'{prefix}{i}')
+        member = GroupMembership.objects.create(user=user, group=groups[i % group_count])
+        Contribution.objects.create(member=member, amount=Decimal('10000.00'), transaction_type='DEPOSIT')
+        memberships.append(member)
+    due = timezone.now() + timedelta(days=180)
+    loans = [
+        Loan.objects.create(
+            borrower=memberships[i % member_count], amount=Decimal('50.00'),
+            interest_rate=Decimal('10.00'), due_date=due
+        ).pk
+        for i in range(loan_count)
+    ]
+    return admin, loans
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=200, help='loans approved per meeting')
+    parser.add_argument('--members', type=int, default=50)
+    parser.add_argument('--groups', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.test import APIClient
+
+    with test_database():
+        admin, single_loans = seed('single', args.members, args.groups, args.size)
+        batch_admin, batch_loans = seed('batch', args.members, args.groups, args.size)
+        client = APIClient()
+        client.force_authenticate(admin)
+        results = {}
+
+        with CaptureQueriesContext(connection) as single_queries, timed(results, 'single'):
+            for pk in single_loans:
+                assert client.post(f'/api/loans/{pk}/approve/').status_code == 200
+
+        client.force_authenticate(batch_admin)
+        with CaptureQueriesContext(connection) as batch_queries, timed(results, 'batch'):
+            response = client.post('/api/loans/review/', {'approve': batch_loans}, format='json')
+        assert len(response.data['approved']) == args.size, response.data['skipped'][:5]
+
+        print(f'{args.size} loans across {args.groups} groups')
+        print(f"  one by one: {len(single_queries):6d} queries  {results['single'] * 1000:8.1f} ms")
+        print(f"  batch:      {len(batch_queries):6d} queries  {results['batch'] * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Compare page-number and cursor pagination latency at shallow and deep pages.
+
+    python -m benchmarks.bench_pagination --rows 100000 --page 10000
+
+Offset pagination runs COUNT(*) and scans past every skipped row, so its
+latency grows with depth; the cursor version should stay flat.
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks.common import setup_django, test_database
+
+
+def seed(rows):
+    from django.contrib.auth.models import User
+    from fintech.models import Notification
+
+    user = User.objects.create_user(username='bench-reader')
+    batch = []
+    for i in range(rows):
+        batch.append(Notification(user=user, title='Bench', message='Message', notification_type='ALERT'))
+        if len(batch) == 5000:
+            Notification.objects.bulk_create(batch)
+            batch = []
+    Notification.objects.bulk_create(batch)
+    return user
+
+
+def measure(client, url, repeat):
+    timings = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        response = client.get(url)
+        timings.append((time.perf_counter() - begin) * 1000)
+        assert response.status_code == 200, response.content
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--page', type=int, default=10000, help='deep page to compare against page 1')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from rest_framework.pagination import Cursor, PageNumberPagination
+    from rest_framework.test import APIClient
+    from fintech.models import Notification
+    from fintech.pagination import NotificationPagination
+    from fintech.views import NotificationViewSet
+
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    with test_database():
+        user = seed(args.rows)
+        client = APIClient()
+        client.force_authenticate(user)
+
+        depth = (args.page - 1) * page_size
+        boundary = Notification.objects.filter(user=user).order_by('-created_at', '-id')[depth - 1]
+        paginator = NotificationPagination()
+        paginator.base_url = '/api/notifications/'
+        deep_cursor_url = paginator.encode_cursor(Cursor(offset=0, reverse=False, position=str(boundary.created_at)))
+
+        NotificationViewSet.pagination_class = PageNumberPagination
+        offset_first = measure(client, '/api/notifications/?page=1', args.repeat)
+        offset_deep = measure(client, f'/api/notifications/?page={args.page}', args.repeat)
+
+        NotificationViewSet.pagination_class = NotificationPagination
+        cursor_first = measure(client, '/api/notifications/', args.repeat)
+        cursor_deep = measure(client, deep_cursor_url, args.repeat)
+
+    print(f'{args.rows} notifications, page size {page_size}, median of {args.repeat} requests')
+    print(f'  page number: page 1 {offset_first:7.2f} ms   page {args.page} {offset_deep:7.2f} ms')
+    print(f'  cursor:      page 1 {cursor_first:7.2f} ms   page {args.page} {cursor_deep:7.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
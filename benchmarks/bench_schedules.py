@@ -0,0 +1,66 @@
+"""
+Time repayment schedules for a large loan book.
+
+    python -m benchmarks.bench_schedules --loans 50000
+
+Builds flat and reducing-balance schedules for unsaved loans with a spread
+of amounts, rates and terms, renders them as the API payload, and checks
+that every schedule's instalments add up to its totals to the cent.
+"""
+import argparse
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from benchmarks.common import setup_django, timed
+
+RATES = [Decimal(rate) for rate in ('5.00', '8.25', '10.00', '12.50', '15.00', '20.00')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--loans', type=int, default=50000)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.utils import timezone
+    from fintech.models import Loan
+    from fintech.schedules import SCHEDULE_METHODS, loan_book_payload, loan_book_schedules
+
+    rng = random.Random(1)
+    now = timezone.now()
+    # Loans are issued at meetings, so start dates repeat
+    meetings = [now - timedelta(weeks=week) for week in range(26)]
+    loans = []
+    for pk in range(args.loans):
+        start = rng.choice(meetings)
+        loans.append(Loan(
+            pk=pk,
+            amount=Decimal(rng.randrange(1000, 5000000)) / 100,
+            interest_rate=rng.choice(RATES),
+            start_date=start,
+            due_date=start + timedelta(days=30 * rng.randrange(1, 25)),
+        ))
+
+    print(f'{args.loans} loans')
+    for method in SCHEDULE_METHODS:
+        results = {}
+        with timed(results, 'schedules'):
+            schedules = loan_book_schedules(loans, method)
+        with timed(results, 'payload'):
+            loan_book_payload(schedules)
+        instalments = 0
+        for schedule in schedules:
+            rows = schedule.instalments
+            instalments += len(rows)
+            assert sum(row.payment for row in rows) == schedule.total_payment
+            assert sum(row.principal for row in rows) == schedule.total_principal
+            assert rows[-1].balance == 0
+        print(
+            f'  {method:9s} {instalments:8d} instalments  '
+            f'schedules {results["schedules"]:6.2f}s  payload {results["payload"]:6.2f}s'
+        )
+
+
+if __name__ == '__main__':
+    main()
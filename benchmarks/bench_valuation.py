@@ -0,0 +1,68 @@
+"""
+Measure the growth-factor cache on a portfolio of unsaved investments.
+
+    python -m benchmarks.bench_valuation --investments 100000
+
+Values the portfolio with the uncached Decimal power, then with
+``Investment.calculate_returns`` on a cold and on a warm cache, and checks
+the three produce exactly the same quantized values.
+"""
+import argparse
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from benchmarks.common import setup_django, timed
+
+RETURN_RATES = [Decimal(rate) for rate in ('3.00', '4.50', '6.00', '8.00', '8.50', '10.00', '12.00')]
+
+
+def uncached_returns(investment, as_of):
+    days = (as_of - investment.date).days
+    rate = investment.annual_return_rate / Decimal('100.00')
+    return investment.amount * (Decimal('1.00') + rate) ** (Decimal(days) / Decimal('365')) - investment.amount
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--investments', type=int, default=100000)
+    parser.add_argument('--max-age', type=int, default=1825, help='oldest investment, in days')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.utils import timezone
+    from fintech.models import Investment
+    from fintech.valuation import clear_growth_factor_cache, growth_factor_cache_info
+
+    rng = random.Random(1)
+    now = timezone.now()
+    portfolio = [
+        Investment(
+            amount=Decimal(rng.randrange(100, 100000)),
+            annual_return_rate=rng.choice(RETURN_RATES),
+            date=now - timedelta(days=rng.randrange(0, args.max_age)),
+        )
+        for _ in range(args.investments)
+    ]
+    cent = Decimal('0.01')
+    results = {}
+
+    with timed(results, 'uncached'):
+        expected = [(i.amount + uncached_returns(i, now)).quantize(cent) for i in portfolio]
+    clear_growth_factor_cache()
+    with timed(results, 'cold cache'):
+        cold = [(i.amount + i.calculate_returns(now)).quantize(cent) for i in portfolio]
+    with timed(results, 'warm cache'):
+        warm = [(i.amount + i.calculate_returns(now)).quantize(cent) for i in portfolio]
+
+    assert cold == expected and warm == expected, 'cached valuations differ from the uncached ones'
+    info = growth_factor_cache_info()
+    print(f'{args.investments} investments, {len(RETURN_RATES)} rates, ages up to {args.max_age} days')
+    print(f'  cache: {info.currsize} factors, {info.hits} hits, {info.misses} misses')
+    for label, seconds in results.items():
+        speedup = results['uncached'] / seconds
+        print(f'  {label:10s} {seconds:7.3f}s  {speedup:5.1f}x')
+
+
+if __name__ == '__main__':
+    main()
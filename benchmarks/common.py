@@ -0,0 +1,59 @@
+"""
+Shared helpers for the standalone benchmark scripts.
+
+Run a benchmark from the project root, e.g.::
+
+    python -m benchmarks.bench_bulk_contributions
+
+Each script creates a throwaway test database, so it never touches db.sqlite3.
+"""
+import os
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def setup_django():
+    """Configure Django for a script running outside manage.py"""
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'wakaladigital.settings')
+    import django
+    django.setup()
+
+
+@contextmanager
+def test_database(verbosity=0, name=None, options=None):
+    """Create a fresh test database for the duration of the block
+
+    ``name`` overrides the test database name, e.g. to get a file-backed
+    SQLite database that several threads can share, and ``options`` is merged
+    into the connection OPTIONS.
+    """
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    if name is not None:
+        connection.settings_dict['TEST']['NAME'] = name
+    if options:
+        connection.settings_dict['OPTIONS'].update(options)
+        settings.DATABASES[connection.alias]['OPTIONS'] = connection.settings_dict['OPTIONS']
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=verbosity, autoclobber=True)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        teardown_test_environment()
+
+
+@contextmanager
+def timed(results, key):
+    """Record the wall-clock time of the block in ``results[key]``"""
+    start = time.perf_counter()
+    yield
+    results[key] = time.perf_counter() - start
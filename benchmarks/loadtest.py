@@ -0,0 +1,314 @@
+"""
+Load-test the API in-process and report per-endpoint throughput and latency.
+
+    python -m benchmarks.loadtest --concurrency 16 --duration 30 --output load.json
+
+The app is served by a threaded wsgiref server on a local port, backed by a
+throwaway SQLite file database seeded with groups, members, contributions
+and notifications. Each virtual user logs in and then replays weighted
+scenarios until the time is up. The report is JSON, so two releases can be
+compared by diffing the per-endpoint rows.
+
+Settings run with DEBUG off, as in production, unless --debug is given.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from http.client import HTTPConnection
+from http.cookies import SimpleCookie
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from benchmarks.common import ROOT, setup_django, test_database
+
+PASSWORD = 'load-test-password'
+
+# Scenario name -> relative weight
+SCENARIOS = {
+    'list_groups': 30,
+    'read_notifications': 25,
+    'post_contribution': 20,
+    'request_loan': 10,
+    'group_detail': 10,
+    'login': 5,
+}
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def seed(groups, members_per_group, history):
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    from fintech.models import GroupMembership, Notification, SavingsGroup
+    from fintech.services import post_contributions_bulk
+
+    # Hash once: create_user would spend most of the seeding time in PBKDF2
+    password = make_password(PASSWORD)
+    group_rows = SavingsGroup.objects.bulk_create(
+        SavingsGroup(name=f'Load Group {i}') for i in range(groups)
+    )
+    users = User.objects.bulk_create(
+        User(username=f'load-user{i}', password=password) for i in range(groups * members_per_group)
+    )
+    memberships = GroupMembership.objects.bulk_create(
+        GroupMembership(user=user, group=group_rows[i // members_per_group])
+        for i, user in enumerate(users)
+    )
+    entries = [
+        {'member': membership, 'amount': Decimal('100.00'), 'transaction_type': 'DEPOSIT'}
+        for membership in memberships
+        for _ in range(history)
+    ]
+    for start in range(0, len(entries), 1000):
+        post_contributions_bulk(entries[start:start + 1000])
+    Notification.objects.bulk_create(
+        Notification(user=user, title='Welcome', message='Seeded', notification_type='ALERT')
+        for user in users
+        for _ in range(history)
+    )
+    return [(user.username, membership.pk, membership.group_id) for user, membership in zip(users, memberships)]
+
+
+class VirtualUser:
+    """One client session: cookies, CSRF token and the member it acts as"""
+
+    def __init__(self, port, username, member_id, group_id, rng, record):
+        self.port = port
+        self.username = username
+        self.member_id = member_id
+        self.group_id = group_id
+        self.rng = rng
+        self.record = record
+        self.cookies = {}
+
+    def request(self, label, method, path, body=None):
+        headers = {'Accept': 'application/json', 'Host': 'localhost'}
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+        if 'csrftoken' in self.cookies:
+            headers['X-CSRFToken'] = self.cookies['csrftoken']
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        connection = HTTPConnection('127.0.0.1', self.port, timeout=60)
+        begin = time.perf_counter()
+        try:
+            connection.request(method, path, payload, headers)
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+            for header in response.headers.get_all('Set-Cookie') or ():
+                for name, morsel in SimpleCookie(header).items():
+                    self.cookies[name] = morsel.value
+        except OSError:
+            status = 0
+        finally:
+            connection.close()
+        self.record(label, time.perf_counter() - begin, status)
+        return status
+
+    def login(self):
+        self.request('GET /api/csrf/', 'GET', '/api/csrf/')
+        return self.request(
+            'POST /api/login/', 'POST', '/api/login/',
+            {'username': self.username, 'password': PASSWORD}
+        )
+
+    def list_groups(self):
+        self.request('GET /api/savings-groups/', 'GET', '/api/savings-groups/')
+
+    def group_detail(self):
+        self.request('GET /api/savings-groups/{id}/', 'GET', f'/api/savings-groups/{self.group_id}/')
+
+    def read_notifications(self):
+        self.request('GET /api/notifications/', 'GET', '/api/notifications/')
+        self.request('GET /api/notifications/unread_count/', 'GET', '/api/notifications/unread_count/')
+
+    def post_contribution(self):
+        self.request('POST /api/contributions/', 'POST', '/api/contributions/', {
+            'member': self.member_id,
+            'amount': str(self.rng.choice((Decimal('25.00'), Decimal('50.00'), Decimal('100.00')))),
+            'transaction_type': 'DEPOSIT',
+        })
+
+    def request_loan(self):
+        from django.utils import timezone
+
+        self.request('POST /api/loans/', 'POST', '/api/loans/', {
+            'borrower': self.member_id,
+            'amount': '200.00',
+            'interest_rate': '5.00',
+            'due_date': (timezone.now() + timedelta(days=30)).isoformat(),
+        })
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timings = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def __call__(self, label, elapsed, status):
+        with self.lock:
+            self.timings[label].append(elapsed * 1000)
+            self.statuses[label][status] += 1
+            if not 200 <= status < 400:
+                self.errors[label] += 1
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    return ordered[max(0, min(len(ordered) - 1, int(round(fraction * len(ordered))) - 1))]
+
+
+def report(recorder, elapsed):
+    endpoints = {}
+    for label, timings in sorted(recorder.timings.items()):
+        ordered = sorted(timings)
+        endpoints[label] = {
+            'requests': len(ordered),
+            'errors': recorder.errors[label],
+            'status_codes': {str(code): count for code, count in sorted(recorder.statuses[label].items())},
+            'throughput_rps': round(len(ordered) / elapsed, 2),
+            'mean_ms': round(sum(ordered) / len(ordered), 2),
+            'p50_ms': round(percentile(ordered, 0.50), 2),
+            'p95_ms': round(percentile(ordered, 0.95), 2),
+            'p99_ms': round(percentile(ordered, 0.99), 2),
+            'max_ms': round(ordered[-1], 2),
+        }
+    total = sum(row['requests'] for row in endpoints.values())
+    return {
+        'requests': total,
+        'errors': sum(row['errors'] for row in endpoints.values()),
+        'throughput_rps': round(total / elapsed, 2),
+        'endpoints': endpoints,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=16, help='virtual users running at once')
+    parser.add_argument('--duration', type=float, default=30, help='seconds of load after login')
+    parser.add_argument('--groups', type=int, default=10)
+    parser.add_argument('--members', type=int, default=20, help='members per group')
+    parser.add_argument('--history', type=int, default=20, help='seeded contributions and notifications per member')
+    parser.add_argument('--seed', type=int, default=1, help='random seed for scenario selection')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    parser.add_argument('--debug', action='store_true', help='run with DEBUG on')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.core.wsgi import get_wsgi_application
+    from django.db import connection
+
+    settings.DEBUG = args.debug
+    settings.ALLOWED_HOSTS = ['localhost', '127.0.0.1']
+
+    options = {}
+    name = None
+    if connection.vendor == 'sqlite':
+        # The server's threads need a shared file database that waits on the
+        # write lock. IMMEDIATE takes that lock at BEGIN: a deferred
+        # transaction that reads and then writes fails with "database is
+        # locked" instead of waiting when another writer got there first.
+        name = os.path.join(tempfile.mkdtemp(), 'loadtest.sqlite3')
+        options = {'timeout': 60, 'init_command': 'PRAGMA journal_mode=WAL;', 'transaction_mode': 'IMMEDIATE'}
+
+    with test_database(name=name, options=options):
+        accounts = seed(args.groups, args.members, args.history)
+        connection.close()
+
+        server = make_server(
+            '127.0.0.1', 0, get_wsgi_application(),
+            server_class=ThreadingWSGIServer, handler_class=QuietHandler
+        )
+        port = server.server_address[1]
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        recorder = Recorder()
+        names = list(SCENARIOS)
+        weights = list(SCENARIOS.values())
+        window = {}
+
+        def open_window():
+            # Initial logins are recorded but don't count towards the timed window
+            with recorder.lock:
+                recorder.timings.clear()
+                recorder.errors.clear()
+                recorder.statuses.clear()
+            window['begin'] = time.perf_counter()
+            window['deadline'] = window['begin'] + args.duration
+
+        start_line = threading.Barrier(args.concurrency + 1, action=open_window)
+
+        def run(worker):
+            rng = random.Random(args.seed * 1000 + worker)
+            username, member_id, group_id = accounts[worker % len(accounts)]
+            user = VirtualUser(port, username, member_id, group_id, rng, recorder)
+            user.login()
+            start_line.wait()
+            while time.perf_counter() < window['deadline']:
+                getattr(user, rng.choices(names, weights)[0])()
+
+        workers = [threading.Thread(target=run, args=(i,)) for i in range(args.concurrency)]
+        for worker in workers:
+            worker.start()
+        start_line.wait()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - window['begin']
+        server.shutdown()
+        server.server_close()
+
+        result = {
+            'revision': git_revision(),
+            'database': connection.vendor,
+            'debug': settings.DEBUG,
+            'concurrency': args.concurrency,
+            'duration_s': round(elapsed, 2),
+            'scenarios': SCENARIOS,
+            'seed': {'groups': args.groups, 'members_per_group': args.members, 'history': args.history},
+        }
+        result.update(report(recorder, elapsed))
+        connection.close()
+
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(text + '\n')
+    else:
+        print(text)
+    sys.exit(1 if result['errors'] else 0)
+
+
+if __name__ == '__main__':
+    main()
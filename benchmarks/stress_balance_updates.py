@@ -0,0 +1,97 @@
+"""
+Hammer group balances from many threads and check that no update is lost.
+
+    python -m benchmarks.stress_balance_updates --groups 1 2 4 --posts 300 --threads 16
+
+Every thread posts contributions through ``Contribution.objects.create``.
+Afterwards each group's balance must equal the sum of its posts and the
+``balance_after`` values of its transaction rows must be exactly the running
+totals, with no duplicates. SQLite serialises writers, so throughput only
+scales with the number of groups on PostgreSQL; point DATABASES at one to
+measure that.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from benchmarks.common import setup_django, test_database
+
+AMOUNT = Decimal('10.00')
+
+
+def run_round(group_count, posts_per_group, threads):
+    from django.contrib.auth.models import User
+    from django.db import close_old_connections, connection
+    from fintech.models import Contribution, GroupMembership, SavingsGroup, TransactionHistory
+
+    groups = [SavingsGroup.objects.create(name=f'Stress {group_count}-{i}') for i in range(group_count)]
+    members = [
+        GroupMembership.objects.create(
+            user=User.objects.create_user(username=f'stress{group_count}-{i}'),
+            group=group
+        )
+        for i, group in enumerate(groups)
+    ]
+    member_ids = [m.pk for m in members for _ in range(posts_per_group)]
+
+    def post(member_id):
+        try:
+            member = GroupMembership.objects.select_related('group', 'user').get(pk=member_id)
+            Contribution.objects.create(member=member, amount=AMOUNT, transaction_type='DEPOSIT')
+        finally:
+            connection.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(post, member_ids))
+    elapsed = time.perf_counter() - start
+    close_old_connections()
+
+    failures = []
+    for group, member in zip(groups, members):
+        group.refresh_from_db()
+        expected = AMOUNT * posts_per_group
+        if group.total_balance != expected:
+            failures.append(f'{group.name}: balance {group.total_balance} != {expected}')
+        balances = sorted(
+            TransactionHistory.objects.filter(user=member.user).values_list('balance_after', flat=True)
+        )
+        if balances != [AMOUNT * (i + 1) for i in range(posts_per_group)]:
+            failures.append(f'{group.name}: balance_after values are not the running totals')
+    return len(member_ids) / elapsed, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--groups', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--posts', type=int, default=300, help='posts per group')
+    parser.add_argument('--threads', type=int, default=16)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+
+    options = {}
+    name = None
+    if connection.vendor == 'sqlite':
+        # Threads need a shared file database that waits on the write lock
+        name = os.path.join(tempfile.mkdtemp(), 'stress.sqlite3')
+        options = {'timeout': 60, 'init_command': 'PRAGMA journal_mode=WAL;'}
+
+    failed = False
+    with test_database(name=name, options=options):
+        for group_count in args.groups:
+            rate, failures = run_round(group_count, args.posts, args.threads)
+            print(f'{group_count:3d} groups: {rate:8.1f} posts/s  {"OK" if not failures else "LOST UPDATES"}')
+            for failure in failures:
+                print(f'    {failure}')
+            failed = failed or bool(failures)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
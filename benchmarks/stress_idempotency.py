@@ -0,0 +1,109 @@
+"""
+Submit the same contribution concurrently under one Idempotency-Key and
+check that it's posted exactly once.
+
+    python -m benchmarks.stress_idempotency --keys 50 --copies 8
+
+For each key, ``--copies`` threads release the same POST at once, as a
+client retrying over a flaky network might. Every copy must get the first
+copy's 201 response, and the ledger must hold exactly one contribution,
+one transaction row and one balance change per key.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+from benchmarks.common import setup_django, test_database
+
+AMOUNT = Decimal('10.00')
+
+
+def submit_copies(user, member_id, key, copies):
+    from django.db import connection
+    from rest_framework.test import APIClient
+
+    barrier = threading.Barrier(copies)
+    responses = []
+
+    def submit():
+        client = APIClient()
+        client.force_authenticate(user)
+        barrier.wait()
+        try:
+            responses.append(client.post(
+                '/api/contributions/',
+                {'member': member_id, 'amount': str(AMOUNT), 'transaction_type': 'DEPOSIT'},
+                format='json',
+                HTTP_IDEMPOTENCY_KEY=key
+            ))
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=submit) for _ in range(copies)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return responses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--keys', type=int, default=50)
+    parser.add_argument('--copies', type=int, default=8, help='concurrent submissions per key')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from fintech.models import Contribution, GroupMembership, SavingsGroup, TransactionHistory
+
+    name = None
+    if connection.vendor == 'sqlite':
+        # Threads need a shared file database that waits on the write lock
+        name = os.path.join(tempfile.mkdtemp(), 'idempotency.sqlite3')
+
+    failures = []
+    replayed = 0
+    with test_database(name=name):
+        user = User.objects.create_user(username='retrying-agent')
+        group = SavingsGroup.objects.create(name='Flaky Network')
+        member = GroupMembership.objects.create(user=user, group=group)
+
+        start = time.perf_counter()
+        for i in range(args.keys):
+            key = f'tap-{i}'
+            responses = submit_copies(user, member.pk, key, args.copies)
+            codes = sorted(response.status_code for response in responses)
+            if codes != [201] * args.copies:
+                failures.append(f'{key}: status codes {codes}')
+                continue
+            ids = {response.json()['id'] for response in responses}
+            if len(ids) != 1:
+                failures.append(f'{key}: {len(ids)} different contributions returned')
+            replayed += sum(response.get('Idempotent-Replayed') == 'true' for response in responses)
+        elapsed = time.perf_counter() - start
+        connection.close()
+
+        contributions = Contribution.objects.filter(member=member).count()
+        transactions = TransactionHistory.objects.filter(user=user).count()
+        group.refresh_from_db()
+        if contributions != args.keys or transactions != args.keys:
+            failures.append(f'{contributions} contributions and {transactions} transactions for {args.keys} keys')
+        if group.total_balance != AMOUNT * args.keys:
+            failures.append(f'balance {group.total_balance} != {AMOUNT * args.keys}')
+
+    total = args.keys * args.copies
+    print(f'{total} submissions of {args.keys} keys in {elapsed:.2f}s ({total / elapsed:.1f}/s), {replayed} replayed')
+    print('OK' if not failures else 'DUPLICATES OR ERRORS')
+    for failure in failures:
+        print(f'    {failure}')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,45 +2,69 @@ from django.contrib import admin
 from .models import (
     SavingsGroup, GroupMembership, Contribution,
     Loan, Investment, FinancialEducation,
-    UserProgress, Notification
+    UserProgress, Notification, InvestmentRevaluationRun, OutboundEmail
 )
+from .routers import SAFE_METHODS, read_from_replica
+
+class ReplicaChangelistAdmin(admin.ModelAdmin):
+    """Serve changelist pages from the read replica"""
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method not in SAFE_METHODS:
+            # Bulk actions and list_editable saves
+            return super().changelist_view(request, extra_context)
+        with read_from_replica():
+            response = super().changelist_view(request, extra_context)
+            # The result list is only queried when the template renders
+            if hasattr(response, 'render'):
+                response.render()
+        return response
 
 @admin.register(SavingsGroup)
-class SavingsGroupAdmin(admin.ModelAdmin):
+class SavingsGroupAdmin(ReplicaChangelistAdmin):
     list_display = ('name', 'total_balance', 'risk_tolerance', 'tier_level')
     search_fields = ('name',)
 
 @admin.register(GroupMembership)
-class GroupMembershipAdmin(admin.ModelAdmin):
+class GroupMembershipAdmin(ReplicaChangelistAdmin):
     list_display = ('user', 'group', 'role', 'joined_at')
     list_filter = ('role',)
 
 @admin.register(Contribution)
-class ContributionAdmin(admin.ModelAdmin):
+class ContributionAdmin(ReplicaChangelistAdmin):
     list_display = ('member', 'amount', 'date', 'transaction_type')
     list_filter = ('transaction_type',)
 
 @admin.register(Loan)
-class LoanAdmin(admin.ModelAdmin):
+class LoanAdmin(ReplicaChangelistAdmin):
     list_display = ('borrower', 'amount', 'interest_rate', 'status', 'due_date')
     list_filter = ('status',)
 
 @admin.register(Investment)
-class InvestmentAdmin(admin.ModelAdmin):
+class InvestmentAdmin(ReplicaChangelistAdmin):
     list_display = ('group', 'investment_type', 'amount', 'current_value', 'provider')
     list_filter = ('investment_type', 'provider')
 
+@admin.register(InvestmentRevaluationRun)
+class InvestmentRevaluationRunAdmin(ReplicaChangelistAdmin):
+    list_display = ('as_of', 'started_at', 'completed_at', 'rows_processed')
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(ReplicaChangelistAdmin):
+    list_display = ('recipient', 'subject', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+
 @admin.register(FinancialEducation)
-class FinancialEducationAdmin(admin.ModelAdmin):
+class FinancialEducationAdmin(ReplicaChangelistAdmin):
     list_display = ('title', 'difficulty_level', 'points')
     list_filter = ('difficulty_level',)
 
 @admin.register(UserProgress)
-class UserProgressAdmin(admin.ModelAdmin):
+class UserProgressAdmin(ReplicaChangelistAdmin):
     list_display = ('user', 'module', 'completed', 'score')
     list_filter = ('completed',)
 
 @admin.register(Notification)
-class NotificationAdmin(admin.ModelAdmin):
+class NotificationAdmin(ReplicaChangelistAdmin):
     list_display = ('user', 'title', 'notification_type', 'created_at', 'read')
     list_filter = ('notification_type', 'read')
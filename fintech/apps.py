@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class FintechConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'fintech'
+
+    def ready(self):
+        # Connects the signal receivers that keep the token principal cache fresh
+        from . import authentication  # noqa: F401
@@ -0,0 +1,244 @@
+"""
+Async views for the ASGI entry point.
+
+They run next to the DRF viewsets under /api/async/ and use the async ORM,
+so a request waiting on the database does not hold a worker thread. The
+responses match what the corresponding viewset returns.
+"""
+import asyncio
+import base64
+import copy
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.utils.encoders import JSONEncoder
+
+from .authentication import aauthenticate_token, header_token
+from .events import get_broker, notification_message, user_channel
+from .models import Contribution, GroupMembership, Notification, SavingsGroup
+from .serializers import (
+    ContributionSerializer, GroupMembershipSerializer,
+    NotificationSerializer, SavingsGroupSerializer
+)
+from .services import acalculate_group_analytics, group_daily_series_queryset
+
+# Notifications replayed to a client reconnecting with Last-Event-ID
+STREAM_REPLAY_LIMIT = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def not_authenticated():
+    return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=403)
+
+
+async def authenticate(request):
+    """Return ``(user, None)``, or ``(None, error response)`` if the request isn't authenticated
+
+    Accepts the ``Authorization: Token`` header of the DRF views as well as
+    the session.
+    """
+    try:
+        token = header_token(request)
+        if token is not None:
+            principal = await aauthenticate_token(token)
+            return copy.copy(principal.user), None
+    except AuthenticationFailed as exc:
+        # 403 like the DRF views, where session authentication comes first
+        return None, JsonResponse({'detail': exc.detail}, status=403)
+    user = await request.auser()
+    if not user.is_authenticated:
+        return None, not_authenticated()
+    return user, None
+
+
+def api_response(data):
+    """JSON response encoded the way DRF's JSONRenderer encodes it"""
+    return JsonResponse(data, encoder=JSONEncoder, safe=False)
+
+
+def not_found():
+    return JsonResponse({'detail': 'Not found.'}, status=404)
+
+
+def requested_page_size(request):
+    default = settings.REST_FRAMEWORK['PAGE_SIZE']
+    try:
+        size = int(request.GET.get('page_size', default))
+    except ValueError:
+        size = default
+    return max(1, min(size, settings.CURSOR_PAGINATION_MAX_PAGE_SIZE))
+
+
+def encode_cursor(timestamp, pk):
+    return base64.urlsafe_b64encode(f'{timestamp.isoformat()}|{pk}'.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        timestamp, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise InvalidCursor(cursor) from exc
+
+
+async def keyset_page(request, queryset, time_field, serializer_class):
+    """Newest-first page of ``queryset`` starting after the ``before`` cursor
+
+    Pages on (time_field, id), the same order and indexes as the cursor
+    pagination of the sync endpoints.
+    """
+    size = requested_page_size(request)
+    queryset = queryset.order_by(f'-{time_field}', '-id')
+    before = request.GET.get('before')
+    if before:
+        timestamp, pk = decode_cursor(before)
+        queryset = queryset.filter(
+            Q(**{f'{time_field}__lt': timestamp}) | Q(**{time_field: timestamp, 'id__lt': pk})
+        )
+    rows = [row async for row in queryset[:size + 1]]
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_cursor = encode_cursor(getattr(rows[-1], time_field), rows[-1].pk)
+    return {'next': next_cursor, 'results': serializer_class(rows, many=True).data}
+
+
+async def group_detail(request, pk):
+    user, denied = await authenticate(request)
+    if denied:
+        return denied
+    try:
+        group = await SavingsGroup.objects.prefetch_related('members').aget(pk=pk)
+    except SavingsGroup.DoesNotExist:
+        return not_found()
+    return api_response(SavingsGroupSerializer(group).data)
+
+group_detail.query_budget = 4
+group_detail.replica_reads = True
+
+
+async def group_members(request, pk):
+    user, denied = await authenticate(request)
+    if denied:
+        return denied
+    if not await SavingsGroup.objects.filter(pk=pk).aexists():
+        return not_found()
+    memberships = [
+        membership async for membership in
+        GroupMembership.objects.filter(group_id=pk).select_related('user')
+    ]
+    return api_response(GroupMembershipSerializer(memberships, many=True).data)
+
+group_members.query_budget = 4
+group_members.replica_reads = True
+
+
+async def group_analytics(request, pk):
+    user, denied = await authenticate(request)
+    if denied:
+        return denied
+    try:
+        days = min(int(request.GET.get('days', 30)), 366)
+    except ValueError:
+        return JsonResponse({'detail': 'days must be an integer'}, status=400)
+    try:
+        group = await SavingsGroup.objects.aget(pk=pk)
+    except SavingsGroup.DoesNotExist:
+        return not_found()
+    data = await acalculate_group_analytics(group)
+    data['daily'] = [row async for row in group_daily_series_queryset(group, days)]
+    return api_response(data)
+
+group_analytics.query_budget = 5
+group_analytics.replica_reads = True
+
+
+async def my_contributions(request):
+    user, denied = await authenticate(request)
+    if denied:
+        return denied
+    try:
+        page = await keyset_page(
+            request, Contribution.objects.filter(member__user=user), 'date', ContributionSerializer
+        )
+    except InvalidCursor:
+        return JsonResponse({'detail': 'Invalid cursor.'}, status=400)
+    return api_response(page)
+
+my_contributions.query_budget = 3
+my_contributions.replica_reads = True
+
+
+async def my_notifications(request):
+    user, denied = await authenticate(request)
+    if denied:
+        return denied
+    try:
+        page = await keyset_page(
+            request, Notification.objects.filter(user=user), 'created_at', NotificationSerializer
+        )
+    except InvalidCursor:
+        return JsonResponse({'detail': 'Invalid cursor.'}, status=400)
+    return api_response(page)
+
+my_notifications.query_budget = 3
+my_notifications.replica_reads = True
+
+
+def sse_event(message):
+    return f"id: {message['id']}\nevent: notification\ndata: {json.dumps(message)}\n\n"
+
+
+async def notification_stream(request):
+    """Server-sent event stream of the user's new notifications
+
+    Each connection is a coroutine waiting on its broker subscription, so idle
+    clients hold no thread. A comment line is sent every
+    NOTIFICATION_STREAM_HEARTBEAT seconds to keep proxies from closing the
+    connection, and reconnecting clients get what they missed via
+    Last-Event-ID. Browsers' EventSource can't set headers, so they
+    authenticate with the session; other clients may send a token.
+    """
+    user, denied = await authenticate(request)
+    if denied:
+        return denied
+
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID', 0))
+    except ValueError:
+        last_event_id = 0
+
+    async def events():
+        subscription = get_broker().subscribe(user_channel(user.pk))
+        try:
+            yield 'retry: 5000\n\n'
+            if last_event_id:
+                missed = Notification.objects.filter(
+                    user_id=user.pk, pk__gt=last_event_id
+                ).order_by('pk')[:STREAM_REPLAY_LIMIT]
+                async for notification in missed:
+                    yield sse_event(notification_message(notification))
+            while True:
+                try:
+                    message = await asyncio.wait_for(
+                        subscription.get(),
+                        timeout=settings.NOTIFICATION_STREAM_HEARTBEAT
+                    )
+                except asyncio.TimeoutError:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield sse_event(message)
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
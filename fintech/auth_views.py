@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.http import JsonResponse
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.views.decorators.http import require_POST
@@ -7,6 +8,7 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import status
+from .authentication import Principal, issue_api_token, revoke_api_tokens
 
 @ensure_csrf_cookie
 def get_csrf_token(request):
@@ -42,13 +44,19 @@ def login_view(request):
         }, status=status.HTTP_400_BAD_REQUEST)
     
     login(request, user)
-    return Response({'detail': 'Successfully logged in'})
+    return Response({
+        'detail': 'Successfully logged in',
+        'token': issue_api_token(user),
+        'expires_in': settings.API_TOKEN_MAX_AGE
+    })
 
 @require_POST
 @api_view(['POST'])
 def logout_view(request):
     """
-    Logout view
+    Logout view; a token-authenticated logout revokes the user's tokens
     """
+    if isinstance(request.auth, Principal):
+        revoke_api_tokens(request.user)
     logout(request)
     return Response({'detail': 'Successfully logged out'})
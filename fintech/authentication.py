@@ -0,0 +1,195 @@
+"""
+Signed, expiring API tokens.
+
+``login_view`` hands out a token alongside the session. Clients send it as
+``Authorization: Token <token>``. The token is a ``TimestampSigner``
+signature of the user's id and token version, so checking it needs no
+database access, and it expires after ``API_TOKEN_MAX_AGE`` seconds.
+
+The user and their memberships are kept in a bounded in-process LRU for
+``API_TOKEN_CACHE_TTL`` seconds, so a warm request authenticates without
+touching the database, and views read the memberships from
+``request.auth`` instead of querying them. Tokens are revoked by bumping
+``UserProfile.api_token_version``: ``revoke_api_tokens()`` evicts the user
+from this process's cache at once, and other processes stop accepting the
+old tokens when their cached entry expires; membership changes reach other
+processes the same way. The async views accept the same tokens.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.signing import BadSignature, SignatureExpired, TimestampSigner
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed
+
+from .models import GroupMembership, UserProfile
+
+TOKEN_KEYWORD = 'Token'
+
+# request.auth of a token-authenticated request; memberships maps group id to role
+Principal = namedtuple('Principal', ['user', 'token_version', 'memberships'])
+
+signer = TimestampSigner(salt='fintech.api-token')
+
+
+class PrincipalCache:
+    """Bounded LRU of principals by user id, each entry expiring after ``ttl``
+
+    ``maxsize`` and ``ttl`` default to API_TOKEN_CACHE_SIZE and
+    API_TOKEN_CACHE_TTL, read on every use.
+    """
+
+    def __init__(self, maxsize=None, ttl=None):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    @property
+    def maxsize(self):
+        return settings.API_TOKEN_CACHE_SIZE if self._maxsize is None else self._maxsize
+
+    @property
+    def ttl(self):
+        return settings.API_TOKEN_CACHE_TTL if self._ttl is None else self._ttl
+
+    def get(self, user_id):
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None or entry[0] < time.monotonic():
+                self.misses += 1
+                return None
+            self.entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, user_id, principal):
+        with self.lock:
+            self.entries[user_id] = (time.monotonic() + self.ttl, principal)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def evict(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = 0
+
+
+principal_cache = PrincipalCache()
+
+
+def token_version(user):
+    profile = getattr(user, 'userprofile', None)
+    return profile.api_token_version if profile is not None else 0
+
+
+def issue_api_token(user):
+    """Return a new API token for ``user``"""
+    return signer.sign(f'{user.pk}:{token_version(user)}')
+
+
+def read_api_token(token):
+    """Return the (user id, token version) a token was issued for
+
+    Raises AuthenticationFailed when the token is forged, malformed or expired.
+    """
+    try:
+        value = signer.unsign(token, max_age=settings.API_TOKEN_MAX_AGE)
+    except SignatureExpired:
+        raise AuthenticationFailed('Token expired')
+    except BadSignature:
+        raise AuthenticationFailed('Invalid token')
+    user_id, version = value.split(':')
+    return int(user_id), int(version)
+
+
+def load_principal(user_id):
+    """Read a user and their memberships and cache them; None if there's no such user"""
+    try:
+        user = User.objects.select_related('userprofile').get(pk=user_id)
+    except User.DoesNotExist:
+        return None
+    memberships = dict(GroupMembership.objects.filter(user_id=user_id).values_list('group_id', 'role'))
+    principal = Principal(user, token_version(user), memberships)
+    principal_cache.put(user_id, principal)
+    return principal
+
+
+def revoke_api_tokens(user):
+    """Invalidate every token issued to ``user`` so far"""
+    UserProfile.objects.filter(user=user).update(api_token_version=F('api_token_version') + 1)
+    principal_cache.evict(user.pk)
+
+
+def header_token(request):
+    """The token of an ``Authorization: Token <token>`` header, or None without one"""
+    header = get_authorization_header(request).split()
+    if not header or header[0].lower() != TOKEN_KEYWORD.lower().encode():
+        return None
+    if len(header) != 2:
+        raise AuthenticationFailed('Invalid token header')
+    try:
+        return header[1].decode()
+    except UnicodeError:
+        raise AuthenticationFailed('Invalid token')
+
+
+def checked_principal(principal, version):
+    if principal is None or not principal.user.is_active or principal.token_version != version:
+        raise AuthenticationFailed('Invalid token')
+    return principal
+
+
+def authenticate_token(token):
+    """Return the principal of a valid token; raises AuthenticationFailed otherwise"""
+    user_id, version = read_api_token(token)
+    return checked_principal(principal_cache.get(user_id) or load_principal(user_id), version)
+
+
+async def aauthenticate_token(token):
+    """Async version of authenticate_token() for the ASGI views"""
+    user_id, version = read_api_token(token)
+    principal = principal_cache.get(user_id) or await sync_to_async(load_principal)(user_id)
+    return checked_principal(principal, version)
+
+
+class APITokenAuthentication(BaseAuthentication):
+    """Authenticate ``Authorization: Token <token>`` headers"""
+    keyword = TOKEN_KEYWORD
+
+    def authenticate(self, request):
+        token = header_token(request)
+        if token is None:
+            return None
+        principal = authenticate_token(token)
+        # Views may modify request.user; the cached instance is shared
+        return copy.copy(principal.user), principal
+
+    def authenticate_header(self, request):
+        return self.keyword
+
+
+@receiver(post_save, sender=GroupMembership)
+@receiver(post_delete, sender=GroupMembership)
+def evict_member(sender, instance, **kwargs):
+    principal_cache.evict(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def evict_user(sender, instance, **kwargs):
+    principal_cache.evict(instance.pk)
@@ -0,0 +1,132 @@
+"""
+Publish/subscribe for pushing new notifications to connected clients.
+
+Publishers call ``publish_notifications()`` from ordinary sync code once
+the rows have committed. Streaming views subscribe from the event loop. The
+broker class comes from the NOTIFICATION_BROKER setting, so a shared broker
+(e.g. Redis) can replace the in-process one without touching the views.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+class Subscription:
+    """One subscriber's queue, bound to the event loop that created it"""
+
+    def __init__(self, broker, channel, max_pending):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=max_pending)
+
+    def deliver(self, message):
+        """Queue a message; safe to call from any thread"""
+        self.loop.call_soon_threadsafe(self._put, message)
+
+    def _put(self, message):
+        if self.queue.full():
+            # A client that stopped reading loses its oldest message, not the newest
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class Broker:
+    """Interface every notification broker implements"""
+
+    def publish(self, channel, message):
+        """Deliver ``message`` (a JSON-serialisable dict) to every subscriber of ``channel``"""
+        raise NotImplementedError
+
+    def subscribe(self, channel):
+        """Return a Subscription; must be called from a running event loop"""
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+
+class InProcessBroker(Broker):
+    """Broker that only reaches subscribers in the current process
+
+    Enough for a single ASGI worker and for tests. Idle subscribers cost a
+    queue each, not a thread.
+    """
+
+    def __init__(self, max_pending=100):
+        self.max_pending = max_pending
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.deliver(message)
+            except RuntimeError:
+                # The subscriber's event loop has shut down
+                self.unsubscribe(subscription)
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel, self.max_pending)
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def subscriber_count(self, channel):
+        with self._lock:
+            return len(self._subscribers.get(channel, ()))
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Return the process-wide broker configured by NOTIFICATION_BROKER"""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.NOTIFICATION_BROKER)()
+    return _broker
+
+
+def notification_message(notification):
+    return {
+        'id': notification.pk,
+        'title': notification.title,
+        'message': notification.message,
+        'notification_type': notification.notification_type,
+        'read': notification.read,
+        'created_at': notification.created_at.isoformat(),
+    }
+
+
+def publish_notifications(notifications):
+    """Push saved notifications to their users' streams"""
+    broker = get_broker()
+    for notification in notifications:
+        broker.publish(user_channel(notification.user_id), notification_message(notification))
@@ -0,0 +1,117 @@
+"""
+Idempotency-Key support for the money-moving create endpoints.
+
+A client that retries a POST sends the same ``Idempotency-Key`` header, and
+gets back the response of the first attempt instead of a second ledger
+entry. Keys are scoped to the user and stored in ``IdempotencyKey``:
+
+* the key row is inserted first, inside the transaction that runs the
+  create, so concurrent duplicates queue on the unique constraint and all
+  but the first fail it, then replay the first one's stored response;
+* a request that raises rolls its key back with everything else, so the
+  client can retry it;
+* completed responses are also kept in the ``idempotency`` cache for
+  ``IDEMPOTENCY_CACHE_TTL`` seconds, so most retries are answered without
+  a database round trip.
+
+Reusing a key for a different request is answered with 422.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+
+def recent_keys():
+    return caches['idempotency']
+
+
+def request_hash(request):
+    body = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder, default=str)
+    return hashlib.sha256(f'{request.method}\0{request.path}\0{body}'.encode()).hexdigest()
+
+
+def cache_key(user, key):
+    # Client keys may hold characters some cache backends reject
+    return hashlib.sha256(f'{user.pk}\0{key}'.encode()).hexdigest()
+
+
+def replay(stored, fingerprint):
+    request_hash, status_code, body = stored
+    if request_hash != fingerprint:
+        return Response(
+            {'detail': f'{IDEMPOTENCY_HEADER} was already used for a different request'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    return Response(body, status=status_code, headers={'Idempotent-Replayed': 'true'})
+
+
+def run_once(user, key, fingerprint, handler):
+    """Run ``handler`` unless the key was used before
+
+    Returns ``(stored, response)``: the handler's response on the first use,
+    or None when ``stored`` was written by an earlier or concurrent request.
+    """
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(user=user, key=key, request_hash=fingerprint)
+        except IntegrityError:
+            record = None
+        if record is not None:
+            response = handler()
+            record.status_code = response.status_code
+            record.response_body = response.data
+            record.save(update_fields=['status_code', 'response_body'])
+            return (fingerprint, record.status_code, response.data), response
+    record = IdempotencyKey.objects.get(user=user, key=key)
+    return (record.request_hash, record.status_code, record.response_body), None
+
+
+def idempotent_response(request, handler):
+    """Serve ``handler()`` at most once per Idempotency-Key"""
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if key is None:
+        return handler()
+    if not key or len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        return Response(
+            {'detail': f'{IDEMPOTENCY_HEADER} must be 1 to {IDEMPOTENCY_KEY_MAX_LENGTH} characters'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    fingerprint = request_hash(request)
+    recent_key = cache_key(request.user, key)
+    stored = recent_keys().get(recent_key)
+    if stored is None:
+        stored, response = run_once(request.user, key, fingerprint, handler)
+        if stored[1] is None:
+            # Only possible while the first request's transaction is still open
+            # on this connection, e.g. a nested call
+            return Response(
+                {'detail': f'A request with this {IDEMPOTENCY_HEADER} is in progress'},
+                status=status.HTTP_409_CONFLICT
+            )
+        ttl = settings.IDEMPOTENCY_CACHE_TTL
+        # Cache only what was committed
+        transaction.on_commit(lambda: recent_keys().set(recent_key, stored, ttl))
+        if response is not None:
+            return response
+    return replay(stored, fingerprint)
+
+
+class IdempotentCreateMixin:
+    """Make a viewset's ``create`` honour the Idempotency-Key header"""
+
+    def create(self, request, *args, **kwargs):
+        create = super().create
+        return idempotent_response(request, lambda: create(request, *args, **kwargs))
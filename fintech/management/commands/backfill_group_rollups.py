@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from fintech.models import SavingsGroup
+from fintech.services import rebuild_group_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-group daily analytics rollups from historical ledger data'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=100,
+            help='Groups rebuilt per transaction'
+        )
+
+    def handle(self, *args, **options):
+        group_ids = list(SavingsGroup.objects.order_by('pk').values_list('pk', flat=True))
+        chunk_size = options['chunk_size']
+        rows = 0
+        for start in range(0, len(group_ids), chunk_size):
+            chunk = group_ids[start:start + chunk_size]
+            rows += rebuild_group_rollups(chunk)
+            self.stdout.write(f'Rebuilt groups {chunk[0]}-{chunk[-1]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Backfilled {rows} rollup rows for {len(group_ids)} groups'
+        ))
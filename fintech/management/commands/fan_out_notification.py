@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from fintech.models import Notification, SavingsGroup
+from fintech.services import (
+    NOTIFICATION_CHUNK_SIZE, everyone_audience, fan_out_notification,
+    group_audience, overdue_borrower_audience
+)
+
+
+class Command(BaseCommand):
+    help = 'Send one notification to a whole audience with chunked bulk inserts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('audience', choices=['group', 'overdue', 'everyone'])
+        parser.add_argument('--group-id', type=int, help='Group to notify for the group audience')
+        parser.add_argument('--title', required=True)
+        parser.add_argument('--message', required=True)
+        parser.add_argument(
+            '--type',
+            default='ALERT',
+            choices=[choice for choice, label in Notification._meta.get_field('notification_type').choices]
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=NOTIFICATION_CHUNK_SIZE,
+            help='Notifications written per INSERT'
+        )
+
+    def handle(self, *args, **options):
+        if options['audience'] == 'group':
+            if options['group_id'] is None:
+                raise CommandError('--group-id is required for the group audience')
+            try:
+                audience = group_audience(SavingsGroup.objects.get(pk=options['group_id']))
+            except SavingsGroup.DoesNotExist:
+                raise CommandError(f"Group {options['group_id']} does not exist")
+        elif options['audience'] == 'overdue':
+            audience = overdue_borrower_audience()
+        else:
+            audience = everyone_audience()
+
+        created = fan_out_notification(
+            audience,
+            options['title'],
+            options['message'],
+            options['type'],
+            chunk_size=options['chunk_size']
+        )
+        self.stdout.write(self.style.SUCCESS(f'Created {created} notifications'))
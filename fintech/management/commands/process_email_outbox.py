@@ -0,0 +1,50 @@
+import time
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+
+from fintech.services import process_email_outbox
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued outbox emails in batches over one reused connection'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.OUTBOX_BATCH_SIZE,
+            help='Emails claimed per batch'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once the outbox has no due emails instead of polling'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=5.0,
+            help='Seconds to sleep when the outbox is empty'
+        )
+
+    def handle(self, *args, **options):
+        connection = get_connection()
+        total_sent = total_failed = 0
+        try:
+            while True:
+                sent, failed = process_email_outbox(connection, options['batch_size'])
+                total_sent += sent
+                total_failed += failed
+                if sent or failed:
+                    self.stdout.write(f'Sent {sent}, failed {failed}')
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            connection.close()
+        self.stdout.write(self.style.SUCCESS(f'Sent {total_sent} emails, {total_failed} failed attempts'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from fintech.services import purge_idempotency_keys
+
+
+class Command(BaseCommand):
+    help = 'Delete stored Idempotency-Key responses past their retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=int,
+            help='Keep keys this many hours (default IDEMPOTENCY_KEY_RETENTION_HOURS)'
+        )
+
+    def handle(self, *args, **options):
+        deleted = purge_idempotency_keys(options['hours'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} idempotency keys'))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from fintech.models import GroupMembership
+from fintech.services import reconcile_member_totals
+
+
+class Command(BaseCommand):
+    help = 'Recompute member deposit and withdrawal totals and report any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Memberships checked per query'
+        )
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Overwrite drifted totals with the recomputed values'
+        )
+
+    def handle(self, *args, **options):
+        member_ids = list(GroupMembership.objects.order_by('pk').values_list('pk', flat=True))
+        chunk_size = options['chunk_size']
+        mismatches = 0
+        for start in range(0, len(member_ids), chunk_size):
+            chunk = member_ids[start:start + chunk_size]
+            for membership_id, field, stored, actual in reconcile_member_totals(chunk, fix=options['fix']):
+                mismatches += 1
+                self.stdout.write(f'Membership {membership_id}: {field} stored {stored}, actual {actual}')
+
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS(f'All {len(member_ids)} memberships reconcile'))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'Fixed {mismatches} drifted totals'))
+        else:
+            self.stdout.write(self.style.WARNING(f'{mismatches} drifted totals; rerun with --fix to correct'))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from fintech.services import REVALUATION_CHUNK_SIZE, revalue_investments
+
+
+class Command(BaseCommand):
+    help = 'Revalue all investments in chunks, resuming the last interrupted run'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=REVALUATION_CHUNK_SIZE,
+            help='Investments loaded and written per chunk'
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Start a new run instead of resuming an unfinished one'
+        )
+
+    def handle(self, *args, **options):
+        stats = revalue_investments(
+            chunk_size=options['chunk_size'],
+            resume=not options['restart']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Run {stats['run']}: revalued {stats['rows']} investments in "
+            f"{stats['seconds']:.2f}s ({stats['rows_per_second']:.0f} rows/s)"
+        ))
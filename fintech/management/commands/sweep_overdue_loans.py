@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from fintech.services import OVERDUE_SWEEP_BATCH_SIZE, check_and_update_loan_status
+
+
+class Command(BaseCommand):
+    help = 'Mark overdue approved loans as defaulted and notify their borrowers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=OVERDUE_SWEEP_BATCH_SIZE,
+            help='Loans defaulted per transaction'
+        )
+
+    def handle(self, *args, **options):
+        defaulted = check_and_update_loan_status(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Defaulted {defaulted} overdue loans'))
@@ -0,0 +1,312 @@
+import cProfile
+import json
+import logging
+import random
+import re
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+
+from .authentication import aauthenticate_token, authenticate_token, header_token
+
+logger = logging.getLogger('fintech.queries')
+
+
+def fingerprint(sql):
+    """Normalise SQL so statements differing only in literals or IN-list length match"""
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(?:\.\d+)?\b', '?', sql)
+    sql = re.sub(r'(?:%s|\?)(?:\s*,\s*(?:%s|\?))+', '?', sql)
+    return sql.replace('%s', '?')
+
+
+class QueryStats:
+    """Execute wrapper that counts queries, DB time and repeated statements"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    @property
+    def suspected_n_plus_one(self):
+        # A statement repeated this many times in one request is flagged as N+1
+        threshold = settings.QUERY_N_PLUS_ONE_THRESHOLD
+        return [sql for sql, seen in self.fingerprints.items() if seen >= threshold]
+
+
+def view_query_budget(view_func, method):
+    """Look up the query budget a viewset declares for the action being served
+
+    Viewsets declare ``query_budgets = {'list': 4, 'members': 3, ...}``; plain
+    function views can set a ``query_budget`` attribute.
+    """
+    actions = getattr(view_func, 'actions', None)
+    if not actions:
+        return view_func.__name__, getattr(view_func, 'query_budget', None)
+    action = actions.get(method.lower())
+    budgets = getattr(view_func.cls, 'query_budgets', {})
+    return action, budgets.get(action)
+
+
+class QueryCountMiddleware:
+    """Count queries and DB time per request and flag suspected N+1 patterns
+
+    In DEBUG the figures are returned as ``X-DB-*`` response headers; otherwise
+    every request logs one line to ``fintech.queries``, at WARNING level when it
+    looks like an N+1 or goes over its view's query budget. The stats are kept
+    on ``request.query_stats`` for the test suite.
+
+    Under ASGI the wrappers are installed from a thread-sensitive sync call,
+    which runs on the same thread as the request's ORM queries.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    async def atoken_user(request):
+        try:
+            token = header_token(request)
+            return (await aauthenticate_token(token)).user if token else None
+        except AuthenticationFailed:
+            return None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = self.start(request)
+        with self.instrument(stats):
+            response = self.get_response(request)
+        return self.report(request, response, stats)
+
+    async def __acall__(self, request):
+        stats = self.start(request)
+        # instrument() must run on the ORM's thread: connections are thread-local
+        wrappers = await sync_to_async(lambda: self.instrument(stats).__enter__())()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(wrappers.close)()
+        return self.report(request, response, stats)
+
+    def start(self, request):
+        stats = QueryStats()
+        request.query_stats = stats
+        request.query_budget = None
+        request.query_action = None
+        return stats
+
+    def instrument(self, stats):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats))
+        return stack
+
+    def report(self, request, response, stats):
+        suspects = stats.suspected_n_plus_one
+        budget = request.query_budget
+        over_budget = budget is not None and stats.count > budget
+        if settings.DEBUG:
+            response['X-DB-Query-Count'] = str(stats.count)
+            response['X-DB-Time-Ms'] = f'{stats.duration * 1000:.1f}'
+            if budget is not None:
+                response['X-DB-Query-Budget'] = str(budget)
+            if suspects:
+                response['X-DB-Suspected-N-Plus-One'] = str(len(suspects))
+        else:
+            level = logging.WARNING if suspects or over_budget else logging.INFO
+            logger.log(
+                level,
+                '%s %s queries=%d db_ms=%.1f budget=%s n_plus_one=%d',
+                request.method, request.path, stats.count, stats.duration * 1000,
+                budget if budget is not None else '-', len(suspects)
+            )
+            for sql in suspects:
+                logger.log(level, 'Repeated %d times: %s', stats.fingerprints[sql], sql)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_action, request.query_budget = view_query_budget(view_func, request.method)
+
+
+class SQLTimeline:
+    """Execute wrapper that records when each statement ran and for how long"""
+
+    def __init__(self, origin, alias):
+        self.origin = origin
+        self.alias = alias
+        self.entries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            end = time.perf_counter()
+            self.entries.append({
+                'alias': self.alias,
+                'start_ms': round((start - self.origin) * 1000, 3),
+                'duration_ms': round((end - start) * 1000, 3),
+                'sql': sql,
+                'many': many,
+            })
+
+
+class ProfilingMiddleware:
+    """Profile individual requests on demand
+
+    A request is profiled when a staff user sends ``X-Profile: 1`` or
+    ``?profile=1``, or when it is picked by ``PROFILING_SAMPLE_RATE``. The
+    cProfile stats are written to ``PROFILING_DIR/<id>.prof`` (open them with
+    ``python -m pstats``) and the SQL timeline with the request details to
+    ``<id>.json``; the id is returned in ``X-Profile-Id``.
+
+    Requests that aren't profiled only pay for a header lookup and, with
+    sampling on, one random number; the user is loaded only when a trigger
+    is present. Staff are recognised by their session or an
+    ``Authorization: Token`` header; HTTP Basic credentials aren't checked
+    here. Must come after AuthenticationMiddleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @property
+    def directory(self):
+        return Path(settings.PROFILING_DIR)
+
+    @staticmethod
+    def requested(request):
+        return request.META.get('HTTP_X_PROFILE') == '1' or request.GET.get('profile') == '1'
+
+    def sampled(self):
+        sample_rate = settings.PROFILING_SAMPLE_RATE
+        return sample_rate > 0 and random.random() < sample_rate
+
+    @staticmethod
+    def token_user(request):
+        # DRF authenticates tokens only once the view runs, after this middleware
+        try:
+            token = header_token(request)
+            return authenticate_token(token).user if token else None
+        except AuthenticationFailed:
+            return None
+
+    @staticmethod
+    async def atoken_user(request):
+        try:
+            token = header_token(request)
+            return (await aauthenticate_token(token)).user if token else None
+        except AuthenticationFailed:
+            return None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        trigger = 'sample' if self.sampled() else None
+        if trigger is None and self.requested(request) and (
+            request.user.is_staff or getattr(self.token_user(request), 'is_staff', False)
+        ):
+            trigger = 'request'
+        if trigger is None:
+            return self.get_response(request)
+
+        origin = time.perf_counter()
+        timelines = [SQLTimeline(origin, alias) for alias in connections]
+        profiler = cProfile.Profile()
+        with ExitStack() as stack:
+            for timeline in timelines:
+                stack.enter_context(connections[timeline.alias].execute_wrapper(timeline))
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        return self.save(request, request.user, response, trigger, origin, profiler, timelines)
+
+    async def __acall__(self, request):
+        trigger = 'sample' if self.sampled() else None
+        if trigger is None and self.requested(request) and (
+            (await request.auser()).is_staff
+            or getattr(await self.atoken_user(request), 'is_staff', False)
+        ):
+            trigger = 'request'
+        if trigger is None:
+            return await self.get_response(request)
+
+        # Only the event loop thread is profiled; the ORM's queries run on a
+        # worker thread and are captured by the timeline
+        origin = time.perf_counter()
+        timelines = [SQLTimeline(origin, alias) for alias in connections]
+
+        def instrument():
+            stack = ExitStack()
+            for timeline in timelines:
+                stack.enter_context(connections[timeline.alias].execute_wrapper(timeline))
+            return stack
+
+        wrappers = await sync_to_async(instrument)()
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            response = await self.get_response(request)
+        finally:
+            profiler.disable()
+            await sync_to_async(wrappers.close)()
+        user = await request.auser()
+        if not user.is_authenticated:
+            user = await self.atoken_user(request) or user
+        return self.save(request, user, response, trigger, origin, profiler, timelines)
+
+    def save(self, request, user, response, trigger, origin, profiler, timelines):
+        elapsed = time.perf_counter() - origin
+        profile_id = uuid.uuid4().hex
+        self.directory.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(self.directory / f'{profile_id}.prof')
+        queries = sorted(
+            (entry for timeline in timelines for entry in timeline.entries),
+            key=lambda entry: entry['start_ms']
+        )
+        report = {
+            'id': profile_id,
+            'trigger': trigger,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'user': user.get_username() if user.is_authenticated else None,
+            'status': response.status_code,
+            'recorded_at': timezone.now().isoformat(),
+            'duration_ms': round(elapsed * 1000, 3),
+            'query_count': len(queries),
+            'query_time_ms': round(sum(entry['duration_ms'] for entry in queries), 3),
+            'queries': queries,
+        }
+        with open(self.directory / f'{profile_id}.json', 'w') as output:
+            json.dump(report, output, indent=2)
+        response['X-Profile-Id'] = profile_id
+        return response
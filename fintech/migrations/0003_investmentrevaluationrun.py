@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fintech', '0002_groupmembership_contribution_limit_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvestmentRevaluationRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of', models.DateTimeField()),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('last_investment_id', models.BigIntegerField(default=0)),
+                ('rows_processed', models.IntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fintech', '0003_investmentrevaluationrun'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contribution',
+            index=models.Index(fields=['member', 'transaction_type', 'date'], name='contrib_member_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['status', 'due_date'], name='loan_status_due_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(condition=models.Q(('status', 'APPROVED')), fields=['due_date'], name='loan_approved_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'read', 'created_at'], name='notif_user_read_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('read', False)), fields=['user', 'created_at'], name='notif_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transactionhistory',
+            index=models.Index(fields=['user', 'created_at'], name='txn_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fintech', '0004_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('deposit_total', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('withdrawal_total', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('investment_principal', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('investment_value', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('loans_opened', models.IntegerField(default=0)),
+                ('loans_closed', models.IntegerField(default=0)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='fintech.savingsgroup')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('group', 'day'), name='rollup_group_day_unique')],
+            },
+        ),
+    ]
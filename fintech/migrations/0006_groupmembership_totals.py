@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:19
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def populate_totals(apps, schema_editor):
+    Contribution = apps.get_model('fintech', 'Contribution')
+    GroupMembership = apps.get_model('fintech', 'GroupMembership')
+    sums = Contribution.objects.values('member_id', 'transaction_type').annotate(
+        total=Sum('amount')
+    ).order_by()
+    for item in sums:
+        field = 'total_deposits' if item['transaction_type'] == 'DEPOSIT' else 'total_withdrawals'
+        GroupMembership.objects.filter(pk=item['member_id']).update(**{field: item['total']})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fintech', '0005_groupdailyrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='groupmembership',
+            name='total_deposits',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=15),
+        ),
+        migrations.AddField(
+            model_name='groupmembership',
+            name='total_withdrawals',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=15),
+        ),
+        migrations.RunPython(populate_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:30
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_unread_counts(apps, schema_editor):
+    Notification = apps.get_model('fintech', 'Notification')
+    UserProfile = apps.get_model('fintech', 'UserProfile')
+    counts = Notification.objects.filter(read=False).values('user_id').annotate(
+        unread=Count('pk')
+    ).order_by()
+    for item in counts:
+        UserProfile.objects.filter(user_id=item['user_id']).update(unread_notifications=item['unread'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fintech', '0008_outboundemail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='unread_notifications',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(populate_unread_counts, migrations.RunPython.noop),
+    ]
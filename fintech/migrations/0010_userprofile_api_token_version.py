@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fintech', '0009_userprofile_unread_notifications'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='api_token_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
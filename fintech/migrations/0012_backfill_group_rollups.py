@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:05
+
+from django.db import migrations
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+CHUNK_SIZE = 100
+
+
+def backfill_rollups(apps, schema_editor):
+    # Same rebuild as fintech.services.rebuild_group_rollups, on historical models
+    SavingsGroup = apps.get_model('fintech', 'SavingsGroup')
+    Contribution = apps.get_model('fintech', 'Contribution')
+    Investment = apps.get_model('fintech', 'Investment')
+    Loan = apps.get_model('fintech', 'Loan')
+    GroupDailyRollup = apps.get_model('fintech', 'GroupDailyRollup')
+
+    group_ids = list(SavingsGroup.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(group_ids), CHUNK_SIZE):
+        chunk = group_ids[start:start + CHUNK_SIZE]
+        rows = {}
+
+        def row(group_id, day):
+            if (group_id, day) not in rows:
+                rows[(group_id, day)] = GroupDailyRollup(group_id=group_id, day=day)
+            return rows[(group_id, day)]
+
+        contributions = Contribution.objects.filter(member__group_id__in=chunk).annotate(
+            day=TruncDate('date')
+        ).values('member__group_id', 'day', 'transaction_type').annotate(total=Sum('amount')).order_by()
+        for item in contributions:
+            rollup = row(item['member__group_id'], item['day'])
+            if item['transaction_type'] == 'DEPOSIT':
+                rollup.deposit_total += item['total']
+            else:
+                rollup.withdrawal_total += item['total']
+
+        investments = Investment.objects.filter(group_id__in=chunk).annotate(
+            day=TruncDate('date')
+        ).values('group_id', 'day').annotate(
+            principal=Sum('amount'), value=Sum('current_value')
+        ).order_by()
+        for item in investments:
+            rollup = row(item['group_id'], item['day'])
+            rollup.investment_principal = item['principal']
+            rollup.investment_value = item['value']
+
+        loans = Loan.objects.filter(borrower__group_id__in=chunk, status='APPROVED').annotate(
+            day=TruncDate('start_date')
+        ).values('borrower__group_id', 'day').annotate(opened=Count('pk')).order_by()
+        for item in loans:
+            row(item['borrower__group_id'], item['day']).loans_opened = item['opened']
+
+        GroupDailyRollup.objects.filter(group_id__in=chunk).delete()
+        GroupDailyRollup.objects.bulk_create(rows.values())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fintech', '0011_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
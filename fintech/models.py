@@ -1,11 +1,15 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import F
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator, MaxValueValidator, RegexValidator
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from decimal import Decimal
 from django.utils import timezone
 import uuid
+from .events import publish_notifications
+from .valuation import growth_factor
 
 class TransactionHistory(models.Model):
     transaction_id = models.UUIDField(default=uuid.uuid4, editable=False)
@@ -33,6 +37,11 @@ class TransactionHistory(models.Model):
         default='PENDING'
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='txn_user_created_idx'),
+        ]
+
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     phone_number = models.CharField(
@@ -44,6 +53,11 @@ class UserProfile(models.Model):
     profile_picture = models.ImageField(upload_to='profile_pictures/', null=True, blank=True)
     is_verified = models.BooleanField(default=False)
     verification_token = models.UUIDField(default=uuid.uuid4)
+    # Kept in step with the user's notifications so the badge poll is one row
+    # read; bulk writes must use create_notifications()/mark_notifications_read()
+    unread_notifications = models.IntegerField(default=0)
+    # Bumped to revoke every API token issued to the user
+    api_token_version = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -77,6 +91,19 @@ class SavingsGroup(models.Model):
     )
     members = models.ManyToManyField(User, through='GroupMembership')
 
+    @classmethod
+    def apply_balance_change(cls, group_id, delta):
+        """Atomically add ``delta`` to a group's balance and return the new balance
+
+        The increment runs in the database, so concurrent posts to the same
+        group can't overwrite each other. The balance is read back inside the
+        same transaction while the row is still locked by the update, so it
+        reflects exactly this change on top of every committed one.
+        """
+        with transaction.atomic():
+            cls.objects.filter(pk=group_id).update(total_balance=F('total_balance') + delta)
+            return cls.objects.filter(pk=group_id).values_list('total_balance', flat=True).get()
+
 class GroupMembership(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     group = models.ForeignKey(SavingsGroup, on_delete=models.CASCADE)
@@ -92,6 +119,9 @@ class GroupMembership(models.Model):
         default=10000.00,
         validators=[MinValueValidator(Decimal('0.00'))]
     )
+    # Running totals maintained by the contribution posting paths
+    total_deposits = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    total_withdrawals = models.DecimalField(max_digits=15, decimal_places=2, default=0)
 
 class Contribution(models.Model):
     member = models.ForeignKey(GroupMembership, on_delete=models.CASCADE)
@@ -112,27 +142,44 @@ class Contribution(models.Model):
         blank=True
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['member', 'transaction_type', 'date'], name='contrib_member_type_date_idx'),
+            # Cursor pagination order
+            models.Index(fields=['member', '-date', '-id'], name='contrib_member_date_id_idx'),
+        ]
+
     def save(self, *args, **kwargs):
-        if not self.pk:  # Only for new contributions
+        if self.pk:
+            return super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            # Update group balance
+            group = self.member.group
+            delta = self.amount if self.transaction_type == 'DEPOSIT' else -self.amount
+            group.total_balance = SavingsGroup.apply_balance_change(group.pk, delta)
+
             # Create transaction history
-            transaction = TransactionHistory.objects.create(
+            self.transaction = TransactionHistory.objects.create(
                 user=self.member.user,
                 transaction_type='CONTRIBUTION',
                 amount=self.amount,
-                balance_after=self.member.group.total_balance + self.amount,
-                description=f"{self.transaction_type} to group {self.member.group.name}",
+                balance_after=group.total_balance,
+                description=f"{self.transaction_type} to group {group.name}",
                 status='COMPLETED'
             )
-            self.transaction = transaction
-            
-            # Update group balance
+            super().save(*args, **kwargs)
+
             if self.transaction_type == 'DEPOSIT':
-                self.member.group.total_balance += self.amount
+                GroupMembership.objects.filter(pk=self.member_id).update(
+                    total_deposits=F('total_deposits') + self.amount
+                )
+                GroupDailyRollup.record(group.pk, timezone.localdate(self.date), deposit_total=self.amount)
             else:
-                self.member.group.total_balance -= self.amount
-            self.member.group.save()
-            
-        super().save(*args, **kwargs)
+                GroupMembership.objects.filter(pk=self.member_id).update(
+                    total_withdrawals=F('total_withdrawals') + self.amount
+                )
+                GroupDailyRollup.record(group.pk, timezone.localdate(self.date), withdrawal_total=self.amount)
 
 class Loan(models.Model):
     borrower = models.ForeignKey(GroupMembership, on_delete=models.CASCADE)
@@ -166,6 +213,19 @@ class Loan(models.Model):
         blank=True
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'due_date'], name='loan_status_due_date_idx'),
+            # The overdue sweep only ever looks at approved loans
+            models.Index(
+                fields=['due_date'],
+                condition=models.Q(status='APPROVED'),
+                name='loan_approved_due_idx'
+            ),
+            # Cursor pagination order
+            models.Index(fields=['-start_date', '-id'], name='loan_start_id_idx'),
+        ]
+
     def calculate_interest(self):
         principal = self.amount
         rate = self.interest_rate / Decimal('100.00')
@@ -177,21 +237,34 @@ class Loan(models.Model):
     def total_repayment_amount(self):
         return self.amount + self.calculate_interest()
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status so save() can track active loan counts
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
     def save(self, *args, **kwargs):
-        if not self.pk and self.status == 'APPROVED':  # Only for new approved loans
-            transaction = TransactionHistory.objects.create(
-                user=self.borrower.user,
-                transaction_type='LOAN',
-                amount=self.amount,
-                balance_after=self.borrower.group.total_balance - self.amount,
-                description=f"Loan disbursement for {self.borrower.user.username}",
-                status='COMPLETED'
-            )
-            self.transaction = transaction
-            self.borrower.group.total_balance -= self.amount
-            self.borrower.group.save()
-        
-        super().save(*args, **kwargs)
+        previous_status = getattr(self, '_loaded_status', None) if self.pk else None
+        with transaction.atomic():
+            if not self.pk and self.status == 'APPROVED':  # Only new approved loans are disbursed
+                group = self.borrower.group
+                group.total_balance = SavingsGroup.apply_balance_change(group.pk, -self.amount)
+                self.transaction = TransactionHistory.objects.create(
+                    user=self.borrower.user,
+                    transaction_type='LOAN',
+                    amount=self.amount,
+                    balance_after=group.total_balance,
+                    description=f"Loan disbursement for {self.borrower.user.username}",
+                    status='COMPLETED'
+                )
+            super().save(*args, **kwargs)
+
+            if previous_status != 'APPROVED' and self.status == 'APPROVED':
+                GroupDailyRollup.record(self.borrower.group_id, loans_opened=1)
+            elif previous_status == 'APPROVED' and self.status != 'APPROVED':
+                GroupDailyRollup.record(self.borrower.group_id, loans_closed=1)
+        self._loaded_status = self.status
 
 class Investment(models.Model):
     group = models.ForeignKey(SavingsGroup, on_delete=models.CASCADE)
@@ -228,26 +301,146 @@ class Investment(models.Model):
             as_of_date = timezone.now()
         
         time_diff = as_of_date - self.date
-        time_in_years = Decimal(time_diff.days) / Decimal('365')
-        rate = self.annual_return_rate / Decimal('100.00')
-        
-        return self.amount * (Decimal('1.00') + rate) ** time_in_years - self.amount
+        return self.amount * growth_factor(self.annual_return_rate, time_diff.days) - self.amount
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored value so save() can roll up revaluations
+        instance._loaded_current_value = instance.__dict__.get('current_value')
+        return instance
 
     def save(self, *args, **kwargs):
-        if not self.pk:  # Only for new investments
-            transaction = TransactionHistory.objects.create(
+        if self.pk:  # Only new investments move money
+            previous_value = getattr(self, '_loaded_current_value', None)
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                if previous_value is not None and self.current_value != previous_value:
+                    GroupDailyRollup.record(
+                        self.group_id,
+                        investment_value=Decimal(self.current_value) - previous_value
+                    )
+            self._loaded_current_value = self.current_value
+            return
+
+        with transaction.atomic():
+            self.group.total_balance = SavingsGroup.apply_balance_change(self.group.pk, -self.amount)
+            self.transaction = TransactionHistory.objects.create(
                 user=self.group.members.first(),  # Consider adding investment creator field
                 transaction_type='INVESTMENT',
                 amount=self.amount,
-                balance_after=self.group.total_balance - self.amount,
+                balance_after=self.group.total_balance,
                 description=f"{self.investment_type} investment with {self.provider}",
                 status='COMPLETED'
             )
-            self.transaction = transaction
-            self.group.total_balance -= self.amount
-            self.group.save()
-        
-        super().save(*args, **kwargs)
+            super().save(*args, **kwargs)
+            GroupDailyRollup.record(
+                self.group_id,
+                timezone.localdate(self.date),
+                investment_principal=self.amount,
+                investment_value=self.current_value
+            )
+        self._loaded_current_value = self.current_value
+
+class GroupDailyRollup(models.Model):
+    """Per-group, per-day ledger totals kept up to date by the write paths
+
+    Every column is a change for that day, so a group's current figures are
+    sums over its rows: investment principal and value, and active loans as
+    loans opened minus loans closed.
+    """
+    group = models.ForeignKey(SavingsGroup, on_delete=models.CASCADE, related_name='daily_rollups')
+    day = models.DateField()
+    deposit_total = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    withdrawal_total = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    investment_principal = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    investment_value = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    loans_opened = models.IntegerField(default=0)
+    loans_closed = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['group', 'day'], name='rollup_group_day_unique'),
+        ]
+
+    @classmethod
+    def record(cls, group_id, day=None, **deltas):
+        """Add ``deltas`` to the group's row for ``day`` (today by default)"""
+        day = day or timezone.localdate()
+        updates = {field: F(field) + value for field, value in deltas.items()}
+        with transaction.atomic():
+            if cls.objects.filter(group_id=group_id, day=day).update(**updates):
+                return
+            try:
+                with transaction.atomic():
+                    cls.objects.create(group_id=group_id, day=day, **deltas)
+            except IntegrityError:
+                # Another writer created the row first
+                cls.objects.filter(group_id=group_id, day=day).update(**updates)
+
+class InvestmentRevaluationRun(models.Model):
+    """Checkpoint for a batch revaluation so an interrupted run can resume"""
+    as_of = models.DateTimeField()
+    started_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    last_investment_id = models.BigIntegerField(default=0)
+    rows_processed = models.IntegerField(default=0)
+
+class OutboundEmail(models.Model):
+    """Email written in the request's transaction and delivered by the outbox worker"""
+    recipient = models.EmailField()
+    subject = models.CharField(max_length=200)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254, blank=True)
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            ('PENDING', 'Pending'),
+            ('SENT', 'Sent'),
+            ('FAILED', 'Failed')
+        ],
+        default='PENDING'
+    )
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # Claim token and lease of the worker currently sending this email
+    locked_by = models.CharField(max_length=64, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['next_attempt_at'],
+                condition=models.Q(status='PENDING'),
+                name='outbox_pending_idx'
+            ),
+        ]
+
+class IdempotencyKey(models.Model):
+    """Response of a create request, replayed when the client retries with the same Idempotency-Key
+
+    The row is inserted before the request's writes, in the same transaction,
+    so the unique constraint lets only one of several concurrent duplicates
+    through.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    # SHA-256 of the method, path and body the key was first used with
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response_body = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotency_user_key_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['created_at'], name='idempotency_created_idx'),
+        ]
 
 class FinancialEducation(models.Model):
     title = models.CharField(max_length=200)
@@ -280,3 +473,92 @@ class Notification(models.Model):
             ('EDUCATION', 'Education')
         ]
     )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'read', 'created_at'], name='notif_user_read_created_idx'),
+            models.Index(
+                fields=['user', 'created_at'],
+                condition=models.Q(read=False),
+                name='notif_unread_idx'
+            ),
+            # Cursor pagination order
+            models.Index(fields=['user', '-created_at', '-id'], name='notif_user_created_id_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored flag so save() can keep the unread counter in step
+        instance._loaded_read = instance.__dict__.get('read')
+        return instance
+
+    def save(self, *args, **kwargs):
+        previous_read = getattr(self, '_loaded_read', None) if self.pk else None
+        creating = not self.pk
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if creating:
+                delta = 0 if self.read else 1
+            elif previous_read is not None and previous_read != self.read:
+                delta = -1 if self.read else 1
+            else:
+                delta = 0
+            if delta:
+                UserProfile.objects.filter(user_id=self.user_id).update(
+                    unread_notifications=F('unread_notifications') + delta
+                )
+            if creating:
+                transaction.on_commit(lambda: publish_notifications([self]))
+        self._loaded_read = self.read
+
+@receiver(post_delete, sender=Notification)
+def release_unread_notification(sender, instance, **kwargs):
+    if not instance.read:
+        UserProfile.objects.filter(user_id=instance.user_id).update(
+            unread_notifications=F('unread_notifications') - 1
+        )
+
+def cascading_delete(origin):
+    """Whether a delete cascades from a group, membership or user
+
+    Their ledger rows are left in the rollups, like in the group balance, and
+    releasing them one by one would cost queries per row. Groups take their
+    rollups with them.
+    """
+    model = origin.model if isinstance(origin, models.QuerySet) else type(origin)
+    return model in (SavingsGroup, GroupMembership, User)
+
+@receiver(post_delete, sender=Contribution)
+def release_contribution(sender, instance, origin=None, **kwargs):
+    if cascading_delete(origin):
+        return
+    day = timezone.localdate(instance.date)
+    if instance.transaction_type == 'DEPOSIT':
+        GroupMembership.objects.filter(pk=instance.member_id).update(
+            total_deposits=F('total_deposits') - instance.amount
+        )
+        GroupDailyRollup.record(instance.member.group_id, day, deposit_total=-instance.amount)
+    else:
+        GroupMembership.objects.filter(pk=instance.member_id).update(
+            total_withdrawals=F('total_withdrawals') - instance.amount
+        )
+        GroupDailyRollup.record(instance.member.group_id, day, withdrawal_total=-instance.amount)
+
+@receiver(post_delete, sender=Investment)
+def release_investment(sender, instance, origin=None, **kwargs):
+    if cascading_delete(origin):
+        return
+    GroupDailyRollup.record(
+        instance.group_id,
+        timezone.localdate(instance.date),
+        investment_principal=-instance.amount,
+        investment_value=-getattr(instance, '_loaded_current_value', instance.current_value)
+    )
+
+@receiver(post_delete, sender=Loan)
+def release_loan(sender, instance, origin=None, **kwargs):
+    if cascading_delete(origin):
+        return
+    if getattr(instance, '_loaded_status', instance.status) == 'APPROVED':
+        GroupDailyRollup.record(instance.borrower.group_id, loans_closed=1)
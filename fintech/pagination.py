@@ -0,0 +1,27 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """Cursor pagination for append-only collections
+
+    Pages are addressed by a position in ``ordering`` instead of an offset, so
+    there is no COUNT(*) and a deep page costs the same as the first one.
+    Subclasses order on a timestamp with ``-id`` as the tie breaker, backed by
+    a matching index.
+    """
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    page_size_query_param = 'page_size'
+    max_page_size = settings.CURSOR_PAGINATION_MAX_PAGE_SIZE
+
+
+class NotificationPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
+
+class ContributionPagination(KeysetPagination):
+    ordering = ('-date', '-id')
+
+
+class LoanPagination(KeysetPagination):
+    ordering = ('-start_date', '-id')
@@ -0,0 +1,177 @@
+"""
+Read-replica routing.
+
+When ``DATABASE_REPLICA_ALIAS`` names a configured database, reads that are
+allowed to be slightly stale go to it and everything else stays on the
+primary. Reads are only sent to the replica when asked for:
+
+* views declare it, the way they declare query budgets: viewsets list
+  their read-only actions in ``replica_actions``, function views set a
+  ``replica_reads`` attribute; ``ReplicaRoutingMiddleware`` applies it to
+  safe (GET/HEAD/OPTIONS) requests;
+* code wraps the reads in ``read_from_replica()``, as the dashboard
+  analytics services do.
+
+Once anything in the request writes, its remaining reads go to the
+primary, and the middleware sets a cookie that keeps the client's requests
+on the primary for ``REPLICA_PIN_SECONDS``, so users read their own writes
+while the replica catches up. Reads inside a transaction on the primary
+never go to the replica either.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'wakala_primary'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Always read from the primary: sessions are loaded lazily, often after the
+# view has asked for the replica, and a lagging copy would sign users out
+PRIMARY_APPS = {'sessions'}
+
+_routing = ContextVar('fintech_db_routing', default=None)
+
+
+class RoutingState:
+    """Routing flags of the current request or ``read_from_replica()`` block"""
+
+    def __init__(self, pinned=False):
+        self.replica_reads = False
+        self.pinned = pinned
+        self.wrote = False
+
+
+def replica_alias():
+    return settings.DATABASE_REPLICA_ALIAS
+
+
+@contextmanager
+def read_from_replica():
+    """Send the reads of the block, or of a decorated function, to the replica
+
+    Has no effect once the current request has written or been pinned.
+    """
+    state = _routing.get()
+    token = None
+    if state is None:
+        state = RoutingState()
+        token = _routing.set(state)
+    previous, state.replica_reads = state.replica_reads, True
+    try:
+        yield
+    finally:
+        state.replica_reads = previous
+        if token is not None:
+            _routing.reset(token)
+
+
+class ReplicaRouter:
+    """Route hinted reads to the replica and pin to the primary after writes"""
+
+    def db_for_read(self, model, **hints):
+        alias = replica_alias()
+        if alias is None:
+            return None
+        state = _routing.get()
+        if state is None or not state.replica_reads or state.pinned:
+            return DEFAULT_DB_ALIAS
+        if model._meta.app_label in PRIMARY_APPS:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.pinned = state.wrote = True
+        if replica_alias() is None:
+            return None
+        # Never None here: Django would fall back to the database the
+        # instance was read from, which may be the replica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        alias = replica_alias()
+        if alias is None:
+            return None
+        # Both databases hold the same rows
+        same_data = {DEFAULT_DB_ALIAS, alias}
+        if obj1._state.db in same_data and obj2._state.db in same_data:
+            return True
+        return None
+
+
+def view_reads_from_replica(view_func, method):
+    """Whether the view being served declares its reads replica-safe
+
+    Viewsets declare ``replica_actions = {'list', 'retrieve', ...}``; plain
+    function views can set a ``replica_reads`` attribute.
+    """
+    if method not in SAFE_METHODS:
+        return False
+    actions = getattr(view_func, 'actions', None)
+    if not actions:
+        return getattr(view_func, 'replica_reads', False)
+    action = actions.get(method.lower())
+    return action in getattr(view_func.cls, 'replica_actions', ())
+
+
+class ReplicaRoutingMiddleware:
+    """Track reads and writes per request for ``ReplicaRouter``
+
+    Unsafe requests, and requests carrying the pin cookie, are served from
+    the primary throughout. A request that writes sets the cookie when a
+    replica is configured.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = self.start(request)
+        token = _routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self.finish(response, state)
+
+    async def __acall__(self, request):
+        # The state object is shared with the sync_to_async threads running
+        # the ORM, so their writes are seen here
+        state = self.start(request)
+        token = _routing.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self.finish(response, state)
+
+    def start(self, request):
+        return RoutingState(pinned=request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES)
+
+    def finish(self, response, state):
+        if state.wrote and replica_alias() is not None:
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax'
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _routing.get()
+        if state is not None:
+            state.replica_reads = view_reads_from_replica(view_func, request.method)
@@ -0,0 +1,192 @@
+"""
+Loan repayment schedules.
+
+Loans are repaid in monthly instalments from the month after
+``start_date``; the last instalment falls on ``due_date``. Two methods are
+supported:
+
+``flat``
+    The simple interest of ``Loan.calculate_interest()`` is spread evenly
+    over the instalments together with the principal.
+``reducing``
+    Equal instalments, each paying a month's interest on the outstanding
+    balance and the rest off the principal.
+
+All arithmetic is done in integer cents with half-up rounding and the last
+instalment absorbs the rounding remainder, so a schedule's totals always
+add up to the principal and interest to the cent. Schedules keep their
+amounts as integer cents too; ``money()`` turns them into Decimals, and
+``schedule_payload()`` into the API's strings. Anything that doesn't depend
+on the principal (the instalment factor of a rate and term, the due dates
+of a start and end date) is computed once per distinct pair, which is what
+lets a whole loan book be scheduled in one pass.
+"""
+from collections import namedtuple
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+
+from django.utils import timezone
+
+SCHEDULE_METHODS = ('flat', 'reducing')
+
+# Amounts are integer cents; balance is the principal still owed after the instalment
+Instalment = namedtuple('Instalment', ['number', 'due_date', 'payment', 'principal', 'interest', 'balance'])
+Schedule = namedtuple('Schedule', ['loan', 'method', 'instalments', 'total_payment', 'total_principal', 'total_interest'])
+
+CENT = Decimal('0.01')
+
+
+def _to_cents(amount):
+    return int((amount * 100).to_integral_value(ROUND_HALF_UP))
+
+
+def money(cents):
+    """Decimal amount of a number of cents"""
+    return Decimal(cents) * CENT
+
+
+def _format_cents(cents):
+    sign = '-' if cents < 0 else ''
+    cents = abs(cents)
+    return f'{sign}{cents // 100}.{cents % 100:02d}'
+
+
+DAYS_IN_MONTH = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+def add_months(day, months):
+    """Same day of the month ``months`` later, clamped to the month's end"""
+    month = day.month - 1 + months
+    year = day.year + month // 12
+    month = month % 12
+    last = DAYS_IN_MONTH[month]
+    if month == 1 and year % 4 == 0 and (year % 100 != 0 or year % 400 == 0):
+        last = 29
+    return date(year, month + 1, day.day if day.day <= last else last)
+
+
+@lru_cache(maxsize=4096)
+def instalment_dates(start, due):
+    """Monthly due dates after ``start``, the last one being ``due``
+
+    Cached: loans issued at the same meeting share their start date and
+    usually their term.
+    """
+    months = (due.year - start.year) * 12 + due.month - start.month
+    if due.day > start.day:
+        months += 1
+    return tuple(add_months(start, number) for number in range(1, max(months, 1))) + (due,)
+
+
+@lru_cache(maxsize=4096)
+def _reducing_factor(rate, count):
+    """Instalment per unit of principal for an annual rate in percent"""
+    monthly = Decimal(rate) / Decimal('1200')
+    if not monthly:
+        return 1 / Decimal(count)
+    return monthly / (1 - (1 + monthly) ** -count)
+
+
+def _flat_rows(principal, interest, dates):
+    count = len(dates)
+    principal_part, interest_part = principal // count, interest // count
+    rows = []
+    balance = principal
+    for number, due in enumerate(dates, 1):
+        if number == count:
+            # The last instalment takes whatever the even split left over
+            principal_part = balance
+            interest_part = interest - interest // count * (count - 1)
+        balance -= principal_part
+        rows.append(Instalment(number, due, principal_part + interest_part, principal_part, interest_part, balance))
+    return rows
+
+
+def _reducing_rows(principal, rate, dates):
+    count = len(dates)
+    rate_bp = _to_cents(Decimal(rate))  # hundredths of a percent
+    payment = int((principal * _reducing_factor(rate, count)).to_integral_value(ROUND_HALF_UP))
+    rows = []
+    balance = principal
+    for number, due in enumerate(dates, 1):
+        # balance * rate / 1200, rounded half up, in whole cents
+        interest = (2 * balance * rate_bp + 120000) // 240000
+        if number == count:
+            principal_part = balance
+        else:
+            principal_part = min(max(payment - interest, 0), balance)
+        balance -= principal_part
+        rows.append(Instalment(number, due, principal_part + interest, principal_part, interest, balance))
+    return rows
+
+
+def _build(loan, method, tz):
+    dates = instalment_dates(loan.start_date.astimezone(tz).date(), loan.due_date.astimezone(tz).date())
+    principal = _to_cents(loan.amount)
+    if method == 'flat':
+        interest = _to_cents(loan.calculate_interest().quantize(CENT, ROUND_HALF_UP))
+        rows = _flat_rows(principal, interest, dates)
+    else:
+        rows = _reducing_rows(principal, str(loan.interest_rate), dates)
+    total_interest = sum(row.interest for row in rows)
+    return Schedule(
+        loan=loan.pk,
+        method=method,
+        instalments=rows,
+        total_payment=principal + total_interest,
+        total_principal=principal,
+        total_interest=total_interest,
+    )
+
+
+def loan_schedule(loan, method='flat'):
+    """Repayment schedule of one loan"""
+    if method not in SCHEDULE_METHODS:
+        raise ValueError(f'Unknown schedule method {method!r}')
+    return _build(loan, method, timezone.get_current_timezone())
+
+
+def loan_book_schedules(loans, method='flat'):
+    """Schedules of many loans in one pass, e.g. a group's whole loan book
+
+    ``loans`` may be any iterable, including a queryset ``.iterator()``; only
+    ``amount``, ``interest_rate``, ``start_date`` and ``due_date`` are read.
+    """
+    if method not in SCHEDULE_METHODS:
+        raise ValueError(f'Unknown schedule method {method!r}')
+    tz = timezone.get_current_timezone()
+    return [_build(loan, method, tz) for loan in loans]
+
+
+def schedule_payload(schedule):
+    """API representation, with amounts as strings like the serializers"""
+    return {
+        'loan': schedule.loan,
+        'method': schedule.method,
+        'total_payment': _format_cents(schedule.total_payment),
+        'total_principal': _format_cents(schedule.total_principal),
+        'total_interest': _format_cents(schedule.total_interest),
+        'instalments': [
+            {
+                'number': row.number,
+                'due_date': row.due_date.isoformat(),
+                'payment': _format_cents(row.payment),
+                'principal': _format_cents(row.principal),
+                'interest': _format_cents(row.interest),
+                'balance': _format_cents(row.balance),
+            }
+            for row in schedule.instalments
+        ],
+    }
+
+
+def loan_book_payload(schedules):
+    """API representation of many schedules, with the book's totals"""
+    return {
+        'count': len(schedules),
+        'total_payment': _format_cents(sum(schedule.total_payment for schedule in schedules)),
+        'total_principal': _format_cents(sum(schedule.total_principal for schedule in schedules)),
+        'total_interest': _format_cents(sum(schedule.total_interest for schedule in schedules)),
+        'schedules': [schedule_payload(schedule) for schedule in schedules],
+    }
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from decimal import Decimal
 from .models import (
     SavingsGroup, GroupMembership, Contribution, 
     Loan, Investment, FinancialEducation,
@@ -22,16 +23,45 @@ class GroupMembershipSerializer(serializers.ModelSerializer):
     class Meta:
         model = GroupMembership
         fields = '__all__'
+        read_only_fields = ('total_deposits', 'total_withdrawals')
 
 class ContributionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Contribution
         fields = '__all__'
 
+class BulkContributionListSerializer(serializers.ListSerializer):
+    def validate(self, attrs):
+        # Resolve every member in one query instead of one lookup per row
+        member_ids = {item['member'] for item in attrs}
+        memberships = GroupMembership.objects.select_related('group').in_bulk(member_ids)
+        missing = sorted(member_ids - memberships.keys())
+        if missing:
+            raise serializers.ValidationError(f'Unknown group memberships: {missing}')
+        for item in attrs:
+            item['member'] = memberships[item['member']]
+        return attrs
+
+class BulkContributionSerializer(serializers.Serializer):
+    member = serializers.IntegerField()
+    amount = serializers.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        min_value=Decimal('0.01')
+    )
+    transaction_type = serializers.ChoiceField(
+        choices=[('DEPOSIT', 'Deposit'), ('WITHDRAWAL', 'Withdrawal')]
+    )
+
+    class Meta:
+        list_serializer_class = BulkContributionListSerializer
+
 class LoanSerializer(serializers.ModelSerializer):
     class Meta:
         model = Loan
         fields = '__all__'
+        # Loans are approved, and disbursed, only through review_loans()
+        read_only_fields = ('status', 'transaction')
 
 class InvestmentSerializer(serializers.ModelSerializer):
     class Meta:
@@ -1,36 +1,294 @@
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage, get_connection
 from django.conf import settings
+from django.contrib.auth.models import User
 from django.template.loader import render_to_string
 from django.utils import timezone
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Q, Sum, Count, Case, When, Value
+from django.db.models.functions import TruncDate
+from collections import defaultdict, Counter
 from datetime import timedelta
 from decimal import Decimal
+import logging
+import time
+import uuid
+from .events import publish_notifications
+from .routers import read_from_replica
+from .valuation import growth_factor
 from .models import (
     Loan, Investment, Contribution, Notification,
-    TransactionHistory, UserProfile, SavingsGroup
+    TransactionHistory, UserProfile, SavingsGroup, GroupMembership,
+    InvestmentRevaluationRun, GroupDailyRollup, OutboundEmail, IdempotencyKey
 )
 
+# Members can borrow up to this multiple of their total deposits
+LOAN_ELIGIBILITY_MULTIPLIER = Decimal('3.0')
+
+REVALUATION_CHUNK_SIZE = 2000
+OVERDUE_SWEEP_BATCH_SIZE = 1000
+NOTIFICATION_CHUNK_SIZE = 1000
+
+logger = logging.getLogger('fintech.outbox')
+
+def queue_email(subject, message, recipient_list, from_email=None):
+    """Write emails to the outbox; process_email_outbox delivers them
+
+    Rows are written in the caller's transaction, so an email is only sent if
+    the change that triggered it commits, and the request never waits on SMTP.
+    """
+    return OutboundEmail.objects.bulk_create([
+        OutboundEmail(
+            recipient=recipient,
+            subject=subject,
+            body=message,
+            from_email=from_email or settings.DEFAULT_FROM_EMAIL
+        )
+        for recipient in recipient_list
+    ])
+
 def send_verification_email(user, token):
     """Send account verification email"""
     subject = 'Verify your Wakala Digital account'
     message = f'Click the link to verify your account: {settings.SITE_URL}/verify/{token}/'
-    send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
+    queue_email(subject, message, [user.email])
 
 def send_password_reset_email(user, token):
     """Send password reset email"""
     subject = 'Reset your Wakala Digital password'
     message = f'Click the link to reset your password: {settings.SITE_URL}/reset-password/{token}/'
-    send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
+    queue_email(subject, message, [user.email])
+
+def claim_outbox_batch(batch_size):
+    """Lease up to ``batch_size`` due emails to the calling worker
+
+    The claim is a conditional UPDATE that only matches rows nobody else holds
+    a live lease on, so concurrent workers never get the same email. Returns
+    the claim token and the claimed emails.
+    """
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    claimable = Q(status='PENDING', next_attempt_at__lte=now) & (
+        Q(locked_until__isnull=True) | Q(locked_until__lt=now)
+    )
+    candidates = list(
+        OutboundEmail.objects.filter(claimable)
+        .order_by('next_attempt_at', 'pk')
+        .values_list('pk', flat=True)[:batch_size]
+    )
+    if not candidates:
+        return token, []
+    OutboundEmail.objects.filter(claimable, pk__in=candidates).update(
+        locked_by=token,
+        locked_until=now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+    )
+    return token, list(OutboundEmail.objects.filter(locked_by=token).order_by('pk'))
+
+def outbox_retry_delay(attempts):
+    """Exponential backoff after the given number of failed attempts"""
+    delay = settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, settings.OUTBOX_RETRY_MAX_SECONDS))
+
+def process_email_outbox(connection=None, batch_size=None):
+    """Send one claimed batch of outbox emails over a single connection
+
+    Pass the same ``connection`` on every call to reuse it across batches.
+    Each email is marked SENT as soon as it's delivered. Failed sends are
+    retried with exponential backoff until OUTBOX_MAX_ATTEMPTS is reached. If
+    the connection can't be reopened after a failure, the rest of the batch
+    is released for the next run. A worker that dies mid-batch leaves its
+    lease to expire, after which the emails are claimed again, so delivery is
+    at least once. Returns ``(sent, failed)`` counts for the batch.
+    """
+    token, emails = claim_outbox_batch(batch_size or settings.OUTBOX_BATCH_SIZE)
+    if not emails:
+        return 0, 0
+
+    connection = connection or get_connection()
+    sent = failed = 0
+    try:
+        connection.open()
+        for email in emails:
+            message = EmailMessage(
+                email.subject,
+                email.body,
+                email.from_email or settings.DEFAULT_FROM_EMAIL,
+                [email.recipient],
+                connection=connection
+            )
+            try:
+                message.send()
+            except Exception as exc:
+                failed += 1
+                attempts = email.attempts + 1
+                final = attempts >= settings.OUTBOX_MAX_ATTEMPTS
+                OutboundEmail.objects.filter(pk=email.pk, locked_by=token).update(
+                    attempts=attempts,
+                    status='FAILED' if final else 'PENDING',
+                    next_attempt_at=timezone.now() + outbox_retry_delay(attempts),
+                    last_error=str(exc)[:2000],
+                    locked_by='',
+                    locked_until=None
+                )
+                # The connection may be broken; reopen it for the rest of the batch
+                try:
+                    connection.close()
+                    connection.open()
+                except Exception:
+                    logger.warning('Mail server unreachable, releasing the rest of the batch', exc_info=True)
+                    break
+            else:
+                sent += 1
+                OutboundEmail.objects.filter(pk=email.pk, locked_by=token).update(
+                    status='SENT',
+                    sent_at=timezone.now(),
+                    attempts=F('attempts') + 1,
+                    locked_by='',
+                    locked_until=None
+                )
+    finally:
+        # Hand back whatever wasn't attempted so another run can claim it now
+        OutboundEmail.objects.filter(locked_by=token).update(locked_by='', locked_until=None)
+    return sent, failed
 
 def calculate_loan_eligibility(member):
-    """Calculate how much a member can borrow"""
-    total_contributions = Contribution.objects.filter(
-        member=member,
-        transaction_type='DEPOSIT'
-    ).aggregate(total=models.Sum('amount'))['total'] or 0
-    
+    """Calculate how much a member can borrow
+
+    Reads the running deposit total kept on the membership row, so the cost
+    doesn't grow with the member's contribution history.
+    """
+    total_contributions = GroupMembership.objects.values_list(
+        'total_deposits', flat=True
+    ).get(pk=member.pk)
+
     # Can borrow up to 3 times their total contributions
-    return total_contributions * Decimal('3.0')
+    return total_contributions * LOAN_ELIGIBILITY_MULTIPLIER
+
+def group_loan_eligibility(group):
+    """Return the borrowing limit of every member of a group"""
+    memberships = GroupMembership.objects.filter(group=group).select_related('user').order_by('pk')
+    return [
+        {
+            'member': membership.pk,
+            'user': membership.user_id,
+            'username': membership.user.username,
+            'total_deposits': membership.total_deposits,
+            'total_withdrawals': membership.total_withdrawals,
+            'eligibility': membership.total_deposits * LOAN_ELIGIBILITY_MULTIPLIER
+        }
+        for membership in memberships
+    ]
+
+def reconcile_member_totals(member_ids, fix=False):
+    """Recompute member contribution totals and report the ones that drifted
+
+    Returns ``(membership_id, field, stored, actual)`` tuples; with ``fix`` the
+    stored totals are corrected in place.
+    """
+    actual = defaultdict(lambda: {'total_deposits': Decimal('0'), 'total_withdrawals': Decimal('0')})
+    sums = Contribution.objects.filter(member_id__in=member_ids).values(
+        'member_id', 'transaction_type'
+    ).annotate(total=Sum('amount')).order_by()
+    for item in sums:
+        field = 'total_deposits' if item['transaction_type'] == 'DEPOSIT' else 'total_withdrawals'
+        actual[item['member_id']][field] = item['total'].quantize(Decimal('0.01'))
+
+    mismatches = []
+    stored = GroupMembership.objects.filter(pk__in=member_ids).values_list(
+        'pk', 'total_deposits', 'total_withdrawals'
+    )
+    for membership_id, deposits, withdrawals in stored:
+        totals = actual[membership_id]
+        changed = {}
+        for field, value in (('total_deposits', deposits), ('total_withdrawals', withdrawals)):
+            if value != totals[field]:
+                mismatches.append((membership_id, field, value, totals[field]))
+                changed[field] = totals[field]
+        if fix and changed:
+            GroupMembership.objects.filter(pk=membership_id).update(**changed)
+    return mismatches
+
+def post_contributions_bulk(entries):
+    """Post a batch of contributions with set-based ledger writes
+
+    Each entry is a dict with ``member`` (a GroupMembership with its group
+    loaded), ``amount`` and ``transaction_type``. Transaction history rows and
+    contributions are bulk inserted and every affected group gets a single
+    balance update, all inside one transaction.
+    """
+    deltas = defaultdict(Decimal)
+    for entry in entries:
+        if entry['transaction_type'] == 'DEPOSIT':
+            deltas[entry['member'].group_id] += entry['amount']
+        else:
+            deltas[entry['member'].group_id] -= entry['amount']
+
+    with transaction.atomic():
+        # Apply the balance changes first, in a stable order so concurrent
+        # batches can't deadlock, then read back the committed balances
+        for group_id in sorted(deltas):
+            SavingsGroup.objects.filter(pk=group_id).update(
+                total_balance=F('total_balance') + deltas[group_id]
+            )
+        balances = dict(
+            SavingsGroup.objects.filter(pk__in=deltas).values_list('pk', 'total_balance')
+        )
+        running = {group_id: balances[group_id] - deltas[group_id] for group_id in deltas}
+
+        transactions = []
+        for entry in entries:
+            member = entry['member']
+            if entry['transaction_type'] == 'DEPOSIT':
+                running[member.group_id] += entry['amount']
+            else:
+                running[member.group_id] -= entry['amount']
+            transactions.append(TransactionHistory(
+                user_id=member.user_id,
+                transaction_type='CONTRIBUTION',
+                amount=entry['amount'],
+                balance_after=running[member.group_id],
+                description=f"{entry['transaction_type']} to group {member.group.name}",
+                status='COMPLETED'
+            ))
+        TransactionHistory.objects.bulk_create(transactions)
+
+        contributions = Contribution.objects.bulk_create([
+            Contribution(
+                member=entry['member'],
+                amount=entry['amount'],
+                transaction_type=entry['transaction_type'],
+                transaction=txn
+            )
+            for entry, txn in zip(entries, transactions)
+        ])
+
+        member_totals = defaultdict(Decimal)
+        for contribution in contributions:
+            total_field = 'total_deposits' if contribution.transaction_type == 'DEPOSIT' else 'total_withdrawals'
+            member_totals[(contribution.member_id, total_field)] += contribution.amount
+        # One UPDATE for every member touched by the batch
+        GroupMembership.objects.filter(
+            pk__in={member_id for member_id, total_field in member_totals}
+        ).update(**{
+            total_field: F(total_field) + Case(
+                *[
+                    When(pk=member_id, then=Value(amount))
+                    for (member_id, field), amount in member_totals.items()
+                    if field == total_field
+                ],
+                default=Value(Decimal('0')),
+                output_field=models.DecimalField(max_digits=15, decimal_places=2)
+            )
+            for total_field in ('total_deposits', 'total_withdrawals')
+        })
+
+        rollups = defaultdict(Decimal)
+        for contribution in contributions:
+            total_field = 'deposit_total' if contribution.transaction_type == 'DEPOSIT' else 'withdrawal_total'
+            rollups[(contribution.member.group_id, timezone.localdate(contribution.date), total_field)] += contribution.amount
+        for (group_id, day, total_field), amount in rollups.items():
+            GroupDailyRollup.record(group_id, day, **{total_field: amount})
+
+    return contributions
 
 def check_investment_limits(group):
     """Check if a group can make more investments based on their tier"""
@@ -45,38 +303,322 @@ def check_investment_limits(group):
     else:
         return total_investments < group.total_balance * Decimal('0.7')  # 70% limit
 
-def create_loan_notification(loan):
-    """Create notification for loan status changes"""
-    Notification.objects.create(
-        user=loan.borrower.user,
+def create_notifications(notifications, chunk_size=NOTIFICATION_CHUNK_SIZE):
+    """Write unsaved Notification instances with chunked bulk inserts
+
+    Unread counters are bumped with one UPDATE per distinct increment, which
+    is a single UPDATE for a fan-out. The counter is only kept in step by this
+    function, mark_notifications_read(), Notification.save() and deletes: a
+    raw ``bulk_create()`` or a queryset ``update(read=...)`` elsewhere
+    bypasses it, so bulk writes must go through these helpers.
+    """
+    with transaction.atomic():
+        created = Notification.objects.bulk_create(notifications, batch_size=chunk_size)
+        unread = Counter(notification.user_id for notification in created if not notification.read)
+        users_by_increment = defaultdict(list)
+        for user_id, count in unread.items():
+            users_by_increment[count].append(user_id)
+        for increment, user_ids in users_by_increment.items():
+            UserProfile.objects.filter(user_id__in=user_ids).update(
+                unread_notifications=F('unread_notifications') + increment
+            )
+        transaction.on_commit(lambda: publish_notifications(created))
+    return created
+
+def unread_notification_count(user):
+    """Return the user's unread notification count from their profile row"""
+    count = UserProfile.objects.filter(user=user).values_list('unread_notifications', flat=True).first()
+    return max(count or 0, 0)
+
+def mark_notifications_read(user, ids=None):
+    """Mark the given (or all) unread notifications of a user as read
+
+    Runs as one UPDATE on the notifications and one on the counter, whatever
+    the number of notifications. Returns how many were marked.
+    """
+    with transaction.atomic():
+        notifications = Notification.objects.filter(user=user, read=False)
+        if ids is not None:
+            notifications = notifications.filter(pk__in=ids)
+        marked = notifications.update(read=True)
+        if marked:
+            UserProfile.objects.filter(user=user).update(
+                unread_notifications=F('unread_notifications') - marked
+            )
+    return marked
+
+def group_audience(group):
+    """User ids of every member of a group"""
+    return GroupMembership.objects.filter(group=group).order_by('pk').values_list('user_id', flat=True)
+
+def overdue_borrower_audience():
+    """User ids of every borrower with a loan past its due date"""
+    return Loan.objects.filter(
+        status__in=['APPROVED', 'DEFAULTED'],
+        due_date__lt=timezone.now()
+    ).order_by().values_list('borrower__user_id', flat=True).distinct()
+
+def everyone_audience():
+    """User ids of every active user"""
+    return User.objects.filter(is_active=True).order_by('pk').values_list('pk', flat=True)
+
+def fan_out_notification(audience, title, message, notification_type, chunk_size=NOTIFICATION_CHUNK_SIZE):
+    """Send the same notification to every user id in ``audience``
+
+    The audience is streamed and written ``chunk_size`` rows at a time, so the
+    number of queries depends on the audience size only through the chunk
+    count. Returns the number of notifications created.
+    """
+    created = 0
+    batch = []
+    for user_id in audience.iterator(chunk_size=chunk_size):
+        batch.append(Notification(
+            user_id=user_id,
+            title=title,
+            message=message,
+            notification_type=notification_type
+        ))
+        if len(batch) == chunk_size:
+            created += len(create_notifications(batch, chunk_size))
+            batch = []
+    if batch:
+        created += len(create_notifications(batch, chunk_size))
+    return created
+
+def loan_notification(loan):
+    """Unsaved notification telling the borrower about a loan's status"""
+    return Notification(
+        user_id=loan.borrower.user_id,
         title=f'Loan {loan.status.lower()}',
         message=f'Your loan request for {loan.amount} has been {loan.status.lower()}',
         notification_type='ALERT'
     )
 
-def check_and_update_loan_status():
-    """Check for overdue loans and update their status"""
-    overdue_loans = Loan.objects.filter(
-        status='APPROVED',
-        due_date__lt=timezone.now()
-    )
-    for loan in overdue_loans:
-        loan.status = 'DEFAULTED'
-        loan.save()
-        Notification.objects.create(
-            user=loan.borrower.user,
-            title='Loan Defaulted',
-            message=f'Your loan of {loan.amount} is overdue',
-            notification_type='PAYMENT_DUE'
+def create_loan_notification(loan):
+    """Create notification for loan status changes"""
+    create_notifications([loan_notification(loan)])
+
+def review_loans(approve_ids=(), reject_ids=(), group_ids=None):
+    """Approve and reject a batch of pending loans in one transaction
+
+    Approved loans are disbursed: every group's balance is reduced with a
+    single UPDATE, the LOAN transaction rows are bulk inserted and linked,
+    and the borrowers of both approved and rejected loans are notified in
+    one bulk insert. A loan is skipped, with the reason, when it isn't
+    pending, belongs to a group outside ``group_ids`` (None allows every
+    group), would take its borrower's outstanding principal (approved loans,
+    including the ones approved earlier in the batch) past the limit of
+    calculate_loan_eligibility(), or when its group's balance can't cover it
+    after the loans before it.
+
+    Loans, then their groups, are locked in primary key order, and balances
+    and deposit totals are read once the groups are locked, so concurrent
+    batches queue instead of disbursing the same loan or balance twice.
+    Returns ``{'approved': [ids], 'rejected': [ids], 'skipped': {id: reason}}``.
+    """
+    approve_ids, reject_ids = set(approve_ids), set(reject_ids)
+    skipped = {}
+    with transaction.atomic():
+        loans = list(
+            Loan.objects.select_for_update(of=('self',))
+            .filter(pk__in=approve_ids | reject_ids)
+            .select_related('borrower__group', 'borrower__user')
+            .order_by('pk')
         )
+        for pk in sorted((approve_ids | reject_ids) - {loan.pk for loan in loans}):
+            skipped[pk] = 'not found'
+
+        to_approve, to_reject = [], []
+        for loan in loans:
+            if group_ids is not None and loan.borrower.group_id not in group_ids:
+                skipped[loan.pk] = 'not a group admin'
+            elif loan.status != 'PENDING':
+                skipped[loan.pk] = f'already {loan.status.lower()}'
+            elif loan.pk in approve_ids:
+                to_approve.append(loan)
+            else:
+                to_reject.append(loan)
+
+        # Lock the groups before reading balances and deposit totals: other
+        # reviews and every contribution update the group row, so they wait
+        # here and what is read below stays current until the commit
+        available = dict(
+            SavingsGroup.objects.select_for_update()
+            .filter(pk__in={loan.borrower.group_id for loan in to_approve})
+            .order_by('pk')
+            .values_list('pk', 'total_balance')
+        )
+        deposits = dict(GroupMembership.objects.filter(
+            pk__in={loan.borrower_id for loan in to_approve}
+        ).values_list('pk', 'total_deposits'))
+        # Principal each borrower already owes on approved loans
+        borrowed = defaultdict(Decimal, Loan.objects.filter(
+            borrower_id__in={loan.borrower_id for loan in to_approve}, status='APPROVED'
+        ).values('borrower_id').annotate(total=Sum('amount')).values_list('borrower_id', 'total').order_by())
+        disbursed = defaultdict(Decimal)
+        approved = []
+        for loan in to_approve:
+            member = loan.borrower
+            # The limit calculate_loan_eligibility() reads
+            if borrowed[member.pk] + loan.amount > deposits[member.pk] * LOAN_ELIGIBILITY_MULTIPLIER:
+                skipped[loan.pk] = 'exceeds borrower eligibility'
+            elif disbursed[member.group_id] + loan.amount > available[member.group_id]:
+                skipped[loan.pk] = 'insufficient group balance'
+            else:
+                borrowed[member.pk] += loan.amount
+                disbursed[member.group_id] += loan.amount
+                approved.append(loan)
+
+        for group_id in sorted(disbursed):
+            SavingsGroup.objects.filter(pk=group_id).update(
+                total_balance=F('total_balance') - disbursed[group_id]
+            )
+        balances = dict(SavingsGroup.objects.filter(pk__in=disbursed).values_list('pk', 'total_balance'))
+        running = {group_id: balances[group_id] + disbursed[group_id] for group_id in disbursed}
+
+        transactions = []
+        for loan in approved:
+            member = loan.borrower
+            running[member.group_id] -= loan.amount
+            transactions.append(TransactionHistory(
+                user_id=member.user_id,
+                transaction_type='LOAN',
+                amount=loan.amount,
+                balance_after=running[member.group_id],
+                description=f"Loan disbursement for {member.user.username}",
+                status='COMPLETED'
+            ))
+        TransactionHistory.objects.bulk_create(transactions)
+
+        for loan, txn in zip(approved, transactions):
+            loan.status = 'APPROVED'
+            loan.transaction = txn
+        Loan.objects.bulk_update(approved, ['status', 'transaction'])
+        for loan in to_reject:
+            loan.status = 'REJECTED'
+        Loan.objects.filter(pk__in=[loan.pk for loan in to_reject]).update(status='REJECTED')
+        for loan in approved + to_reject:
+            loan._loaded_status = loan.status
+
+        opened = Counter(loan.borrower.group_id for loan in approved)
+        for group_id, count in opened.items():
+            GroupDailyRollup.record(group_id, loans_opened=count)
+        create_notifications([loan_notification(loan) for loan in approved + to_reject])
+
+    return {
+        'approved': [loan.pk for loan in approved],
+        'rejected': [loan.pk for loan in to_reject],
+        'skipped': skipped,
+    }
+
+def check_and_update_loan_status(batch_size=OVERDUE_SWEEP_BATCH_SIZE):
+    """Check for overdue loans and update their status
+
+    Each batch claims up to ``batch_size`` overdue loans, marks them DEFAULTED
+    with one conditional UPDATE and bulk creates the borrowers' notifications
+    in the same short transaction. Returns the number of loans defaulted.
+    """
+    now = timezone.now()
+    defaulted = 0
+    while True:
+        with transaction.atomic():
+            loan_ids = list(
+                Loan.objects.select_for_update()
+                .filter(status='APPROVED', due_date__lt=now)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not loan_ids:
+                break
+            Loan.objects.filter(pk__in=loan_ids, status='APPROVED').update(status='DEFAULTED')
+            loans = list(Loan.objects.filter(pk__in=loan_ids).values_list(
+                'amount', 'borrower__user_id', 'borrower__group_id'
+            ))
+            create_notifications([
+                Notification(
+                    user_id=user_id,
+                    title='Loan Defaulted',
+                    message=f'Your loan of {amount} is overdue',
+                    notification_type='PAYMENT_DUE'
+                )
+                for amount, user_id, group_id in loans
+            ])
+            closed = Counter(group_id for amount, user_id, group_id in loans)
+            for group_id, count in closed.items():
+                GroupDailyRollup.record(group_id, loans_closed=count)
+        defaulted += len(loan_ids)
+    return defaulted
 
 def update_investment_values():
     """Update current values of investments based on their return rates"""
-    investments = Investment.objects.all()
-    for investment in investments:
-        returns = investment.calculate_returns()
-        investment.current_value = investment.amount + returns
-        investment.save()
+    return revalue_investments()
+
+def revalue_investments(chunk_size=REVALUATION_CHUNK_SIZE, resume=True, as_of=None):
+    """Revalue every investment in chunks, resuming an interrupted run
+
+    Investments are streamed in primary key order. Growth factors come from
+    the cache in ``valuation``, and each chunk is written with ``bulk_update``
+    together with the run checkpoint, so a crashed run picks up after the last
+    chunk it committed. Only the newest run is ever resumed: once a later run
+    has been started, an older unfinished one and its ``as_of`` are stale.
+    """
+    run = None
+    if resume:
+        run = InvestmentRevaluationRun.objects.order_by('-started_at', '-pk').first()
+        if run is not None and run.completed_at is not None:
+            run = None
+    if run is None:
+        run = InvestmentRevaluationRun.objects.create(as_of=as_of or timezone.now())
+
+    investments = Investment.objects.filter(
+        pk__gt=run.last_investment_id
+    ).order_by('pk').only('pk', 'group_id', 'amount', 'date', 'annual_return_rate', 'current_value')
+
+    started = time.monotonic()
+    processed = 0
+    chunk = []
+    for investment in investments.iterator(chunk_size=chunk_size):
+        chunk.append(investment)
+        if len(chunk) == chunk_size:
+            _revalue_chunk(run, chunk)
+            processed += len(chunk)
+            chunk = []
+    if chunk:
+        _revalue_chunk(run, chunk)
+        processed += len(chunk)
+
+    run.completed_at = timezone.now()
+    run.save(update_fields=['completed_at'])
+
+    elapsed = time.monotonic() - started
+    return {
+        'run': run.pk,
+        'rows': processed,
+        'seconds': elapsed,
+        'rows_per_second': processed / elapsed if elapsed > 0 else 0
+    }
+
+def _revalue_chunk(run, chunk):
+    """Compute new values for one chunk and commit them with the checkpoint"""
+    changed = []
+    value_deltas = defaultdict(Decimal)
+    for investment in chunk:
+        factor = growth_factor(investment.annual_return_rate, (run.as_of - investment.date).days)
+        # Same arithmetic as Investment.calculate_returns(), rounded to the column scale
+        returns = investment.amount * factor - investment.amount
+        value = (investment.amount + returns).quantize(Decimal('0.01'))
+        if value != investment.current_value:
+            value_deltas[investment.group_id] += value - investment.current_value
+            investment.current_value = value
+            changed.append(investment)
+
+    with transaction.atomic():
+        Investment.objects.bulk_update(changed, ['current_value'])
+        for group_id, delta in value_deltas.items():
+            GroupDailyRollup.record(group_id, investment_value=delta)
+        run.last_investment_id = chunk[-1].pk
+        run.rows_processed += len(chunk)
+        run.save(update_fields=['last_investment_id', 'rows_processed'])
 
 def process_group_upgrade(group):
     """Check and process group tier upgrades"""
@@ -96,41 +638,132 @@ def process_group_upgrade(group):
 
 def create_group_upgrade_notification(group):
     """Create notification for group tier upgrade"""
-    for member in group.members.all():
-        Notification.objects.create(
-            user=member,
-            title='Group Tier Upgraded',
-            message=f'Your group {group.name} has been upgraded to Tier {group.tier_level}',
-            notification_type='MILESTONE'
-        )
+    return fan_out_notification(
+        group_audience(group),
+        title='Group Tier Upgraded',
+        message=f'Your group {group.name} has been upgraded to Tier {group.tier_level}',
+        notification_type='MILESTONE'
+    )
 
-def calculate_group_analytics(group):
-    """Calculate analytics for group dashboard"""
-    now = timezone.now()
-    month_ago = now - timedelta(days=30)
-    
+def group_analytics_aggregates():
+    """Aggregates over a group's rollup rows that the dashboard figures need"""
+    month_ago = timezone.localdate() - timedelta(days=30)
+    return {
+        'monthly_contributions': Sum('deposit_total', filter=Q(day__gt=month_ago)),
+        'total_investment': Sum('investment_principal'),
+        'current_value': Sum('investment_value'),
+        'loans_opened': Sum('loans_opened'),
+        'loans_closed': Sum('loans_closed'),
+    }
+
+def summarize_group_analytics(totals):
     # Monthly contribution growth
-    current_month_contributions = Contribution.objects.filter(
-        member__group=group,
-        date__gte=month_ago,
-        transaction_type='DEPOSIT'
-    ).aggregate(total=models.Sum('amount'))['total'] or 0
-    
+    current_month_contributions = totals['monthly_contributions'] or 0
+
     # Investment performance
-    investments = Investment.objects.filter(group=group)
-    total_investment = sum(inv.amount for inv in investments)
-    current_value = sum(inv.current_value for inv in investments)
+    total_investment = totals['total_investment'] or 0
+    current_value = totals['current_value'] or 0
     investment_return = ((current_value - total_investment) / total_investment * 100) if total_investment > 0 else 0
-    
+
     # Loan statistics
-    active_loans = Loan.objects.filter(
-        borrower__group=group,
-        status='APPROVED'
-    ).count()
-    
+    active_loans = (totals['loans_opened'] or 0) - (totals['loans_closed'] or 0)
+
     return {
         'monthly_contributions': current_month_contributions,
         'total_investments': total_investment,
         'investment_returns': investment_return,
         'active_loans': active_loans
     }
+
+@read_from_replica()
+def calculate_group_analytics(group):
+    """Calculate analytics for group dashboard
+
+    Reads the per-day rollup rows, so the cost grows with the number of days
+    the group has been active rather than with its number of transactions.
+    """
+    totals = GroupDailyRollup.objects.filter(group=group).aggregate(**group_analytics_aggregates())
+    return summarize_group_analytics(totals)
+
+async def acalculate_group_analytics(group):
+    """Async version of calculate_group_analytics() for the ASGI views"""
+    totals = await GroupDailyRollup.objects.filter(group=group).aaggregate(**group_analytics_aggregates())
+    return summarize_group_analytics(totals)
+
+def group_daily_series_queryset(group, days=30):
+    since = timezone.localdate() - timedelta(days=days)
+    return GroupDailyRollup.objects.filter(group=group, day__gt=since).order_by('day').values(
+        'day', 'deposit_total', 'withdrawal_total',
+        'investment_principal', 'investment_value',
+        'loans_opened', 'loans_closed'
+    )
+
+@read_from_replica()
+def group_daily_series(group, days=30):
+    """Return the group's rollup rows for the last ``days`` days"""
+    return list(group_daily_series_queryset(group, days))
+
+def rebuild_group_rollups(group_ids):
+    """Rebuild the rollup rows of the given groups from the ledger tables
+
+    The groups are locked while the ledger is read and the rows replaced, so
+    writes that land mid-rebuild are neither lost nor counted twice. Active
+    loans are counted on the day they started, since past status changes are
+    not recorded anywhere; loans that already left APPROVED contribute
+    nothing.
+    """
+    rows = {}
+
+    def row(group_id, day):
+        if (group_id, day) not in rows:
+            rows[(group_id, day)] = GroupDailyRollup(group_id=group_id, day=day)
+        return rows[(group_id, day)]
+
+    with transaction.atomic():
+        # Contributions, investments and disbursements update the group's
+        # balance, so they wait on this lock until the rebuild commits
+        list(
+            SavingsGroup.objects.select_for_update()
+            .filter(pk__in=group_ids)
+            .order_by('pk')
+            .values_list('pk', flat=True)
+        )
+        contributions = Contribution.objects.filter(member__group_id__in=group_ids).annotate(
+            day=TruncDate('date')
+        ).values('member__group_id', 'day', 'transaction_type').annotate(total=Sum('amount')).order_by()
+        for item in contributions:
+            rollup = row(item['member__group_id'], item['day'])
+            if item['transaction_type'] == 'DEPOSIT':
+                rollup.deposit_total += item['total']
+            else:
+                rollup.withdrawal_total += item['total']
+
+        investments = Investment.objects.filter(group_id__in=group_ids).annotate(
+            day=TruncDate('date')
+        ).values('group_id', 'day').annotate(
+            principal=Sum('amount'), value=Sum('current_value')
+        ).order_by()
+        for item in investments:
+            rollup = row(item['group_id'], item['day'])
+            rollup.investment_principal = item['principal']
+            rollup.investment_value = item['value']
+
+        loans = Loan.objects.filter(borrower__group_id__in=group_ids, status='APPROVED').annotate(
+            day=TruncDate('start_date')
+        ).values('borrower__group_id', 'day').annotate(opened=Count('pk')).order_by()
+        for item in loans:
+            row(item['borrower__group_id'], item['day']).loans_opened = item['opened']
+
+        GroupDailyRollup.objects.filter(group_id__in=group_ids).delete()
+        GroupDailyRollup.objects.bulk_create(rows.values())
+    return len(rows)
+
+def purge_idempotency_keys(retention_hours=None):
+    """Delete stored Idempotency-Key responses older than the retention period
+
+    Returns the number of keys deleted.
+    """
+    hours = settings.IDEMPOTENCY_KEY_RETENTION_HOURS if retention_hours is None else retention_hours
+    cutoff = timezone.now() - timedelta(hours=hours)
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,175 @@
+"""
+Streaming account statements.
+
+A statement is the chronological merge of a member's or a group's
+TransactionHistory, Contribution and Loan rows. Each source is read with
+``.iterator()`` and rows are encoded as they arrive, so an export holds at
+most one chunk per source in memory however long the statement is.
+"""
+import csv
+import heapq
+import io
+import json
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from uuid import UUID
+
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Contribution, Loan, TransactionHistory
+
+# Rows fetched per round trip from each source
+STATEMENT_CHUNK_SIZE = 2000
+# Rows encoded per block handed to the server, so it isn't asked to write each line separately
+STATEMENT_BATCH_ROWS = 500
+
+STATEMENT_COLUMNS = (
+    'record', 'id', 'timestamp', 'member', 'type', 'amount',
+    'balance_after', 'status', 'reference', 'description'
+)
+
+STATEMENT_FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+def statement_period(start=None, end=None):
+    """Turn inclusive ``YYYY-MM-DD`` bounds into an aware [since, until) range
+
+    Raises ValueError for a malformed date or an end before the start.
+    """
+    since = until = None
+    if start:
+        since = timezone.make_aware(datetime.combine(datetime.strptime(start, '%Y-%m-%d'), time.min))
+    if end:
+        until = timezone.make_aware(
+            datetime.combine(datetime.strptime(end, '%Y-%m-%d') + timedelta(days=1), time.min)
+        )
+    if since and until and until <= since:
+        raise ValueError('end must not be before start')
+    return since, until
+
+
+def _in_period(queryset, field, since, until):
+    if since:
+        queryset = queryset.filter(**{f'{field}__gte': since})
+    if until:
+        queryset = queryset.filter(**{f'{field}__lt': until})
+    return queryset
+
+
+def transaction_rows(queryset, chunk_size=STATEMENT_CHUNK_SIZE):
+    rows = queryset.order_by('created_at', 'id').values_list(
+        'id', 'created_at', 'user__username', 'transaction_type', 'amount',
+        'balance_after', 'status', 'transaction_id', 'description'
+    )
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield ('transaction',) + row
+
+
+def contribution_rows(queryset, chunk_size=STATEMENT_CHUNK_SIZE):
+    rows = queryset.order_by('date', 'id').values_list(
+        'id', 'date', 'member__user__username', 'transaction_type', 'amount',
+        'transaction__balance_after', 'transaction__status', 'transaction__transaction_id'
+    )
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield ('contribution',) + row + ('',)
+
+
+def loan_rows(queryset, chunk_size=STATEMENT_CHUNK_SIZE):
+    rows = queryset.order_by('start_date', 'id').values_list(
+        'id', 'start_date', 'borrower__user__username', 'amount', 'status',
+        'transaction__transaction_id', 'interest_rate', 'due_date'
+    )
+    for pk, start, member, amount, status, reference, rate, due in rows.iterator(chunk_size=chunk_size):
+        description = f'{rate}% interest, due {due.date().isoformat()}'
+        yield ('loan', pk, start, member, 'LOAN', amount, None, status, reference, description)
+
+
+def _merge(*sources):
+    return heapq.merge(*sources, key=lambda row: (row[2], row[0], row[1]))
+
+
+def user_statement_rows(user, since=None, until=None, chunk_size=STATEMENT_CHUNK_SIZE):
+    """Every ledger, contribution and loan row of ``user``, oldest first"""
+    return _merge(
+        transaction_rows(
+            _in_period(TransactionHistory.objects.filter(user=user), 'created_at', since, until), chunk_size
+        ),
+        contribution_rows(
+            _in_period(Contribution.objects.filter(member__user=user), 'date', since, until), chunk_size
+        ),
+        loan_rows(
+            _in_period(Loan.objects.filter(borrower__user=user), 'start_date', since, until), chunk_size
+        ),
+    )
+
+
+def group_statement_rows(group, since=None, until=None, chunk_size=STATEMENT_CHUNK_SIZE):
+    """Every contribution and loan of ``group`` and their ledger rows, oldest first"""
+    # Pick the ledger rows by id through the group's contributions and loans,
+    # so only those rows are read and sorted, not the whole ledger
+    transactions = TransactionHistory.objects.filter(
+        Q(pk__in=Contribution.objects.filter(member__group=group).values('transaction_id'))
+        | Q(pk__in=Loan.objects.filter(borrower__group=group).values('transaction_id'))
+    )
+    return _merge(
+        transaction_rows(_in_period(transactions, 'created_at', since, until), chunk_size),
+        contribution_rows(
+            _in_period(Contribution.objects.filter(member__group=group), 'date', since, until), chunk_size
+        ),
+        loan_rows(
+            _in_period(Loan.objects.filter(borrower__group=group), 'start_date', since, until), chunk_size
+        ),
+    )
+
+
+# Values that neither csv nor json can write as-is, keyed by exact type
+_CONVERTERS = {datetime: datetime.isoformat, Decimal: str, UUID: str}
+
+
+def _plain(row):
+    return [value if type(value) not in _CONVERTERS else _CONVERTERS[type(value)](value) for value in row]
+
+
+def _batches(rows, size=STATEMENT_BATCH_ROWS):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def csv_blocks(rows):
+    """Encode rows as CSV, one block of text per batch of rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(STATEMENT_COLUMNS)
+    for batch in _batches(rows):
+        writer.writerows(map(_plain, batch))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def jsonl_blocks(rows):
+    """Encode rows as JSON lines, one block of text per batch of rows"""
+    encode = json.JSONEncoder().encode
+    for batch in _batches(rows):
+        yield ''.join([encode(dict(zip(STATEMENT_COLUMNS, _plain(row)))) + '\n' for row in batch])
+
+
+def statement_response(rows, output, filename):
+    """Stream ``rows`` as a CSV or JSONL download"""
+    blocks = csv_blocks(rows) if output == 'csv' else jsonl_blocks(rows)
+    response = StreamingHttpResponse(blocks, content_type=STATEMENT_FORMATS[output])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{output}"'
+    return response
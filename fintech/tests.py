@@ -1,16 +1,78 @@
-from django.test import TestCase
+import asyncio
+import csv
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import tracemalloc
+from importlib import import_module
+from io import StringIO
+from asgiref.sync import sync_to_async
+from django.apps import apps as django_apps
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.mail.backends import locmem
+from django.core.management import call_command
+from unittest import mock, skipUnless
+from django.conf import settings
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection, connections
 from django.contrib.auth.models import User
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
 from django.utils import timezone
 from decimal import Decimal
-from datetime import timedelta
+from datetime import date, timedelta
+from django.contrib.sessions.models import Session
 from .models import (
     SavingsGroup, GroupMembership, Contribution,
-    Loan, Investment, UserProfile, TransactionHistory
+    Loan, Investment, UserProfile, TransactionHistory,
+    InvestmentRevaluationRun, Notification, GroupDailyRollup,
+    FinancialEducation, UserProgress, OutboundEmail, IdempotencyKey
 )
+from .authentication import (
+    PrincipalCache, issue_api_token, principal_cache, revoke_api_tokens
+)
+from .idempotency import idempotent_response, recent_keys
+from .middleware import QueryStats, fingerprint
+from .routers import (
+    PIN_COOKIE, ReplicaRouter, ReplicaRoutingMiddleware, read_from_replica, view_reads_from_replica
+)
+from .async_views import group_detail
+from .views import SavingsGroupViewSet, statement
+from .events import InProcessBroker
+from .statements import STATEMENT_COLUMNS, csv_blocks, group_statement_rows, statement_response, user_statement_rows
+from .schedules import add_months, loan_book_schedules, loan_schedule, money
+from .valuation import growth_factor, growth_factor_cache_info, clear_growth_factor_cache
+from .serializers import BulkContributionSerializer
 from .services import (
     calculate_loan_eligibility,
     check_investment_limits,
-    calculate_group_analytics
+    calculate_group_analytics,
+    post_contributions_bulk,
+    revalue_investments,
+    check_and_update_loan_status,
+    reconcile_member_totals,
+    send_verification_email,
+    send_password_reset_email,
+    queue_email,
+    claim_outbox_batch,
+    process_email_outbox,
+    create_group_upgrade_notification,
+    fan_out_notification,
+    group_audience,
+    create_notifications,
+    unread_notification_count,
+    mark_notifications_read,
+    purge_idempotency_keys,
+    review_loans,
+    rebuild_group_rollups
 )
 
 class GroupTests(TestCase):
@@ -191,3 +253,1866 @@ class AnalyticsTests(TestCase):
         analytics = calculate_group_analytics(self.group)
         self.assertEqual(analytics['total_investments'], Decimal('2000.00'))
         self.assertTrue('investment_returns' in analytics)
+
+class BulkContributionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='agent',
+            password='testpass123'
+        )
+        self.groups = [
+            SavingsGroup.objects.create(name=f'Group {i}', risk_tolerance='LOW')
+            for i in range(2)
+        ]
+        self.memberships = [
+            GroupMembership.objects.create(
+                user=User.objects.create_user(username=f'member{i}', password='testpass123'),
+                group=self.groups[i % 2]
+            )
+            for i in range(4)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def payload(self, count):
+        return [
+            {
+                'member': self.memberships[i % 4].pk,
+                'amount': '100.00',
+                'transaction_type': 'DEPOSIT' if i % 5 else 'WITHDRAWAL'
+            }
+            for i in range(count)
+        ]
+
+    def test_bulk_posting_updates_balances(self):
+        response = self.client.post('/api/contributions/bulk/', self.payload(20), format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), 20)
+        for group in self.groups:
+            group.refresh_from_db()
+            # 10 rows per group, 2 of them withdrawals
+            self.assertEqual(group.total_balance, Decimal('600.00'))
+        self.assertEqual(Contribution.objects.filter(transaction__isnull=False).count(), 20)
+        self.assertEqual(TransactionHistory.objects.count(), 20)
+        last = TransactionHistory.objects.order_by('-id').first()
+        self.assertEqual(last.balance_after, Decimal('600.00'))
+
+    def test_bulk_posting_query_count_is_constant(self):
+        def validated(payload):
+            serializer = BulkContributionSerializer(data=payload, many=True)
+            serializer.is_valid(raise_exception=True)
+            return serializer.validated_data
+
+        # Warm up so today's rollup rows already exist in both measurements
+        post_contributions_bulk(validated(self.payload(4)))
+        entries = validated(self.payload(10))
+        with CaptureQueriesContext(connection) as small:
+            post_contributions_bulk(entries)
+        entries = validated(self.payload(100))
+        with CaptureQueriesContext(connection) as large:
+            post_contributions_bulk(entries)
+        self.assertEqual(len(small), len(large))
+
+    def test_unknown_member_rejected(self):
+        payload = self.payload(2)
+        payload[1]['member'] = 999999
+        response = self.client.post('/api/contributions/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Contribution.objects.exists())
+
+class ConcurrentBalanceTests(TestCase):
+    def setUp(self):
+        self.group = SavingsGroup.objects.create(name='Busy Group', risk_tolerance='LOW')
+        self.memberships = [
+            GroupMembership.objects.create(
+                user=User.objects.create_user(username=f'agent{i}', password='testpass123'),
+                group=self.group
+            )
+            for i in range(2)
+        ]
+
+    def test_stale_group_instances_do_not_lose_updates(self):
+        # Both agents loaded the group before either posted
+        first, second = [
+            GroupMembership.objects.select_related('group').get(pk=m.pk)
+            for m in self.memberships
+        ]
+        Contribution.objects.create(member=first, amount=Decimal('100.00'), transaction_type='DEPOSIT')
+        Contribution.objects.create(member=second, amount=Decimal('250.00'), transaction_type='DEPOSIT')
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.total_balance, Decimal('350.00'))
+        self.assertEqual(
+            list(TransactionHistory.objects.order_by('id').values_list('balance_after', flat=True)),
+            [Decimal('100.00'), Decimal('350.00')]
+        )
+
+    def test_withdrawal_balance_after(self):
+        member = self.memberships[0]
+        Contribution.objects.create(member=member, amount=Decimal('500.00'), transaction_type='DEPOSIT')
+        contribution = Contribution.objects.create(
+            member=member, amount=Decimal('200.00'), transaction_type='WITHDRAWAL'
+        )
+        self.assertEqual(contribution.transaction.balance_after, Decimal('300.00'))
+
+    def test_loan_disbursement_uses_committed_balance(self):
+        Contribution.objects.create(
+            member=self.memberships[0], amount=Decimal('1000.00'), transaction_type='DEPOSIT'
+        )
+        stale = GroupMembership.objects.select_related('group').get(pk=self.memberships[1].pk)
+        stale.group.total_balance = Decimal('0.00')
+        loan = Loan.objects.create(
+            borrower=stale,
+            amount=Decimal('400.00'),
+            interest_rate=Decimal('10.00'),
+            due_date=timezone.now() + timedelta(days=30),
+            status='APPROVED'
+        )
+        self.assertEqual(loan.transaction.balance_after, Decimal('600.00'))
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.total_balance, Decimal('600.00'))
+
+class InvestmentRevaluationTests(TestCase):
+    def setUp(self):
+        self.group = SavingsGroup.objects.create(
+            name='Test Group',
+            risk_tolerance='HIGH',
+            total_balance=Decimal('1000000.00')
+        )
+        GroupMembership.objects.create(
+            user=User.objects.create_user(username='treasurer', password='testpass123'),
+            group=self.group
+        )
+        for i in range(7):
+            investment = Investment.objects.create(
+                group=self.group,
+                investment_type='BOND',
+                amount=Decimal('1000.00') * (i + 1),
+                current_value=Decimal('1000.00') * (i + 1),
+                provider='Test Provider',
+                annual_return_rate=Decimal('8.50') if i % 2 else Decimal('12.00')
+            )
+            Investment.objects.filter(pk=investment.pk).update(
+                date=timezone.now() - timedelta(days=100 * (i % 3 + 1))
+            )
+
+    def test_matches_per_row_calculation(self):
+        as_of = timezone.now()
+        stats = revalue_investments(chunk_size=3, as_of=as_of)
+        self.assertEqual(stats['rows'], 7)
+        for investment in Investment.objects.all():
+            expected = investment.amount + investment.calculate_returns(as_of)
+            self.assertEqual(investment.current_value, expected.quantize(Decimal('0.01')))
+
+    def test_resumes_from_last_chunk(self):
+        as_of = timezone.now()
+        first_ids = list(Investment.objects.order_by('pk').values_list('pk', flat=True)[:3])
+        InvestmentRevaluationRun.objects.create(
+            as_of=as_of,
+            last_investment_id=first_ids[-1],
+            rows_processed=3
+        )
+        stats = revalue_investments(chunk_size=3)
+        self.assertEqual(stats['rows'], 4)
+        run = InvestmentRevaluationRun.objects.get(pk=stats['run'])
+        self.assertEqual(run.rows_processed, 7)
+        self.assertIsNotNone(run.completed_at)
+        # Rows before the checkpoint were left alone
+        untouched = Investment.objects.get(pk=first_ids[0])
+        self.assertEqual(untouched.current_value, untouched.amount)
+
+    def test_restart_supersedes_interrupted_run(self):
+        first_ids = list(Investment.objects.order_by('pk').values_list('pk', flat=True)[:3])
+        stale = InvestmentRevaluationRun.objects.create(
+            as_of=timezone.now() - timedelta(days=365),
+            last_investment_id=first_ids[-1],
+            rows_processed=3
+        )
+        as_of = timezone.now()
+        restarted = revalue_investments(chunk_size=3, resume=False, as_of=as_of)
+        values = dict(Investment.objects.values_list('pk', 'current_value'))
+
+        # The next nightly run starts afresh instead of resuming the stale run
+        nightly = revalue_investments(chunk_size=3, as_of=as_of)
+        self.assertNotIn(nightly['run'], (stale.pk, restarted['run']))
+        self.assertEqual(nightly['rows'], 7)
+        self.assertEqual(dict(Investment.objects.values_list('pk', 'current_value')), values)
+
+class GrowthFactorCacheTests(TestCase):
+    @staticmethod
+    def uncached_returns(amount, annual_return_rate, days):
+        rate = annual_return_rate / Decimal('100.00')
+        return amount * (Decimal('1.00') + rate) ** (Decimal(days) / Decimal('365')) - amount
+
+    def test_identical_to_uncached_arithmetic(self):
+        clear_growth_factor_cache()
+        now = timezone.now()
+        for rate in ('0.00', '3.00', '8.50', '12.00', '5', '5.0'):
+            for days in (-10, 0, 1, 100, 365, 730, 1000):
+                investment = Investment(
+                    amount=Decimal('1234.56'),
+                    annual_return_rate=Decimal(rate),
+                    date=now - timedelta(days=days)
+                )
+                # Twice, so the second call is served from the cache
+                for _ in range(2):
+                    returns = investment.calculate_returns(now)
+                    expected = self.uncached_returns(investment.amount, Decimal(rate), days)
+                    # Same digits and exponent, not just an equal value
+                    self.assertEqual(str(returns), str(expected), (rate, days))
+
+    def test_repeated_pairs_hit_the_cache(self):
+        clear_growth_factor_cache()
+        for _ in range(3):
+            growth_factor(Decimal('8.50'), 200)
+        growth_factor(Decimal('8.5'), 200)
+        info = growth_factor_cache_info()
+        self.assertEqual((info.hits, info.misses), (2, 2))
+
+
+class OverdueLoanSweepTests(TestCase):
+    def setUp(self):
+        self.group = SavingsGroup.objects.create(name='Test Group', risk_tolerance='LOW')
+        self.memberships = [
+            GroupMembership.objects.create(
+                user=User.objects.create_user(username=f'borrower{i}', password='testpass123'),
+                group=self.group
+            )
+            for i in range(3)
+        ]
+
+    def make_loans(self, count, status='APPROVED', days=-1):
+        loans = [
+            Loan.objects.create(
+                borrower=self.memberships[i % 3],
+                amount=Decimal('100.00'),
+                interest_rate=Decimal('10.00'),
+                due_date=timezone.now() + timedelta(days=days)
+            )
+            for i in range(count)
+        ]
+        Loan.objects.filter(pk__in=[loan.pk for loan in loans]).update(status=status)
+        return loans
+
+    def test_defaults_overdue_loans_and_notifies(self):
+        self.make_loans(5)
+        current = self.make_loans(2, days=10)
+        pending = self.make_loans(1, status='PENDING')
+        defaulted = check_and_update_loan_status(batch_size=2)
+        self.assertEqual(defaulted, 5)
+        self.assertEqual(Loan.objects.filter(status='DEFAULTED').count(), 5)
+        self.assertEqual(Loan.objects.get(pk=current[0].pk).status, 'APPROVED')
+        self.assertEqual(Loan.objects.get(pk=pending[0].pk).status, 'PENDING')
+        self.assertEqual(Notification.objects.filter(notification_type='PAYMENT_DUE').count(), 5)
+        self.assertEqual(
+            Notification.objects.filter(user=self.memberships[0].user).count(), 2
+        )
+
+    def test_query_count_does_not_grow_with_loans(self):
+        # Warm up so today's rollup row already exists in both measurements
+        self.make_loans(1)
+        check_and_update_loan_status()
+        self.make_loans(3)
+        with CaptureQueriesContext(connection) as few:
+            check_and_update_loan_status()
+        self.make_loans(30)
+        with CaptureQueriesContext(connection) as many:
+            check_and_update_loan_status()
+        self.assertEqual(len(few), len(many))
+
+    def test_management_command(self):
+        self.make_loans(3)
+        out = StringIO()
+        call_command('sweep_overdue_loans', '--batch-size', '2', stdout=out)
+        self.assertIn('Defaulted 3', out.getvalue())
+
+class QueryPlanTests(TestCase):
+    """EXPLAIN every query the services and viewsets issue against a seeded dataset"""
+
+    # Tables each endpoint intentionally lists in full; anything else must use an index
+    FULL_SCAN_ALLOWED = {
+        '/api/savings-groups/': {'fintech_savingsgroup'},
+        '/api/loans/': {'fintech_loan'},
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        users = User.objects.bulk_create([User(username=f'seed{i}') for i in range(400)])
+        groups = SavingsGroup.objects.bulk_create([
+            SavingsGroup(name=f'Seed group {i}', total_balance=Decimal('100000.00'))
+            for i in range(40)
+        ])
+        memberships = GroupMembership.objects.bulk_create([
+            GroupMembership(user=user, group=groups[i % 40])
+            for i, user in enumerate(users)
+        ])
+        Contribution.objects.bulk_create([
+            Contribution(
+                member=memberships[i % 400],
+                amount=Decimal('50.00'),
+                transaction_type='DEPOSIT' if i % 4 else 'WITHDRAWAL'
+            )
+            for i in range(20000)
+        ])
+        Loan.objects.bulk_create([
+            Loan(
+                borrower=memberships[i % 400],
+                amount=Decimal('500.00'),
+                interest_rate=Decimal('10.00'),
+                due_date=now + timedelta(days=(i % 60) - 30),
+                status=['PENDING', 'APPROVED', 'PAID', 'DEFAULTED', 'REJECTED'][i % 5]
+            )
+            for i in range(5000)
+        ])
+        Investment.objects.bulk_create([
+            Investment(
+                group=groups[i % 40],
+                investment_type='BOND',
+                amount=Decimal('1000.00'),
+                current_value=Decimal('1100.00'),
+                provider='Seed Provider',
+                annual_return_rate=Decimal('9.00')
+            )
+            for i in range(2000)
+        ])
+        Notification.objects.bulk_create([
+            Notification(
+                user=users[i % 400],
+                title='Seed',
+                message='Seed notification',
+                read=bool(i % 3),
+                notification_type='ALERT'
+            )
+            for i in range(20000)
+        ])
+        TransactionHistory.objects.bulk_create([
+            TransactionHistory(
+                user=users[i % 400],
+                transaction_type='CONTRIBUTION',
+                amount=Decimal('50.00'),
+                balance_after=Decimal('50.00'),
+                description='Seed'
+            )
+            for i in range(20000)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        cls.group = groups[0]
+        cls.membership = memberships[0]
+        cls.user = users[0]
+
+    def full_table_scans(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('EXPLAIN ' + sql)
+                plan = [row[0] for row in cursor.fetchall()]
+                return [
+                    table for line in plan
+                    for table in re.findall(r'Seq Scan on (fintech_\w+)', line)
+                ]
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            plan = [row[-1] for row in cursor.fetchall()]
+        return [
+            match.group(1) for line in plan
+            if (match := re.match(r'SCAN (fintech_\w+)', line))
+        ]
+
+    def assertNoFullScans(self, queries, allowed=()):
+        for query in queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            scans = set(self.full_table_scans(sql)) - set(allowed)
+            self.assertFalse(scans, f'Full table scan of {sorted(scans)} in: {sql}')
+
+    def test_service_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            calculate_loan_eligibility(self.membership)
+            check_investment_limits(self.group)
+            calculate_group_analytics(self.group)
+            check_and_update_loan_status()
+        self.assertNoFullScans(queries)
+
+    def test_statement_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            list(group_statement_rows(self.group))
+            list(user_statement_rows(self.user))
+        self.assertEqual(len(queries), 6)
+        self.assertNoFullScans(queries)
+
+    def test_viewset_queries(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        urls = [
+            '/api/contributions/',
+            '/api/investments/',
+            '/api/notifications/',
+            '/api/progress/',
+            f'/api/savings-groups/{self.group.pk}/',
+            f'/api/savings-groups/{self.group.pk}/members/',
+            '/api/savings-groups/',
+            '/api/loans/',
+        ]
+        for url in urls:
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertNoFullScans(queries, allowed=self.FULL_SCAN_ALLOWED.get(url, ()))
+
+class GroupRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='treasurer', password='testpass123')
+        self.group = SavingsGroup.objects.create(name='Test Group', risk_tolerance='MEDIUM')
+        self.membership = GroupMembership.objects.create(user=self.user, group=self.group)
+        Contribution.objects.create(member=self.membership, amount=Decimal('5000.00'), transaction_type='DEPOSIT')
+        Contribution.objects.create(member=self.membership, amount=Decimal('300.00'), transaction_type='WITHDRAWAL')
+        self.investment = Investment.objects.create(
+            group=self.group,
+            investment_type='UNIT_TRUST',
+            amount=Decimal('1000.00'),
+            current_value=Decimal('1000.00'),
+            provider='Test Provider',
+            annual_return_rate=Decimal('10.00')
+        )
+        self.loan = Loan.objects.create(
+            borrower=self.membership,
+            amount=Decimal('200.00'),
+            interest_rate=Decimal('10.00'),
+            due_date=timezone.now() + timedelta(days=30)
+        )
+
+    def test_write_paths_update_rollup(self):
+        rollup = GroupDailyRollup.objects.get(group=self.group)
+        self.assertEqual(rollup.deposit_total, Decimal('5000.00'))
+        self.assertEqual(rollup.withdrawal_total, Decimal('300.00'))
+        self.assertEqual(rollup.investment_principal, Decimal('1000.00'))
+        self.assertEqual(rollup.loans_opened, 0)
+
+        loan = Loan.objects.get(pk=self.loan.pk)
+        loan.status = 'APPROVED'
+        loan.save()
+        self.assertEqual(calculate_group_analytics(self.group)['active_loans'], 1)
+        loan.status = 'PAID'
+        loan.save()
+        self.assertEqual(calculate_group_analytics(self.group)['active_loans'], 0)
+
+    def test_revaluation_updates_investment_value(self):
+        Investment.objects.filter(pk=self.investment.pk).update(
+            date=timezone.now() - timedelta(days=365)
+        )
+        revalue_investments()
+        analytics = calculate_group_analytics(self.group)
+        self.assertEqual(analytics['total_investments'], Decimal('1000.00'))
+        self.assertEqual(analytics['investment_returns'], Decimal('10'))
+
+    def test_analytics_reads_constant_number_of_rows(self):
+        with self.assertNumQueries(1):
+            calculate_group_analytics(self.group)
+
+    def test_backfill_matches_incremental_rollup(self):
+        incremental = calculate_group_analytics(self.group)
+        GroupDailyRollup.objects.all().delete()
+        call_command('backfill_group_rollups', '--chunk-size', '1', stdout=StringIO())
+        self.assertEqual(calculate_group_analytics(self.group), incremental)
+
+    def test_deletes_release_rollup_and_member_totals(self):
+        Loan.objects.filter(pk=self.loan.pk).update(status='APPROVED')
+        GroupDailyRollup.record(self.group.pk, loans_opened=1)
+        Contribution.objects.filter(transaction_type='WITHDRAWAL').delete()
+        Investment.objects.get(pk=self.investment.pk).delete()
+        Loan.objects.get(pk=self.loan.pk).delete()
+
+        analytics = calculate_group_analytics(self.group)
+        self.assertEqual(analytics['monthly_contributions'], Decimal('5000.00'))
+        self.assertEqual(analytics['total_investments'], 0)
+        self.assertEqual(analytics['active_loans'], 0)
+        self.membership.refresh_from_db()
+        self.assertEqual(self.membership.total_withdrawals, 0)
+        self.assertEqual(reconcile_member_totals([self.membership.pk]), [])
+        incremental = calculate_group_analytics(self.group)
+        rebuild_group_rollups([self.group.pk])
+        self.assertEqual(calculate_group_analytics(self.group), incremental)
+
+    def test_deleting_member_costs_no_queries_per_ledger_row(self):
+        Loan.objects.filter(pk=self.loan.pk).update(status='APPROVED')
+        Contribution.objects.bulk_create([
+            Contribution(member=self.membership, amount=Decimal('10.00'), transaction_type='DEPOSIT')
+            for _ in range(50)
+        ])
+        rollup = GroupDailyRollup.objects.values().get(group=self.group)
+        membership = GroupMembership.objects.get(pk=self.membership.pk)
+        # Collect contributions and loans, then one DELETE per table
+        with self.assertNumQueries(5):
+            membership.delete()
+        self.assertFalse(Contribution.objects.exists())
+        self.assertEqual(GroupDailyRollup.objects.values().get(group=self.group), rollup)
+
+    def test_deleting_group_leaves_no_rollups(self):
+        self.group.delete()
+        self.assertFalse(GroupDailyRollup.objects.exists())
+        connection.check_constraints()
+
+    def test_migration_backfills_existing_groups(self):
+        migration = import_module('fintech.migrations.0012_backfill_group_rollups')
+        incremental = calculate_group_analytics(self.group)
+        GroupDailyRollup.objects.all().delete()
+        migration.backfill_rollups(django_apps, None)
+        self.assertEqual(calculate_group_analytics(self.group), incremental)
+
+    def test_rebuild_reads_ledger_under_group_lock(self):
+        with CaptureQueriesContext(connection) as captured:
+            rebuild_group_rollups([self.group.pk])
+        sql = [query['sql'] for query in captured]
+        begin = next(i for i, query in enumerate(sql) if query.startswith('SAVEPOINT'))
+        lock = next(i for i, query in enumerate(sql) if 'FROM "fintech_savingsgroup"' in query)
+        reads = [i for i, query in enumerate(sql) if 'SUM(' in query]
+        self.assertLess(begin, lock)
+        self.assertTrue(reads and min(reads) > lock)
+
+    def test_analytics_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(f'/api/savings-groups/{self.group.pk}/analytics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['monthly_contributions'], Decimal('5000.00'))
+        self.assertEqual(len(response.data['daily']), 1)
+
+class MemberTotalsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='member', password='testpass123')
+        self.group = SavingsGroup.objects.create(name='Test Group', risk_tolerance='LOW')
+        self.membership = GroupMembership.objects.create(user=self.user, group=self.group)
+
+    def test_posting_paths_maintain_totals(self):
+        Contribution.objects.create(member=self.membership, amount=Decimal('1000.00'), transaction_type='DEPOSIT')
+        Contribution.objects.create(member=self.membership, amount=Decimal('150.00'), transaction_type='WITHDRAWAL')
+        serializer = BulkContributionSerializer(data=[
+            {'member': self.membership.pk, 'amount': '250.00', 'transaction_type': 'DEPOSIT'},
+            {'member': self.membership.pk, 'amount': '50.00', 'transaction_type': 'WITHDRAWAL'},
+        ], many=True)
+        serializer.is_valid(raise_exception=True)
+        post_contributions_bulk(serializer.validated_data)
+
+        self.membership.refresh_from_db()
+        self.assertEqual(self.membership.total_deposits, Decimal('1250.00'))
+        self.assertEqual(self.membership.total_withdrawals, Decimal('200.00'))
+        self.assertEqual(reconcile_member_totals([self.membership.pk]), [])
+
+    def test_eligibility_is_a_single_read(self):
+        Contribution.objects.create(member=self.membership, amount=Decimal('400.00'), transaction_type='DEPOSIT')
+        with self.assertNumQueries(1):
+            self.assertEqual(calculate_loan_eligibility(self.membership), Decimal('1200.00'))
+
+    def test_reconcile_command_fixes_drift(self):
+        Contribution.objects.create(member=self.membership, amount=Decimal('400.00'), transaction_type='DEPOSIT')
+        GroupMembership.objects.filter(pk=self.membership.pk).update(total_deposits=Decimal('1.00'))
+        out = StringIO()
+        call_command('reconcile_member_totals', stdout=out)
+        self.assertIn('stored 1.00, actual 400.00', out.getvalue())
+        call_command('reconcile_member_totals', '--fix', stdout=StringIO())
+        self.membership.refresh_from_db()
+        self.assertEqual(self.membership.total_deposits, Decimal('400.00'))
+
+    def test_group_eligibility_endpoint(self):
+        Contribution.objects.create(member=self.membership, amount=Decimal('400.00'), transaction_type='DEPOSIT')
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(f'/api/savings-groups/{self.group.pk}/eligibility/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['eligibility'], Decimal('1200.00'))
+
+class QueryBudgetTests(TestCase):
+    """Every instrumented endpoint must stay within its declared query budget"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='budget', password='testpass123')
+        self.groups = [SavingsGroup.objects.create(name=f'Group {i}') for i in range(5)]
+        for group in self.groups:
+            membership = GroupMembership.objects.create(user=self.user, group=group)
+            for j in range(4):
+                GroupMembership.objects.create(
+                    user=User.objects.create_user(username=f'member{group.pk}-{j}'),
+                    group=group
+                )
+            Contribution.objects.create(member=membership, amount=Decimal('100.00'), transaction_type='DEPOSIT')
+            Investment.objects.create(
+                group=group,
+                investment_type='BOND',
+                amount=Decimal('10.00'),
+                current_value=Decimal('10.00'),
+                provider='Test Provider'
+            )
+            Loan.objects.create(
+                borrower=membership,
+                amount=Decimal('20.00'),
+                interest_rate=Decimal('10.00'),
+                due_date=timezone.now() + timedelta(days=30)
+            )
+        for i in range(5):
+            module = FinancialEducation.objects.create(
+                title=f'Module {i}', content='Content', difficulty_level='BASIC'
+            )
+            UserProgress.objects.create(user=self.user, module=module)
+            Notification.objects.create(
+                user=self.user, title='Hello', message='Message', notification_type='ALERT'
+            )
+        self.client = APIClient()
+        self.client.force_login(self.user)
+
+    def test_endpoints_stay_within_budget(self):
+        group = self.groups[0]
+        urls = [
+            '/api/savings-groups/',
+            f'/api/savings-groups/{group.pk}/',
+            f'/api/savings-groups/{group.pk}/members/',
+            f'/api/savings-groups/{group.pk}/analytics/',
+            f'/api/savings-groups/{group.pk}/eligibility/',
+            '/api/contributions/',
+            '/api/loans/',
+            '/api/investments/',
+            '/api/notifications/',
+            '/api/progress/',
+            '/api/education/',
+        ]
+        for url in urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            request = response.wsgi_request
+            self.assertIsNotNone(request.query_budget, f'{url} declares no query budget')
+            self.assertLessEqual(
+                request.query_stats.count, request.query_budget,
+                f'{url} ({request.query_action}) ran {request.query_stats.count} queries'
+            )
+            self.assertEqual(request.query_stats.suspected_n_plus_one, [], url)
+
+    @override_settings(DEBUG=True)
+    def test_debug_headers(self):
+        response = self.client.get('/api/notifications/')
+        self.assertEqual(response['X-DB-Query-Count'], str(response.wsgi_request.query_stats.count))
+        self.assertIn('X-DB-Time-Ms', response)
+        self.assertEqual(response['X-DB-Query-Budget'], '3')
+
+    def test_fingerprint_collapses_literals(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id = 5 AND name = \'x\''),
+            fingerprint('SELECT * FROM t WHERE id = 12 AND name = \'y\'')
+        )
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s)'),
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s, %s)')
+        )
+
+    def test_n_plus_one_threshold_follows_settings(self):
+        stats = QueryStats()
+        stats.fingerprints['SELECT * FROM t WHERE id = ?'] = 2
+        self.assertEqual(stats.suspected_n_plus_one, [])
+        with self.settings(QUERY_N_PLUS_ONE_THRESHOLD=2):
+            self.assertEqual(stats.suspected_n_plus_one, ['SELECT * FROM t WHERE id = ?'])
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='testpass123')
+        Notification.objects.bulk_create([
+            Notification(user=self.user, title=f'Note {i}', message='Message', notification_type='ALERT')
+            for i in range(25)
+        ])
+        # Identical timestamps must still page without gaps or repeats
+        Notification.objects.filter(pk__in=Notification.objects.values('pk')[:10]).update(
+            created_at=timezone.now()
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_walks_all_rows_without_count(self):
+        seen = []
+        url = '/api/notifications/?page_size=7'
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            self.assertFalse(any('COUNT(' in q['sql'] for q in queries))
+            seen.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+
+    def test_page_size_is_capped(self):
+        Notification.objects.bulk_create([
+            Notification(user=self.user, title='Bulk', message='Message', notification_type='ALERT')
+            for i in range(150)
+        ])
+        response = self.client.get('/api/notifications/?page_size=1000')
+        self.assertEqual(len(response.data['results']), 100)
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionError('SMTP server unavailable')
+
+class DroppingEmailBackend(locmem.EmailBackend):
+    """Delivers one message, then drops the connection and refuses to reconnect"""
+    opened = 0
+
+    def open(self):
+        DroppingEmailBackend.opened += 1
+        if DroppingEmailBackend.opened > 1:
+            raise ConnectionError('Connection refused')
+
+    def send_messages(self, email_messages):
+        if len(mail.outbox) >= 1:
+            raise ConnectionError('Connection dropped')
+        return super().send_messages(email_messages)
+
+class EmailOutboxTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='newuser',
+            password='testpass123',
+            email='new@example.com'
+        )
+
+    def test_emails_are_queued_not_sent(self):
+        send_verification_email(self.user, 'token')
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboundEmail.objects.filter(status='PENDING').count(), 1)
+
+    def test_worker_drains_outbox(self):
+        for i in range(3):
+            send_password_reset_email(self.user, f'token{i}')
+        out = StringIO()
+        call_command('process_email_outbox', '--once', '--batch-size', '2', stdout=out)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].to, ['new@example.com'])
+        self.assertEqual(OutboundEmail.objects.filter(status='SENT').count(), 3)
+        self.assertIn('Sent 3 emails', out.getvalue())
+
+    def test_workers_never_claim_the_same_email(self):
+        send_verification_email(self.user, 'token')
+        first_token, first = claim_outbox_batch(10)
+        second_token, second = claim_outbox_batch(10)
+        self.assertEqual(len(first), 1)
+        self.assertEqual(second, [])
+        # Once the lease expires the email can be claimed again
+        OutboundEmail.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        third_token, third = claim_outbox_batch(10)
+        self.assertEqual(len(third), 1)
+
+    @override_settings(EMAIL_BACKEND='fintech.tests.FailingEmailBackend', OUTBOX_MAX_ATTEMPTS=2)
+    def test_failures_back_off_then_give_up(self):
+        send_verification_email(self.user, 'token')
+        self.assertEqual(process_email_outbox(), (0, 1))
+        email = OutboundEmail.objects.get()
+        self.assertEqual(email.status, 'PENDING')
+        self.assertEqual(email.attempts, 1)
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        self.assertIn('SMTP server unavailable', email.last_error)
+
+        # Not due yet, so nothing is claimed
+        self.assertEqual(process_email_outbox(), (0, 0))
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(process_email_outbox(), (0, 1))
+        self.assertEqual(OutboundEmail.objects.get().status, 'FAILED')
+
+    @override_settings(EMAIL_BACKEND='fintech.tests.DroppingEmailBackend')
+    def test_failed_reconnect_keeps_delivered_and_releases_the_rest(self):
+        DroppingEmailBackend.opened = 0
+        for recipient in ['a@x.com', 'b@x.com', 'c@x.com']:
+            queue_email('Hello', 'Body', [recipient])
+        with self.assertLogs('fintech.outbox', 'WARNING'):
+            self.assertEqual(process_email_outbox(), (1, 1))
+        self.assertEqual(mail.outbox[0].to, ['a@x.com'])
+        delivered, dropped, untried = OutboundEmail.objects.order_by('pk')
+        self.assertEqual((delivered.status, delivered.attempts), ('SENT', 1))
+        self.assertEqual((dropped.status, dropped.attempts), ('PENDING', 1))
+        self.assertEqual((untried.status, untried.attempts), ('PENDING', 0))
+        self.assertFalse(OutboundEmail.objects.exclude(locked_by='').exists())
+        # The untried email can be claimed again at once; the delivered one can't
+        token, claimed = claim_outbox_batch(10)
+        self.assertEqual(claimed, [untried])
+
+class NotificationFanOutTests(TestCase):
+    def make_group(self, name, size):
+        group = SavingsGroup.objects.create(name=name, tier_level=2)
+        users = User.objects.bulk_create([User(username=f'{name}-{i}') for i in range(size)])
+        GroupMembership.objects.bulk_create([GroupMembership(user=user, group=group) for user in users])
+        return group
+
+    def test_query_count_is_constant_in_audience_size(self):
+        small = self.make_group('small', 5)
+        # Stay under SQLite's bound-parameter limit so one chunk is one INSERT
+        large = self.make_group('large', 150)
+        with CaptureQueriesContext(connection) as small_queries:
+            self.assertEqual(create_group_upgrade_notification(small), 5)
+        with CaptureQueriesContext(connection) as large_queries:
+            self.assertEqual(create_group_upgrade_notification(large), 150)
+        self.assertEqual(len(small_queries), len(large_queries))
+        self.assertEqual(
+            Notification.objects.filter(notification_type='MILESTONE', user__groupmembership__group=large).count(),
+            150
+        )
+
+    def test_chunks_large_audiences(self):
+        group = self.make_group('chunked', 25)
+        created = fan_out_notification(group_audience(group), 'Hi', 'Message', 'ALERT', chunk_size=10)
+        self.assertEqual(created, 25)
+
+    def test_overdue_audience_command(self):
+        group = self.make_group('borrowers', 3)
+        membership = GroupMembership.objects.filter(group=group).first()
+        loan = Loan.objects.create(
+            borrower=membership,
+            amount=Decimal('100.00'),
+            interest_rate=Decimal('10.00'),
+            due_date=timezone.now() - timedelta(days=1)
+        )
+        Loan.objects.filter(pk=loan.pk).update(status='DEFAULTED')
+        out = StringIO()
+        call_command(
+            'fan_out_notification', 'overdue',
+            '--title', 'Reminder', '--message', 'Please repay', '--type', 'PAYMENT_DUE',
+            stdout=out
+        )
+        self.assertIn('Created 1 notifications', out.getvalue())
+        self.assertTrue(Notification.objects.filter(user=membership.user, title='Reminder').exists())
+
+class UnreadNotificationCounterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def notify(self, count):
+        return create_notifications([
+            Notification(user=self.user, title=f'Note {i}', message='Message', notification_type='ALERT')
+            for i in range(count)
+        ])
+
+    def unread(self):
+        response = self.client.get('/api/notifications/unread_count/')
+        self.assertEqual(response.status_code, 200)
+        return response.data['unread']
+
+    def test_counter_follows_every_write_path(self):
+        self.notify(3)
+        note = Notification.objects.create(
+            user=self.user, title='Single', message='Message', notification_type='ALERT'
+        )
+        self.assertEqual(self.unread(), 4)
+
+        response = self.client.patch(f'/api/notifications/{note.pk}/', {'read': True}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.unread(), 3)
+
+        Notification.objects.filter(read=False).first().delete()
+        self.assertEqual(self.unread(), 2)
+
+    def test_poll_is_constant_time(self):
+        self.notify(50)
+        with self.assertNumQueries(1):
+            self.assertEqual(unread_notification_count(self.user), 50)
+
+    def test_bulk_mark_read(self):
+        notes = self.notify(5)
+        response = self.client.post(
+            '/api/notifications/mark_read/',
+            {'ids': [notes[0].pk, notes[1].pk]},
+            format='json'
+        )
+        self.assertEqual(response.data, {'marked': 2, 'unread': 3})
+        with self.assertNumQueries(4):
+            # savepoint, UPDATE notifications, UPDATE counter, release
+            self.assertEqual(mark_notifications_read(self.user), 3)
+        self.assertEqual(self.unread(), 0)
+        self.assertFalse(Notification.objects.filter(user=self.user, read=False).exists())
+
+    def test_mark_read_validates_ids(self):
+        response = self.client.post('/api/notifications/mark_read/', {'ids': 'all'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_mark_all_read_endpoint(self):
+        self.notify(4)
+        response = self.client.post('/api/notifications/mark_all_read/')
+        self.assertEqual(response.data, {'marked': 4, 'unread': 0})
+
+class NotificationStreamTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='listener', password='testpass123')
+
+    async def test_broker_delivers_from_other_threads(self):
+        broker = InProcessBroker()
+        subscription = broker.subscribe('user:1')
+        thread = threading.Thread(target=broker.publish, args=('user:1', {'id': 7}))
+        thread.start()
+        thread.join()
+        self.assertEqual(await asyncio.wait_for(subscription.get(), 1), {'id': 7})
+        subscription.close()
+        self.assertEqual(broker.subscriber_count('user:1'), 0)
+
+    async def test_slow_subscriber_keeps_newest_messages(self):
+        broker = InProcessBroker(max_pending=2)
+        subscription = broker.subscribe('user:1')
+        for i in range(3):
+            broker.publish('user:1', {'id': i})
+        await asyncio.sleep(0)
+        self.assertEqual([await subscription.get(), await subscription.get()], [{'id': 1}, {'id': 2}])
+
+    async def test_stream_pushes_new_notifications(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get('/api/notifications/stream/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+
+        # Subscribing happens when the stream starts; publish once it is waiting
+        pending = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0.05)
+
+        def notify():
+            with self.captureOnCommitCallbacks(execute=True):
+                create_notifications([Notification(
+                    user=self.user, title='Loan approved', message='Approved', notification_type='ALERT'
+                )])
+        await sync_to_async(notify)()
+
+        event = (await asyncio.wait_for(pending, 1)).decode()
+        self.assertIn('event: notification', event)
+        self.assertIn('"title": "Loan approved"', event)
+        await response.streaming_content.aclose()
+
+    async def test_stream_requires_login(self):
+        response = await self.async_client.get('/api/notifications/stream/')
+        self.assertEqual(response.status_code, 403)
+
+class AsyncReadViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='async', password='testpass123')
+        self.group = SavingsGroup.objects.create(name='Async Group')
+        self.membership = GroupMembership.objects.create(user=self.user, group=self.group)
+        for i in range(3):
+            Contribution.objects.create(member=self.membership, amount=Decimal('100.00'), transaction_type='DEPOSIT')
+        create_notifications([
+            Notification(user=self.user, title=f'Note {i}', message='Message', notification_type='ALERT')
+            for i in range(12)
+        ])
+        self.client.force_login(self.user)
+
+    async def test_matches_sync_group_endpoints(self):
+        await self.async_client.aforce_login(self.user)
+        for suffix in ('', 'members/', 'analytics/'):
+            sync_response = await sync_to_async(self.client.get)(f'/api/savings-groups/{self.group.pk}/{suffix}')
+            async_response = await self.async_client.get(f'/api/async/savings-groups/{self.group.pk}/{suffix}')
+            self.assertEqual(async_response.status_code, 200, suffix)
+            self.assertEqual(async_response.json(), sync_response.json(), suffix)
+
+    async def test_notifications_keyset_pages(self):
+        await self.async_client.aforce_login(self.user)
+        seen = []
+        url = '/api/async/notifications/?page_size=5'
+        while True:
+            data = (await self.async_client.get(url)).json()
+            seen.extend(item['id'] for item in data['results'])
+            if not data['next']:
+                break
+            url = f"/api/async/notifications/?page_size=5&before={data['next']}"
+        self.assertEqual(len(seen), 12)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+
+    async def test_contributions_and_errors(self):
+        await self.async_client.aforce_login(self.user)
+        data = (await self.async_client.get('/api/async/contributions/')).json()
+        self.assertEqual(len(data['results']), 3)
+        response = await self.async_client.get('/api/async/contributions/?before=garbage')
+        self.assertEqual(response.status_code, 400)
+        response = await self.async_client.get('/api/async/savings-groups/999999/')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_requires_login(self):
+        response = await self.async_client.get('/api/async/notifications/')
+        self.assertEqual(response.status_code, 403)
+
+    async def test_query_budget_under_async(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get('/api/async/notifications/')
+        request = response.wsgi_request if hasattr(response, 'wsgi_request') else response.asgi_request
+        self.assertGreater(request.query_stats.count, 0)
+        self.assertLessEqual(request.query_stats.count, request.query_budget)
+
+
+class StatementExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='saver', password='testpass123')
+        self.other = User.objects.create_user(username='other', password='testpass123')
+        self.group = SavingsGroup.objects.create(name='Statement Group')
+        self.membership = GroupMembership.objects.create(user=self.user, group=self.group)
+        self.other_membership = GroupMembership.objects.create(user=self.other, group=self.group, role='ADMIN')
+        for amount in ('100.00', '250.00'):
+            Contribution.objects.create(member=self.membership, amount=Decimal(amount), transaction_type='DEPOSIT')
+        Contribution.objects.create(member=self.other_membership, amount=Decimal('75.00'), transaction_type='DEPOSIT')
+        Loan.objects.create(
+            borrower=self.membership, amount=Decimal('50.00'), interest_rate=Decimal('5.00'),
+            due_date=timezone.now() + timedelta(days=30)
+        )
+        self.client = APIClient()
+        self.client.force_login(self.user)
+
+    def download(self, url, client=None):
+        response = (client or self.client).get(url)
+        self.assertEqual(response.status_code, 200, getattr(response, 'data', None))
+        return b''.join(response.streaming_content).decode()
+
+    def test_user_csv_statement(self):
+        rows = list(csv.DictReader(StringIO(self.download('/api/statement/'))))
+        self.assertEqual(
+            sorted(row['record'] for row in rows),
+            ['contribution', 'contribution', 'loan', 'transaction', 'transaction']
+        )
+        self.assertTrue(all(row['member'] == 'saver' for row in rows))
+        timestamps = [row['timestamp'] for row in rows]
+        self.assertEqual(timestamps, sorted(timestamps))
+        contribution = next(row for row in rows if row['record'] == 'contribution' and row['amount'] == '250.00')
+        self.assertEqual(contribution['balance_after'], '350.00')
+
+    def test_jsonl_and_date_range(self):
+        lines = self.download('/api/statement/?output=jsonl').splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(list(json.loads(lines[0])), list(STATEMENT_COLUMNS))
+        tomorrow = (timezone.now() + timedelta(days=1)).date().isoformat()
+        self.assertEqual(self.download(f'/api/statement/?output=jsonl&start={tomorrow}'), '')
+        today = timezone.now().date().isoformat()
+        self.assertEqual(len(self.download(f'/api/statement/?output=jsonl&start={today}&end={today}').splitlines()), 5)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get('/api/statement/?output=xml').status_code, 400)
+        self.assertEqual(self.client.get('/api/statement/?start=yesterday').status_code, 400)
+        self.assertEqual(self.client.get('/api/statement/?start=2026-02-01&end=2026-01-01').status_code, 400)
+
+    def test_group_statement_requires_group_admin(self):
+        url = f'/api/savings-groups/{self.group.pk}/statement/'
+        self.assertEqual(self.client.get(url).status_code, 403)
+        admin = APIClient()
+        admin.force_login(self.other)
+        rows = list(csv.DictReader(StringIO(self.download(url, admin))))
+        self.assertEqual(len(rows), 7)
+        self.assertEqual({row['member'] for row in rows}, {'saver', 'other'})
+
+    def synthetic_rows(self, count):
+        now = timezone.now()
+        for i in range(count):
+            yield (
+                'transaction', i, now + timedelta(seconds=i), 'saver', 'CONTRIBUTION',
+                Decimal('10.00'), Decimal(i) * 10, 'COMPLETED', None, 'Deposit'
+            )
+
+    def seed_history(self, count):
+        transactions = TransactionHistory.objects.bulk_create([
+            TransactionHistory(
+                user=self.user, transaction_type='CONTRIBUTION', amount=Decimal('10.00'),
+                balance_after=Decimal('10.00'), description='Deposit'
+            )
+            for _ in range(count)
+        ])
+        Contribution.objects.bulk_create([
+            Contribution(
+                member=self.membership, amount=Decimal('10.00'), transaction_type='DEPOSIT', transaction=transaction
+            )
+            for transaction in transactions
+        ])
+
+    def export_peak(self, rows):
+        tracemalloc.start()
+        try:
+            lines = sum(block.count('\n') for block in csv_blocks(rows))
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return lines, peak
+
+    def test_database_export_memory_is_bounded(self):
+        self.seed_history(10000)
+        for rows, expected in (
+            (user_statement_rows(self.user, chunk_size=500), 20005),
+            (group_statement_rows(self.group, chunk_size=500), 20007),
+        ):
+            lines, peak = self.export_peak(rows)
+            self.assertEqual(lines, expected + 1)
+            # Holding the 20000 rows in memory takes over 10 MB
+            self.assertLess(peak, 4 * 1024 * 1024)
+
+    def test_jsonl_encoding_allocations_are_bounded(self):
+        response = statement_response(self.synthetic_rows(50000), 'jsonl', 'bench')
+        tracemalloc.start()
+        try:
+            written = sum(len(block) for block in response.streaming_content)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertGreater(written, 8 * 1024 * 1024)
+        self.assertLess(peak, 2 * 1024 * 1024)
+
+
+class LoanScheduleTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='borrower', password='testpass123')
+        self.group = SavingsGroup.objects.create(name='Schedule Group', total_balance=Decimal('100000.00'))
+        self.membership = GroupMembership.objects.create(user=self.user, group=self.group)
+        self.start = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0)
+
+    def loan(self, amount='10000.00', rate='12.00', days=365, **kwargs):
+        return Loan(
+            borrower=self.membership,
+            amount=Decimal(amount),
+            interest_rate=Decimal(rate),
+            start_date=self.start,
+            due_date=self.start + timedelta(days=days),
+            **kwargs
+        )
+
+    def assert_consistent(self, loan, schedule):
+        rows = schedule.instalments
+        self.assertEqual(sum(row.principal for row in rows), schedule.total_principal)
+        self.assertEqual(sum(row.interest for row in rows), schedule.total_interest)
+        self.assertEqual(sum(row.payment for row in rows), schedule.total_payment)
+        self.assertEqual(money(schedule.total_principal), loan.amount)
+        self.assertEqual(rows[-1].balance, 0)
+        self.assertEqual(rows[-1].due_date, timezone.localdate(loan.due_date))
+
+    def test_flat_schedule_spreads_simple_interest(self):
+        loan = self.loan()
+        schedule = loan_schedule(loan, 'flat')
+        self.assertEqual(len(schedule.instalments), 12)
+        self.assertEqual(money(schedule.total_interest), loan.calculate_interest().quantize(Decimal('0.01')))
+        self.assertEqual(money(schedule.instalments[0].payment), Decimal('933.33'))
+        # The last instalment absorbs the rounding remainder
+        self.assertEqual(money(schedule.instalments[-1].principal), Decimal('833.37'))
+        self.assert_consistent(loan, schedule)
+
+    def test_reducing_balance_schedule(self):
+        loan = self.loan()
+        schedule = loan_schedule(loan, 'reducing')
+        self.assertEqual(money(schedule.instalments[0].payment), Decimal('888.49'))
+        self.assertEqual(money(schedule.instalments[0].interest), Decimal('100.00'))
+        self.assertEqual(money(schedule.total_interest), Decimal('661.86'))
+        self.assert_consistent(loan, schedule)
+
+    def test_zero_rate_and_short_loans(self):
+        for loan in (self.loan(rate='0.00'), self.loan(days=10), self.loan(amount='0.05', days=200)):
+            for method in ('flat', 'reducing'):
+                self.assert_consistent(loan, loan_schedule(loan, method))
+
+    def test_loan_book_totals_are_exact(self):
+        rng = random.Random(7)
+        loans = [
+            self.loan(
+                amount=f'{rng.randrange(100, 5000000) / 100:.2f}',
+                rate=rng.choice(['5.00', '8.25', '12.50', '20.00']),
+                days=rng.randrange(1, 1000)
+            )
+            for _ in range(300)
+        ]
+        for method in ('flat', 'reducing'):
+            for loan, schedule in zip(loans, loan_book_schedules(loans, method)):
+                self.assert_consistent(loan, schedule)
+
+    def test_add_months_clamps_to_month_end(self):
+        self.assertEqual(add_months(date(2027, 1, 31), 1), date(2027, 2, 28))
+        self.assertEqual(add_months(date(2028, 1, 31), 1), date(2028, 2, 29))
+        self.assertEqual(add_months(date(2027, 11, 30), 3), date(2028, 2, 29))
+
+    def test_schedule_endpoints(self):
+        approved = self.loan(status='APPROVED')
+        approved.save()
+        self.loan(amount='500.00').save()
+        client = APIClient()
+        client.force_login(self.user)
+
+        response = client.get(f'/api/loans/{approved.pk}/schedule/?method=reducing')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_interest'], '661.86')
+        self.assertEqual(len(response.data['instalments']), 12)
+        self.assertEqual(client.get(f'/api/loans/{approved.pk}/schedule/?method=balloon').status_code, 400)
+
+        response = client.get(f'/api/savings-groups/{self.group.pk}/loan_schedules/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['total_principal'], '10000.00')
+        response = client.get(f'/api/savings-groups/{self.group.pk}/loan_schedules/?status=ALL&method=reducing')
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(response.data['total_principal'], '10500.00')
+
+
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.staff = User.objects.create_user(username='staff', password='testpass123', is_staff=True)
+        self.member = User.objects.create_user(username='member', password='testpass123')
+        self.group = SavingsGroup.objects.create(name='Profiled Group')
+
+    def report(self, response):
+        profile_id = response['X-Profile-Id']
+        self.assertTrue(os.path.exists(os.path.join(self.directory, f'{profile_id}.prof')))
+        with open(os.path.join(self.directory, f'{profile_id}.json')) as report:
+            return json.load(report)
+
+    def test_staff_header_profiles_request(self):
+        with self.settings(PROFILING_DIR=self.directory):
+            client = APIClient()
+            client.force_login(self.staff)
+            response = client.get(f'/api/savings-groups/{self.group.pk}/', HTTP_X_PROFILE='1')
+            report = self.report(response)
+        self.assertEqual(report['trigger'], 'request')
+        self.assertEqual(report['user'], 'staff')
+        self.assertEqual(report['status'], 200)
+        self.assertGreater(report['query_count'], 0)
+        self.assertTrue(any('fintech_savingsgroup' in query['sql'] for query in report['queries']))
+        starts = [query['start_ms'] for query in report['queries']]
+        self.assertEqual(starts, sorted(starts))
+
+    def test_staff_token_profiles_request(self):
+        with self.settings(PROFILING_DIR=self.directory):
+            response = APIClient().get(
+                f'/api/savings-groups/{self.group.pk}/',
+                HTTP_X_PROFILE='1', HTTP_AUTHORIZATION=f'Token {issue_api_token(self.staff)}'
+            )
+            self.assertEqual(self.report(response)['user'], 'staff')
+            response = APIClient().get(
+                '/api/savings-groups/',
+                HTTP_X_PROFILE='1', HTTP_AUTHORIZATION=f'Token {issue_api_token(self.member)}'
+            )
+            self.assertNotIn('X-Profile-Id', response)
+
+    async def test_staff_token_profiles_async_request(self):
+        token = await sync_to_async(issue_api_token)(self.staff)
+        with self.settings(PROFILING_DIR=self.directory):
+            response = await self.async_client.get(
+                f'/api/async/savings-groups/{self.group.pk}/',
+                headers={'X-Profile': '1', 'Authorization': f'Token {token}'}
+            )
+            report = self.report(response)
+        self.assertEqual(report['user'], 'staff')
+
+    def test_query_parameter_ignored_for_non_staff(self):
+        with self.settings(PROFILING_DIR=self.directory):
+            client = APIClient()
+            client.force_login(self.member)
+            response = client.get('/api/savings-groups/?profile=1')
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('X-Profile-Id', response)
+            response = client.get('/api/savings-groups/')
+            self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_sample_rate_profiles_any_request(self):
+        with self.settings(PROFILING_DIR=self.directory, PROFILING_SAMPLE_RATE=1.0):
+            response = APIClient().get('/api/csrf/')
+            report = self.report(response)
+        self.assertEqual(report['trigger'], 'sample')
+        self.assertIsNone(report['user'])
+
+    async def test_async_views_are_profiled(self):
+        with self.settings(PROFILING_DIR=self.directory):
+            await self.async_client.aforce_login(self.staff)
+            response = await self.async_client.get(
+                f'/api/async/savings-groups/{self.group.pk}/', headers={'X-Profile': '1'}
+            )
+            report = self.report(response)
+        self.assertEqual(report['user'], 'staff')
+        self.assertGreater(report['query_count'], 0)
+
+
+@override_settings(DATABASE_REPLICA_ALIAS='replica')
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_reads_stay_on_primary_unless_hinted(self):
+        self.assertEqual(self.router.db_for_read(SavingsGroup), 'default')
+        with read_from_replica():
+            self.assertEqual(self.router.db_for_read(SavingsGroup), 'replica')
+            self.assertEqual(self.router.db_for_read(Session), 'default')
+        self.assertEqual(self.router.db_for_read(SavingsGroup), 'default')
+
+    def test_write_pins_remaining_reads_to_primary(self):
+        with read_from_replica():
+            self.assertEqual(self.router.db_for_write(Contribution), 'default')
+            self.assertEqual(self.router.db_for_read(SavingsGroup), 'default')
+
+    def test_no_replica_configured(self):
+        with self.settings(DATABASE_REPLICA_ALIAS=None), read_from_replica():
+            self.assertIsNone(self.router.db_for_read(SavingsGroup))
+            self.assertIsNone(self.router.db_for_write(SavingsGroup))
+
+    def test_view_hints(self):
+        self.assertTrue(view_reads_from_replica(SavingsGroupViewSet.as_view({'get': 'list'}), 'GET'))
+        self.assertTrue(view_reads_from_replica(SavingsGroupViewSet.as_view({'get': 'analytics'}), 'GET'))
+        self.assertFalse(view_reads_from_replica(SavingsGroupViewSet.as_view({'get': 'statement'}), 'GET'))
+        self.assertFalse(view_reads_from_replica(SavingsGroupViewSet.as_view({'post': 'join_group'}), 'POST'))
+        self.assertFalse(view_reads_from_replica(statement, 'GET'))
+        self.assertTrue(view_reads_from_replica(group_detail, 'GET'))
+
+    def route(self, request, write=False):
+        """Run a request through the middleware; return the response and the read alias"""
+        routed = {}
+
+        def get_response(request):
+            middleware.process_view(request, SavingsGroupViewSet.as_view({'get': 'list', 'post': 'create'}), (), {})
+            if write:
+                self.router.db_for_write(SavingsGroup)
+            routed['read'] = self.router.db_for_read(SavingsGroup)
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        return middleware(request), routed['read']
+
+    def test_middleware_pins_client_after_write(self):
+        factory = RequestFactory()
+        response, read = self.route(factory.get('/api/savings-groups/'))
+        self.assertEqual(read, 'replica')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+        with self.settings(REPLICA_PIN_SECONDS=30):
+            response, read = self.route(factory.post('/api/savings-groups/'), write=True)
+        self.assertEqual(read, 'default')
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 30)
+
+        request = factory.get('/api/savings-groups/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        response, read = self.route(request)
+        self.assertEqual(read, 'default')
+
+
+@skipUnless(
+    settings.DATABASE_REPLICA_ALIAS,
+    'set WAKALA_DB_REPLICA_NAME (or WAKALA_DB_REPLICA_HOST) to test against a replica'
+)
+class ReplicaRoutingTests(TransactionTestCase):
+    """The replica's test database is separate from the primary's and never
+    synced, so which copy of a row comes back shows where a read went"""
+    replica = settings.DATABASE_REPLICA_ALIAS
+    databases = {'default', replica} if replica else {'default'}
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='testpass123')
+        self.group = SavingsGroup.objects.create(name='Primary copy')
+        # bulk_create skips the signals, which would write to the primary
+        User.objects.using(self.replica).bulk_create([
+            User(pk=self.user.pk, username=self.user.username, password=self.user.password)
+        ])
+        SavingsGroup.objects.using(self.replica).bulk_create([SavingsGroup(pk=self.group.pk, name='Replica copy')])
+        self.client = APIClient()
+        self.client.force_login(self.user)
+
+    def test_read_only_endpoint_served_from_replica(self):
+        response = self.client.get(f'/api/savings-groups/{self.group.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['name'], 'Replica copy')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_client_reads_own_writes_after_writing(self):
+        response = self.client.post(f'/api/savings-groups/{self.group.pk}/join_group/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertTrue(GroupMembership.objects.filter(user=self.user, group=self.group).exists())
+        self.assertFalse(GroupMembership.objects.using(self.replica).exists())
+
+        response = self.client.get(f'/api/savings-groups/{self.group.pk}/')
+        self.assertEqual(response.data['name'], 'Primary copy')
+        self.assertEqual(response.data['members'], [self.user.pk])
+
+    def test_analytics_service_reads_replica(self):
+        with CaptureQueriesContext(connections[self.replica]) as replica_queries:
+            with CaptureQueriesContext(connections['default']) as primary_queries:
+                calculate_group_analytics(self.group)
+        self.assertEqual(len(replica_queries), 1)
+        self.assertEqual(len(primary_queries), 0)
+
+
+class APITokenTests(TestCase):
+    def setUp(self):
+        principal_cache.clear()
+        self.user = User.objects.create_user(username='agent', password='testpass123')
+        self.group = SavingsGroup.objects.create(name='Token Group')
+        GroupMembership.objects.create(user=self.user, group=self.group, role='ADMIN')
+        self.client = APIClient()
+
+    def token_get(self, token, path='/api/notifications/unread_count/'):
+        return self.client.get(path, HTTP_AUTHORIZATION=f'Token {token}')
+
+    def test_login_returns_token(self):
+        response = self.client.post('/api/login/', {'username': 'agent', 'password': 'testpass123'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['expires_in'], settings.API_TOKEN_MAX_AGE)
+        self.client.logout()
+        response = self.token_get(response.data['token'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'unread': 0})
+
+    def test_warm_cache_authenticates_without_queries(self):
+        token = issue_api_token(self.user)
+        # Cold: the user and their memberships are read once
+        with self.assertNumQueries(3):
+            self.assertEqual(self.token_get(token).status_code, 200)
+        # Warm: only the view's own query
+        with self.assertNumQueries(1):
+            response = self.token_get(token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.wsgi_request.user, self.user)
+
+    def test_principal_carries_memberships(self):
+        token = issue_api_token(self.user)
+        response = self.token_get(token)
+        self.assertEqual(response.wsgi_request.auth.memberships, {self.group.pk: 'ADMIN'})
+        other = SavingsGroup.objects.create(name='Second Group')
+        GroupMembership.objects.create(user=self.user, group=other)
+        response = self.token_get(token)
+        self.assertEqual(response.wsgi_request.auth.memberships, {self.group.pk: 'ADMIN', other.pk: 'MEMBER'})
+
+    def test_admin_checks_read_principal_memberships(self):
+        token = issue_api_token(self.user)
+        self.token_get(token)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.token_get(token, f'/api/savings-groups/{self.group.pk}/statement/')
+            b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in queries if '"fintech_groupmembership"."role"' in query['sql']])
+
+        # Demoted in another process: the cached principal still grants access
+        # until it expires, then the new role applies
+        GroupMembership.objects.filter(user=self.user).update(role='MEMBER')
+        self.assertEqual(self.token_get(token, f'/api/savings-groups/{self.group.pk}/statement/').status_code, 200)
+        principal_cache.clear()
+        self.assertEqual(self.token_get(token, f'/api/savings-groups/{self.group.pk}/statement/').status_code, 403)
+
+    async def test_async_views_accept_tokens(self):
+        token = await sync_to_async(issue_api_token)(self.user)
+        headers = {'Authorization': f'Token {token}'}
+        response = await self.async_client.get('/api/async/notifications/', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        response = await self.async_client.get('/api/notifications/stream/', headers=headers)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        await response.streaming_content.aclose()
+
+        response = await self.async_client.get('/api/async/notifications/', headers={'Authorization': 'Token forged'})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json(), {'detail': 'Invalid token'})
+
+    def test_tampered_and_expired_tokens_rejected(self):
+        token = issue_api_token(self.user)
+        response = self.token_get(token[:-1] + ('A' if token[-1] != 'A' else 'B'))
+        # Session authentication comes first, so failures are 403 like the rest of the API
+        self.assertEqual(response.status_code, 403)
+
+        issued = timezone.now().timestamp() - settings.API_TOKEN_MAX_AGE - 60
+        with mock.patch('django.core.signing.time.time', return_value=issued):
+            expired = issue_api_token(self.user)
+        self.assertEqual(self.token_get(expired).status_code, 403)
+
+    def test_revocation(self):
+        token = issue_api_token(self.user)
+        self.assertEqual(self.token_get(token).status_code, 200)
+        revoke_api_tokens(self.user)
+        self.assertEqual(self.token_get(token).status_code, 403)
+
+        token = issue_api_token(User.objects.get(pk=self.user.pk))
+        self.assertEqual(self.token_get(token).status_code, 200)
+        response = self.client.post('/api/logout/', HTTP_AUTHORIZATION=f'Token {token}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.token_get(token).status_code, 403)
+
+    def test_inactive_user_rejected(self):
+        token = issue_api_token(self.user)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.token_get(token).status_code, 403)
+
+    def test_token_settings_apply_at_runtime(self):
+        token = issue_api_token(self.user)
+        self.token_get(token)
+        with self.settings(API_TOKEN_CACHE_TTL=0):
+            principal_cache.put(self.user.pk, principal_cache.get(self.user.pk))
+            self.assertIsNone(principal_cache.get(self.user.pk))
+        with self.settings(API_TOKEN_MAX_AGE=-1):
+            self.assertEqual(self.token_get(token).status_code, 403)
+
+    def test_principal_cache_is_bounded_and_expires(self):
+        cache = PrincipalCache(maxsize=2, ttl=60)
+        for user_id in (1, 2, 3):
+            cache.put(user_id, user_id)
+        self.assertIsNone(cache.get(1))
+        self.assertEqual(cache.get(3), 3)
+
+        cache = PrincipalCache(maxsize=2, ttl=0)
+        cache.put(1, 1)
+        self.assertIsNone(cache.get(1))
+
+
+class IdempotencyKeyTests(TestCase):
+    def setUp(self):
+        recent_keys().clear()
+        self.user = User.objects.create_user(username='agent', password='testpass123')
+        self.group = SavingsGroup.objects.create(name='Retry Group')
+        self.member = GroupMembership.objects.create(user=self.user, group=self.group)
+        self.client = APIClient()
+        self.client.force_login(self.user)
+
+    def deposit(self, key, amount='100.00', client=None):
+        return (client or self.client).post(
+            '/api/contributions/',
+            {'member': self.member.pk, 'amount': amount, 'transaction_type': 'DEPOSIT'},
+            format='json',
+            HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def assert_ledger(self, contributions, balance):
+        self.assertEqual(Contribution.objects.count(), contributions)
+        self.assertEqual(TransactionHistory.objects.count(), contributions)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.total_balance, Decimal(balance))
+
+    def test_retry_replays_first_response(self):
+        # The recent-key cache is filled once the transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.deposit('retry-1')
+        self.assertEqual(first.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', first)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.deposit('retry-1')
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.json(), first.json())
+        # Answered from the recent-key cache without touching the ledger
+        self.assertFalse([q for q in queries if 'fintech_' in q['sql'] and 'fintech_userprofile' not in q['sql']])
+        self.assert_ledger(1, '100.00')
+
+    def test_retry_after_cache_expiry_replays_from_database(self):
+        first = self.deposit('retry-2')
+        recent_keys().clear()
+        second = self.deposit('retry-2')
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.json(), first.json())
+        self.assert_ledger(1, '100.00')
+
+    def test_key_reused_for_different_request(self):
+        self.deposit('retry-3')
+        response = self.deposit('retry-3', amount='250.00')
+        self.assertEqual(response.status_code, 422)
+        self.assert_ledger(1, '100.00')
+
+    def test_keys_are_per_user(self):
+        other = User.objects.create_user(username='other', password='testpass123')
+        client = APIClient()
+        client.force_login(other)
+        self.deposit('shared-key')
+        self.assertEqual(self.deposit('shared-key', client=client).status_code, 201)
+        self.assert_ledger(2, '200.00')
+
+    def test_failed_request_releases_key(self):
+        response = self.client.post(
+            '/api/contributions/', {'member': self.member.pk, 'transaction_type': 'DEPOSIT'},
+            format='json', HTTP_IDEMPOTENCY_KEY='retry-4'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self.deposit('retry-4').status_code, 201)
+        self.assert_ledger(1, '100.00')
+
+    def test_requests_without_key_are_not_deduplicated(self):
+        for _ in range(2):
+            self.client.post(
+                '/api/contributions/',
+                {'member': self.member.pk, 'amount': '100.00', 'transaction_type': 'DEPOSIT'},
+                format='json'
+            )
+        self.assert_ledger(2, '200.00')
+
+    def test_bulk_and_loan_posts(self):
+        payload = [
+            {'member': self.member.pk, 'amount': '10.00', 'transaction_type': 'DEPOSIT'}
+            for _ in range(3)
+        ]
+        for _ in range(2):
+            response = self.client.post(
+                '/api/contributions/bulk/', payload, format='json', HTTP_IDEMPOTENCY_KEY='bulk-1'
+            )
+            self.assertEqual(response.status_code, 201)
+        self.assert_ledger(3, '30.00')
+
+        loan = {
+            'borrower': self.member.pk, 'amount': '20.00', 'interest_rate': '10.00',
+            'due_date': (timezone.now() + timedelta(days=90)).isoformat()
+        }
+        for _ in range(2):
+            response = self.client.post('/api/loans/', loan, format='json', HTTP_IDEMPOTENCY_KEY='loan-1')
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(Loan.objects.count(), 1)
+
+    def test_duplicate_while_first_in_progress(self):
+        factory = APIRequestFactory()
+
+        def request():
+            wsgi_request = factory.post('/api/contributions/', {'amount': '1.00'}, format='json', HTTP_IDEMPOTENCY_KEY='busy')
+            drf_request = Request(wsgi_request, parsers=[JSONParser()])
+            drf_request.user = self.user
+            return drf_request
+
+        def first():
+            duplicate = idempotent_response(request(), lambda: Response(status=201))
+            self.assertEqual(duplicate.status_code, 409)
+            return Response({'done': True}, status=201)
+
+        response = idempotent_response(request(), first)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(IdempotencyKey.objects.get().status_code, 201)
+
+    def test_purge_old_keys(self):
+        self.deposit('old')
+        self.deposit('new')
+        IdempotencyKey.objects.filter(key='old').update(created_at=timezone.now() - timedelta(hours=48))
+        self.assertEqual(purge_idempotency_keys(), 1)
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['new'])
+
+
+class ConcurrentIdempotencyTests(TransactionTestCase):
+    def test_concurrent_duplicates_post_once(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            # Shared-cache memory databases fail lock waits instead of queueing
+            # them; benchmarks/stress_idempotency.py covers SQLite on a file
+            self.skipTest('needs a file or server test database')
+        recent_keys().clear()
+        user = User.objects.create_user(username='agent', password='testpass123')
+        group = SavingsGroup.objects.create(name='Flaky Network')
+        member = GroupMembership.objects.create(user=user, group=group)
+        barrier = threading.Barrier(4)
+        responses = []
+
+        def submit():
+            client = APIClient()
+            client.force_authenticate(user)
+            barrier.wait()
+            try:
+                responses.append(client.post(
+                    '/api/contributions/',
+                    {'member': member.pk, 'amount': '100.00', 'transaction_type': 'DEPOSIT'},
+                    format='json',
+                    HTTP_IDEMPOTENCY_KEY='same-tap'
+                ))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=submit) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([response.status_code for response in responses], [201] * 4)
+        self.assertEqual(len({response.json()['id'] for response in responses}), 1)
+        self.assertEqual(Contribution.objects.count(), 1)
+        group.refresh_from_db()
+        self.assertEqual(group.total_balance, Decimal('100.00'))
+
+
+class ConcurrentLoanReviewTests(TransactionTestCase):
+    def test_concurrent_reviews_cannot_overdraw_group(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('needs a file or server test database')
+        group = SavingsGroup.objects.create(name='Meeting Group')
+        loans = []
+        for i in range(2):
+            member = GroupMembership.objects.create(
+                user=User.objects.create_user(username=f'borrower{i}'), group=group
+            )
+            Contribution.objects.create(member=member, amount=Decimal('1000.00'), transaction_type='DEPOSIT')
+            loans.append(Loan.objects.create(
+                borrower=member, amount=Decimal('1200.00'), interest_rate=Decimal('10.00'),
+                due_date=timezone.now() + timedelta(days=90)
+            ))
+        barrier = threading.Barrier(2)
+        results = []
+
+        def review(loan):
+            barrier.wait()
+            try:
+                results.append(review_loans(approve_ids=[loan.pk]))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=review, args=(loan,)) for loan in loans]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(len(result['approved']) for result in results), [0, 1])
+        self.assertIn('insufficient group balance', [
+            reason for result in results for reason in result['skipped'].values()
+        ])
+        group.refresh_from_db()
+        self.assertEqual(group.total_balance, Decimal('800.00'))
+
+
+class LoanReviewTests(TestCase):
+    def setUp(self):
+        self.group = SavingsGroup.objects.create(name='Meeting Group')
+        self.admin = User.objects.create_user(username='chair', password='testpass123')
+        GroupMembership.objects.create(user=self.admin, group=self.group, role='ADMIN')
+        self.borrowers = []
+        for i in range(2):
+            member = GroupMembership.objects.create(
+                user=User.objects.create_user(username=f'borrower{i}', password='testpass123'),
+                group=self.group
+            )
+            # 1000 in deposits each: 3000 eligibility, 2000 group balance
+            Contribution.objects.create(member=member, amount=Decimal('1000.00'), transaction_type='DEPOSIT')
+            self.borrowers.append(member)
+        self.client = APIClient()
+        self.client.force_login(self.admin)
+
+    def loan(self, borrower, amount):
+        return Loan.objects.create(
+            borrower=borrower, amount=Decimal(amount), interest_rate=Decimal('10.00'),
+            due_date=timezone.now() + timedelta(days=90)
+        )
+
+    def review(self, **body):
+        return self.client.post('/api/loans/review/', body, format='json')
+
+    def test_separate_reviews_cannot_overdraw_group(self):
+        first = self.loan(self.borrowers[0], '1200.00')
+        second = self.loan(self.borrowers[1], '1200.00')
+        self.assertEqual(self.review(approve=[first.pk]).data['approved'], [first.pk])
+        response = self.review(approve=[second.pk])
+        self.assertEqual(response.data['skipped'], [{'loan': second.pk, 'reason': 'insufficient group balance'}])
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.total_balance, Decimal('800.00'))
+
+    def test_batch_approval_disburses_in_one_transaction(self):
+        loans = [
+            self.loan(self.borrowers[0], '500.00'),
+            self.loan(self.borrowers[1], '700.00'),
+            self.loan(self.borrowers[0], '300.00'),
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.review(approve=[loan.pk for loan in loans])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['approved'], [loan.pk for loan in loans])
+        self.assertEqual(response.data['skipped'], [])
+
+        balance_updates = [q for q in queries if q['sql'].startswith('UPDATE "fintech_savingsgroup"')]
+        self.assertEqual(len(balance_updates), 1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.total_balance, Decimal('500.00'))
+        self.assertEqual(
+            list(TransactionHistory.objects.filter(transaction_type='LOAN').order_by('pk').values_list(
+                'amount', 'balance_after'
+            )),
+            [
+                (Decimal('500.00'), Decimal('1500.00')),
+                (Decimal('700.00'), Decimal('800.00')),
+                (Decimal('300.00'), Decimal('500.00')),
+            ]
+        )
+        for loan in Loan.objects.filter(pk__in=[loan.pk for loan in loans]):
+            self.assertEqual(loan.status, 'APPROVED')
+            self.assertEqual(loan.transaction.amount, loan.amount)
+        self.assertEqual(GroupDailyRollup.objects.get(group=self.group).loans_opened, 3)
+        self.assertEqual(Notification.objects.filter(title='Loan approved').count(), 3)
+        self.assertEqual(unread_notification_count(self.borrowers[0].user), 2)
+
+    def test_balance_and_eligibility_limits(self):
+        too_large = self.loan(self.borrowers[0], '2500.00')
+        first = self.loan(self.borrowers[1], '1800.00')
+        over_limit = self.loan(self.borrowers[1], '1500.00')
+        result = review_loans(approve_ids=[too_large.pk, first.pk, over_limit.pk])
+        self.assertEqual(result['approved'], [first.pk])
+        self.assertEqual(result['skipped'], {
+            too_large.pk: 'insufficient group balance',
+            over_limit.pk: 'exceeds borrower eligibility',
+        })
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.total_balance, Decimal('200.00'))
+        too_large.refresh_from_db()
+        self.assertEqual(too_large.status, 'PENDING')
+
+    def test_eligibility_counts_earlier_approvals(self):
+        first = self.loan(self.borrowers[0], '1500.00')
+        second = self.loan(self.borrowers[0], '1500.00')
+        third = self.loan(self.borrowers[0], '100.00')
+        # Group balance covers the loans; the borrower's 3000 limit doesn't
+        Contribution.objects.create(member=self.borrowers[1], amount=Decimal('5000.00'), transaction_type='DEPOSIT')
+        for loan in (first, second):
+            self.assertEqual(review_loans(approve_ids=[loan.pk])['approved'], [loan.pk])
+        result = review_loans(approve_ids=[third.pk])
+        self.assertEqual(result['skipped'], {third.pk: 'exceeds borrower eligibility'})
+
+    def test_reject_and_skip_decided_loans(self):
+        approved = self.loan(self.borrowers[0], '100.00')
+        rejected = self.loan(self.borrowers[1], '100.00')
+        self.review(approve=[approved.pk])
+        response = self.review(approve=[approved.pk], reject=[rejected.pk, 999999])
+        self.assertEqual(response.data['approved'], [])
+        self.assertEqual(response.data['rejected'], [rejected.pk])
+        self.assertEqual(response.data['skipped'], [
+            {'loan': approved.pk, 'reason': 'already approved'},
+            {'loan': 999999, 'reason': 'not found'},
+        ])
+        rejected.refresh_from_db()
+        self.assertEqual(rejected.status, 'REJECTED')
+        self.assertIsNone(rejected.transaction)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.total_balance, Decimal('1900.00'))
+        self.assertEqual(GroupDailyRollup.objects.get(group=self.group).loans_opened, 1)
+
+    def test_invalid_requests(self):
+        loan = self.loan(self.borrowers[0], '100.00')
+        self.assertEqual(self.review().status_code, 400)
+        self.assertEqual(self.review(approve=[loan.pk], reject=[loan.pk]).status_code, 400)
+        self.assertEqual(self.review(approve=['1']).status_code, 400)
+
+    def test_only_group_admins_review(self):
+        loan = self.loan(self.borrowers[0], '100.00')
+        client = APIClient()
+        client.force_login(self.borrowers[1].user)
+        response = client.post('/api/loans/review/', {'approve': [loan.pk]}, format='json')
+        self.assertEqual(response.data['skipped'], [{'loan': loan.pk, 'reason': 'not a group admin'}])
+        self.assertEqual(client.post(f'/api/loans/{loan.pk}/approve/').status_code, 403)
+        loan.refresh_from_db()
+        self.assertEqual(loan.status, 'PENDING')
+
+    def test_generic_routes_cannot_approve(self):
+        client = APIClient()
+        client.force_login(self.borrowers[0].user)
+        response = client.post('/api/loans/', {
+            'borrower': self.borrowers[0].pk, 'amount': '900.00', 'interest_rate': '10.00',
+            'due_date': (timezone.now() + timedelta(days=90)).isoformat(), 'status': 'APPROVED'
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['status'], 'PENDING')
+        loan = Loan.objects.get(pk=response.data['id'])
+        self.assertIsNone(loan.transaction)
+
+        response = client.patch(f'/api/loans/{loan.pk}/', {'status': 'APPROVED'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        loan.refresh_from_db()
+        self.assertEqual(loan.status, 'PENDING')
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.total_balance, Decimal('2000.00'))
+        self.assertFalse(TransactionHistory.objects.filter(transaction_type='LOAN').exists())
+
+    def test_single_approve_disburses(self):
+        loan = self.loan(self.borrowers[0], '400.00')
+        response = self.client.post(f'/api/loans/{loan.pk}/approve/')
+        self.assertEqual(response.status_code, 200)
+        loan.refresh_from_db()
+        self.assertEqual(loan.status, 'APPROVED')
+        self.assertEqual(loan.transaction.balance_after, Decimal('1600.00'))
+        response = self.client.post(f'/api/loans/{loan.pk}/approve/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['detail'], 'Loan not approved: already approved')
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.total_balance, Decimal('1600.00'))
+
+        other = self.loan(self.borrowers[1], '100.00')
+        self.assertEqual(self.client.post(f'/api/loans/{other.pk}/reject/').status_code, 200)
+        self.assertEqual(Notification.objects.filter(title='Loan rejected').count(), 1)
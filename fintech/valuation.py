@@ -0,0 +1,38 @@
+"""
+Growth factors for investment valuation.
+
+An investment's value is ``amount * (1 + rate) ** (days / 365)``. The
+fractional Decimal power is by far the most expensive step, and it only
+depends on the annual return rate and the age in days, of which a
+portfolio has few distinct pairs. Factors are kept in a bounded LRU cache
+so repeated valuations skip the power entirely.
+"""
+from decimal import Decimal
+from functools import lru_cache
+
+# Distinct (rate, age) pairs kept; each entry is a few hundred bytes
+GROWTH_FACTOR_CACHE_SIZE = 16384
+
+
+@lru_cache(maxsize=GROWTH_FACTOR_CACHE_SIZE)
+def _growth_factor(rate, days):
+    rate = Decimal(rate) / Decimal('100.00')
+    return (Decimal('1.00') + rate) ** (Decimal(days) / Decimal('365'))
+
+
+def growth_factor(annual_return_rate, days):
+    """Return ``(1 + rate / 100) ** (days / 365)`` for a rate in percent
+
+    The rate is keyed by its string form: Decimal('5.00') and Decimal('5')
+    compare equal, but their powers can carry different trailing zeros, and
+    a cached factor must be exactly what the uncached arithmetic returns.
+    """
+    return _growth_factor(str(annual_return_rate), days)
+
+
+def growth_factor_cache_info():
+    return _growth_factor.cache_info()
+
+
+def clear_growth_factor_cache():
+    _growth_factor.cache_clear()
@@ -1,5 +1,5 @@
 from rest_framework import viewsets, permissions, status
-from rest_framework.decorators import action, authentication_classes, permission_classes
+from rest_framework.decorators import action, api_view, authentication_classes, permission_classes
 from rest_framework.authentication import SessionAuthentication
 from rest_framework.response import Response
 from django.contrib.auth.models import User
@@ -13,15 +13,121 @@ from .models import (
 from .serializers import (
     UserSerializer, SavingsGroupSerializer, GroupMembershipSerializer,
     ContributionSerializer, LoanSerializer, InvestmentSerializer,
-    FinancialEducationSerializer, UserProgressSerializer, NotificationSerializer
+    FinancialEducationSerializer, UserProgressSerializer, NotificationSerializer,
+    BulkContributionSerializer
 )
+from .authentication import APITokenAuthentication, Principal
+from .idempotency import IdempotentCreateMixin, idempotent_response
+from .pagination import NotificationPagination, ContributionPagination, LoanPagination
+from .schedules import (
+    SCHEDULE_METHODS, loan_schedule, loan_book_schedules, schedule_payload, loan_book_payload
+)
+from .statements import (
+    STATEMENT_FORMATS, statement_period, statement_response,
+    user_statement_rows, group_statement_rows
+)
+from .services import (
+    post_contributions_bulk, calculate_group_analytics, group_daily_series,
+    group_loan_eligibility, unread_notification_count, mark_notifications_read,
+    review_loans
+)
+
+# Upper bound on rows accepted by a single bulk posting request
+BULK_CONTRIBUTION_LIMIT = 1000
+# Upper bound on loans approved or rejected by a single review request
+LOAN_REVIEW_LIMIT = 1000
+
+
+def admin_group_ids(request):
+    """Groups the requesting user administers
+
+    Token requests read them from the cached principal; session requests
+    query them.
+    """
+    if isinstance(request.auth, Principal):
+        return {group_id for group_id, role in request.auth.memberships.items() if role == 'ADMIN'}
+    return set(GroupMembership.objects.filter(user=request.user, role='ADMIN').values_list('group_id', flat=True))
+
+
+def reviewable_group_ids(request):
+    """Groups whose loans the user may approve or reject; None for staff, who may review any"""
+    if request.user.is_staff:
+        return None
+    return admin_group_ids(request)
+
+
+def statement_params(request):
+    """Read ``output``, ``start`` and ``end`` from the query string
+
+    Returns (output, since, until), or a 400 Response when they don't parse.
+    """
+    output = request.query_params.get('output', 'csv')
+    if output not in STATEMENT_FORMATS:
+        return Response(
+            {'detail': f'output must be one of {", ".join(STATEMENT_FORMATS)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        since, until = statement_period(request.query_params.get('start'), request.query_params.get('end'))
+    except ValueError:
+        return Response(
+            {'detail': 'start and end must be YYYY-MM-DD dates, end not before start'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return output, since, until
+
+
+def schedule_method(request):
+    """The ``method`` query parameter, or None when it isn't a known method"""
+    method = request.query_params.get('method', 'flat')
+    return method if method in SCHEDULE_METHODS else None
+
+
+def invalid_schedule_method():
+    return Response(
+        {'detail': f'method must be one of {", ".join(SCHEDULE_METHODS)}'},
+        status=status.HTTP_400_BAD_REQUEST
+    )
+
+
+@api_view(['GET'])
+def statement(request):
+    """Download the signed-in member's statement as CSV or JSONL"""
+    params = statement_params(request)
+    if isinstance(params, Response):
+        return params
+    output, since, until = params
+    rows = user_statement_rows(request.user, since, until)
+    return statement_response(rows, output, f'statement-{request.user.username}')
+
+# The rows are read while the response streams, after the view has returned
+statement.query_budget = 2
 
 @method_decorator(ensure_csrf_cookie, name='dispatch')
 class SavingsGroupViewSet(viewsets.ModelViewSet):
     queryset = SavingsGroup.objects.all()
     serializer_class = SavingsGroupSerializer
     permission_classes = [permissions.IsAuthenticated]
-    authentication_classes = [SessionAuthentication]
+    authentication_classes = [SessionAuthentication, APITokenAuthentication]
+    # Maximum queries per action, including the session and user lookups
+    query_budgets = {
+        'list': 5,
+        'retrieve': 4,
+        'members': 4,
+        'analytics': 5,
+        'eligibility': 4,
+        'statement': 4,
+        'loan_schedules': 4,
+    }
+    # Read-only actions that may be served from the read replica
+    replica_actions = {'list', 'retrieve', 'members', 'analytics', 'eligibility', 'loan_schedules'}
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            # The serializer lists every group's member ids
+            queryset = queryset.prefetch_related('members')
+        return queryset
 
     @action(detail=True, methods=['post'])
     def join_group(self, request, pk=None):
@@ -37,41 +143,166 @@ class SavingsGroupViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def members(self, request, pk=None):
         group = self.get_object()
-        memberships = GroupMembership.objects.filter(group=group)
+        memberships = GroupMembership.objects.filter(group=group).select_related('user')
         serializer = GroupMembershipSerializer(memberships, many=True)
         return Response(serializer.data)
 
-class ContributionViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['get'])
+    def analytics(self, request, pk=None):
+        group = self.get_object()
+        try:
+            days = min(int(request.query_params.get('days', 30)), 366)
+        except ValueError:
+            return Response({'detail': 'days must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        data = calculate_group_analytics(group)
+        data['daily'] = group_daily_series(group, days)
+        return Response(data)
+
+    @action(detail=True, methods=['get'])
+    def eligibility(self, request, pk=None):
+        group = self.get_object()
+        return Response(group_loan_eligibility(group))
+
+    @action(detail=True, methods=['get'])
+    def statement(self, request, pk=None):
+        """Download the group's statement; restricted to group admins and staff"""
+        group = self.get_object()
+        if not request.user.is_staff and group.pk not in admin_group_ids(request):
+            return Response(
+                {'detail': 'Only group admins can export the group statement'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        params = statement_params(request)
+        if isinstance(params, Response):
+            return params
+        output, since, until = params
+        rows = group_statement_rows(group, since, until)
+        return statement_response(rows, output, f'statement-group-{group.pk}')
+
+    @action(detail=True, methods=['get'])
+    def loan_schedules(self, request, pk=None):
+        """Repayment schedules of the group's loan book, approved loans by default"""
+        group = self.get_object()
+        method = schedule_method(request)
+        if method is None:
+            return invalid_schedule_method()
+        loans = Loan.objects.filter(borrower__group=group).order_by('pk').only(
+            'pk', 'amount', 'interest_rate', 'start_date', 'due_date'
+        )
+        loan_status = request.query_params.get('status', 'APPROVED')
+        if loan_status != 'ALL':
+            loans = loans.filter(status=loan_status)
+        schedules = loan_book_schedules(loans.iterator(chunk_size=2000), method)
+        return Response({'group': group.pk, 'method': method, **loan_book_payload(schedules)})
+
+class ContributionViewSet(IdempotentCreateMixin, viewsets.ModelViewSet):
     queryset = Contribution.objects.all()
     serializer_class = ContributionSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ContributionPagination
+    query_budgets = {'list': 3, 'retrieve': 3}
+    replica_actions = {'list', 'retrieve'}
 
     def get_queryset(self):
         return Contribution.objects.filter(member__user=self.request.user)
 
-class LoanViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        return idempotent_response(request, lambda: self.post_bulk(request))
+
+    def post_bulk(self, request):
+        serializer = BulkContributionSerializer(
+            data=request.data,
+            many=True,
+            allow_empty=False,
+            max_length=BULK_CONTRIBUTION_LIMIT
+        )
+        serializer.is_valid(raise_exception=True)
+        contributions = post_contributions_bulk(serializer.validated_data)
+        return Response(
+            ContributionSerializer(contributions, many=True).data,
+            status=status.HTTP_201_CREATED
+        )
+
+class LoanViewSet(IdempotentCreateMixin, viewsets.ModelViewSet):
     queryset = Loan.objects.all()
     serializer_class = LoanSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = LoanPagination
+    query_budgets = {'list': 3, 'retrieve': 3, 'schedule': 3}
+    replica_actions = {'list', 'retrieve', 'schedule'}
+
+    @action(detail=True, methods=['get'])
+    def schedule(self, request, pk=None):
+        method = schedule_method(request)
+        if method is None:
+            return invalid_schedule_method()
+        return Response(schedule_payload(loan_schedule(self.get_object(), method)))
 
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
-        loan = self.get_object()
-        loan.status = 'APPROVED'
-        loan.save()
-        return Response({'detail': 'Loan approved'})
+        return self.review_one(request, approve=True)
 
     @action(detail=True, methods=['post'])
     def reject(self, request, pk=None):
+        return self.review_one(request, approve=False)
+
+    def review_one(self, request, approve):
         loan = self.get_object()
-        loan.status = 'REJECTED'
-        loan.save()
-        return Response({'detail': 'Loan rejected'})
+        group_ids = reviewable_group_ids(request)
+        if group_ids is not None and loan.borrower.group_id not in group_ids:
+            return Response({'detail': 'Only group admins can review loans'}, status=status.HTTP_403_FORBIDDEN)
+        if approve:
+            result = review_loans(approve_ids=[loan.pk], group_ids=group_ids)
+        else:
+            result = review_loans(reject_ids=[loan.pk], group_ids=group_ids)
+        if loan.pk in result['skipped']:
+            return Response(
+                {'detail': f'Loan not {"approved" if approve else "rejected"}: {result["skipped"][loan.pk]}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({'detail': 'Loan approved' if approve else 'Loan rejected'})
+
+    @action(detail=False, methods=['post'])
+    def review(self, request):
+        """Approve and reject a batch of loans, e.g. after a group meeting
+
+        Takes ``{"approve": [ids], "reject": [ids]}``; loans that can't be
+        approved or rejected are listed under ``skipped`` with the reason.
+        """
+        approve = request.data.get('approve', [])
+        reject = request.data.get('reject', [])
+        for ids in (approve, reject):
+            if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+                return Response(
+                    {'detail': 'approve and reject must be lists of loan ids'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        if not approve and not reject:
+            return Response({'detail': 'No loans to review'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(approve) + len(reject) > LOAN_REVIEW_LIMIT:
+            return Response(
+                {'detail': f'At most {LOAN_REVIEW_LIMIT} loans per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if set(approve) & set(reject):
+            return Response(
+                {'detail': 'A loan cannot be both approved and rejected'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        result = review_loans(approve, reject, reviewable_group_ids(request))
+        return Response({
+            'approved': result['approved'],
+            'rejected': result['rejected'],
+            'skipped': [{'loan': pk, 'reason': reason} for pk, reason in sorted(result['skipped'].items())],
+        })
 
-class InvestmentViewSet(viewsets.ModelViewSet):
+class InvestmentViewSet(IdempotentCreateMixin, viewsets.ModelViewSet):
     queryset = Investment.objects.all()
     serializer_class = InvestmentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budgets = {'list': 4, 'retrieve': 3}
+    replica_actions = {'list', 'retrieve'}
 
     def get_queryset(self):
         return Investment.objects.filter(group__members=self.request.user)
@@ -80,6 +311,8 @@ class FinancialEducationViewSet(viewsets.ModelViewSet):
     queryset = FinancialEducation.objects.all()
     serializer_class = FinancialEducationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budgets = {'list': 4, 'retrieve': 3}
+    replica_actions = {'list', 'retrieve'}
 
     @action(detail=True, methods=['post'])
     def complete_module(self, request, pk=None):
@@ -103,13 +336,41 @@ class FinancialEducationViewSet(viewsets.ModelViewSet):
 class UserProgressViewSet(viewsets.ModelViewSet):
     serializer_class = UserProgressSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budgets = {'list': 4, 'retrieve': 3}
+    replica_actions = {'list', 'retrieve'}
 
     def get_queryset(self):
-        return UserProgress.objects.filter(user=self.request.user)
+        return UserProgress.objects.filter(user=self.request.user).select_related('module')
 
 class NotificationViewSet(viewsets.ModelViewSet):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NotificationPagination
+    query_budgets = {
+        'list': 3,
+        'retrieve': 3,
+        'unread_count': 3,
+        'mark_read': 5,
+        'mark_all_read': 5,
+    }
+    replica_actions = {'list', 'retrieve', 'unread_count'}
 
     def get_queryset(self):
         return Notification.objects.filter(user=self.request.user)
+
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        return Response({'unread': unread_notification_count(request.user)})
+
+    @action(detail=False, methods=['post'])
+    def mark_read(self, request):
+        ids = request.data.get('ids')
+        if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+            return Response({'detail': 'ids must be a list of notification ids'}, status=status.HTTP_400_BAD_REQUEST)
+        marked = mark_notifications_read(request.user, ids)
+        return Response({'marked': marked, 'unread': unread_notification_count(request.user)})
+
+    @action(detail=False, methods=['post'])
+    def mark_all_read(self, request):
+        marked = mark_notifications_read(request.user)
+        return Response({'marked': marked, 'unread': unread_notification_count(request.user)})
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -44,11 +47,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'fintech.middleware.QueryCountMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'fintech.routers.ReplicaRoutingMiddleware',
+    'fintech.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -81,6 +87,7 @@ CSRF_TRUSTED_ORIGINS = [
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
+        'fintech.authentication.APITokenAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -90,6 +97,43 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
 }
 
+# API tokens from /api/login/ are valid for API_TOKEN_MAX_AGE seconds. The
+# user and memberships behind a token are cached per process for
+# API_TOKEN_CACHE_TTL seconds, which bounds how long a revoked token keeps
+# working in other processes
+API_TOKEN_MAX_AGE = 24 * 60 * 60
+API_TOKEN_CACHE_SIZE = 4096
+API_TOKEN_CACHE_TTL = 30
+
+# Idempotency-Key responses are kept in the "idempotency" cache for
+# IDEMPOTENCY_CACHE_TTL seconds and in the database for
+# IDEMPOTENCY_KEY_RETENTION_HOURS, after which purge_idempotency_keys deletes
+# them. Point the cache at a shared backend when running several processes.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'idempotency': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'idempotency',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+IDEMPOTENCY_CACHE_TTL = 600
+IDEMPOTENCY_KEY_RETENTION_HOURS = 24
+
+# Largest page a client may request from the cursor-paginated list endpoints
+CURSOR_PAGINATION_MAX_PAGE_SIZE = 100
+
+# Query instrumentation: statements repeated this often in one request are
+# reported as suspected N+1 queries
+QUERY_N_PLUS_ONE_THRESHOLD = 3
+
+# On-demand profiling: staff requests with "X-Profile: 1" or ?profile=1, plus
+# this fraction of all requests, are profiled into PROFILING_DIR
+PROFILING_DIR = BASE_DIR / 'profiles'
+PROFILING_SAMPLE_RATE = 0.0
+
 ROOT_URLCONF = 'wakaladigital.urls'
 
 TEMPLATES = [
@@ -113,12 +157,93 @@ WSGI_APPLICATION = 'wakaladigital.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+#
+# WAKALA_DB_PROFILE selects the database setup:
+#   sqlite        single-node agents: WAL so readers don't block the writer,
+#                 synchronous=NORMAL (durable across crashes of the app, may
+#                 lose the last commits on power loss), a busy timeout,
+#                 IMMEDIATE transactions so a writer waits for the lock at
+#                 BEGIN instead of failing mid-transaction, and persistent
+#                 connections
+#   sqlite-basic  Django's defaults, kept for comparison
+#   postgres      persistent connections with health checks, or a psycopg
+#                 connection pool when WAKALA_DB_POOL_MAX_SIZE is set
+
+DATABASE_PROFILE = os.environ.get('WAKALA_DB_PROFILE', 'sqlite')
+
+if DATABASE_PROFILE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('WAKALA_DB_NAME', 'wakaladigital'),
+            'USER': os.environ.get('WAKALA_DB_USER', ''),
+            'PASSWORD': os.environ.get('WAKALA_DB_PASSWORD', ''),
+            'HOST': os.environ.get('WAKALA_DB_HOST', ''),
+            'PORT': os.environ.get('WAKALA_DB_PORT', ''),
+            'CONN_MAX_AGE': int(os.environ.get('WAKALA_DB_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
     }
-}
+    if os.environ.get('WAKALA_DB_POOL_MAX_SIZE'):
+        # Pooled connections are returned to the pool per request, so
+        # Django's own persistence must be off
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('WAKALA_DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ['WAKALA_DB_POOL_MAX_SIZE']),
+            'timeout': int(os.environ.get('WAKALA_DB_POOL_TIMEOUT', 10)),
+        }
+elif DATABASE_PROFILE == 'sqlite-basic':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+elif DATABASE_PROFILE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('WAKALA_DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(os.environ.get('WAKALA_DB_CONN_MAX_AGE', 600)),
+            'OPTIONS': {
+                'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL',
+                'timeout': int(os.environ.get('WAKALA_DB_TIMEOUT', 20)),
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
+    }
+else:
+    raise ImproperlyConfigured(
+        f'Unknown WAKALA_DB_PROFILE {DATABASE_PROFILE!r}; use sqlite, sqlite-basic or postgres'
+    )
+
+# Read replica: WAKALA_DB_REPLICA_HOST (postgres) or WAKALA_DB_REPLICA_NAME (an
+# SQLite file replicated from the primary) adds a "replica" database, and
+# fintech.routers sends the reads of replica-safe views to it. After a write a
+# client is kept on the primary for REPLICA_PIN_SECONDS. The test runner
+# creates the replica's test database separately, so the tests can tell the
+# two apart.
+DATABASE_REPLICA_ALIAS = None
+if DATABASE_PROFILE == 'postgres' and os.environ.get('WAKALA_DB_REPLICA_HOST'):
+    DATABASE_REPLICA_ALIAS = 'replica'
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ['WAKALA_DB_REPLICA_HOST'],
+        'PORT': os.environ.get('WAKALA_DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+    }
+elif DATABASE_PROFILE != 'postgres' and os.environ.get('WAKALA_DB_REPLICA_NAME'):
+    DATABASE_REPLICA_ALIAS = 'replica'
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['WAKALA_DB_REPLICA_NAME'],
+        'OPTIONS': dict(DATABASES['default'].get('OPTIONS', {})),
+    }
+
+DATABASE_ROUTERS = ['fintech.routers.ReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.environ.get('WAKALA_DB_REPLICA_PIN_SECONDS', 5))
 
 
 # Password validation
@@ -171,6 +296,17 @@ EMAIL_HOST_USER = ''  # Update with your email
 EMAIL_HOST_PASSWORD = ''  # Update with your email password or app password
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+# Email outbox worker (manage.py process_email_outbox)
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_RETRY_BASE_SECONDS = 30  # doubled after every failed attempt
+OUTBOX_RETRY_MAX_SECONDS = 3600
+OUTBOX_LEASE_SECONDS = 300  # how long a worker may hold a claimed batch
+
+# Server-push notification stream (/api/notifications/stream/, ASGI only)
+NOTIFICATION_BROKER = 'fintech.events.InProcessBroker'
+NOTIFICATION_STREAM_HEARTBEAT = 15  # seconds between keep-alive comments
+
 # Site URL for email links
 SITE_URL = 'http://127.0.0.1:8000'
 
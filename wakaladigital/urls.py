@@ -20,9 +20,10 @@ from rest_framework.routers import DefaultRouter
 from fintech.views import (
     SavingsGroupViewSet, ContributionViewSet, LoanViewSet,
     InvestmentViewSet, FinancialEducationViewSet,
-    UserProgressViewSet, NotificationViewSet
+    UserProgressViewSet, NotificationViewSet, statement
 )
 from fintech.auth_views import get_csrf_token, login_view, logout_view
+from fintech import async_views
 
 router = DefaultRouter()
 router.register(r'savings-groups', SavingsGroupViewSet)
@@ -35,7 +36,16 @@ router.register(r'notifications', NotificationViewSet, basename='notifications')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    # Ahead of the router so 'stream' isn't taken for a notification id
+    path('api/notifications/stream/', async_views.notification_stream),
+    path('api/statement/', statement),
     path('api/', include(router.urls)),
+    # Async read paths for the ASGI entry point
+    path('api/async/savings-groups/<int:pk>/', async_views.group_detail),
+    path('api/async/savings-groups/<int:pk>/members/', async_views.group_members),
+    path('api/async/savings-groups/<int:pk>/analytics/', async_views.group_analytics),
+    path('api/async/contributions/', async_views.my_contributions),
+    path('api/async/notifications/', async_views.my_notifications),
     path('api-auth/', include('rest_framework.urls')),
     path('api/csrf/', get_csrf_token),
     path('api/login/', login_view),